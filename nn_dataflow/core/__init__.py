@@ -42,6 +42,7 @@ from .phy_dim2 import PhyDim2
 from .pipeline_segment import PipelineSegment
 from .pipeline_segment_timing import PipelineSegmentTiming
 from .resource import Resource
+from .schedule_cache import ScheduleCache
 from .scheduling import SchedulingCondition, SchedulingResult, Scheduling
 from .scheduling_constraint import SchedulingConstraint, \
         SchedulingConstraintLayerPipeline
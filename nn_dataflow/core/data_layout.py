@@ -16,6 +16,7 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 
 from collections import namedtuple
 import itertools
+import fastcache
 
 from .fmap_range import FmapPosition, FmapRange, FmapRangeMap
 from .node_region import NodeRegion
@@ -103,15 +104,13 @@ class DataLayout(namedtuple('DataLayout', DATA_LAYOUT_LIST)):
         # The number of hops to transfer data to each destination individually.
         nhops_list = [0] * len(dest_list)
 
-        for frng, region, part in zip(self.frngs, self.regions, self.parts):
+        for frng, node_frngs in self._node_fmap_ranges():
 
             # Skip non-overlapped fmap range.
             if fmap_range.overlap_size(frng) == 0:
                 continue
 
-            for pidx in part.gen_pidx():
-                psrc = part.coordinate(region, pidx)
-                pfrng = part.fmap_range(frng, pidx)
+            for psrc, pfrng in node_frngs:
                 size = fmap_range.overlap_size(pfrng)
 
                 nhops_list = [n + size * d.hop_dist(psrc)
@@ -142,6 +141,19 @@ class DataLayout(namedtuple('DataLayout', DATA_LAYOUT_LIST)):
 
         return nhops
 
+    @fastcache.clru_cache(maxsize=1024)
+    def _node_fmap_ranges(self):
+        '''
+        Get the partitioned fmap ranges on each node, which are shared by all
+        the hop calculations. Return a tuple of each fmap range and a tuple of
+        its partitioned (absolute node coordinate, fmap range) pairs.
+        '''
+        return tuple((frng, tuple((part.coordinate(region, pidx),
+                                   part.fmap_range(frng, pidx))
+                                  for pidx in part.gen_pidx()))
+                     for frng, region, part
+                     in zip(self.frngs, self.regions, self.parts))
+
     def is_in(self, *regions):
         '''
         Whether the layout is completely in the given NodeRegion's `regions`.
@@ -14,6 +14,7 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+import functools
 import heapq
 import itertools
 from multiprocessing.pool import Pool
@@ -22,7 +23,8 @@ from . import loop_blocking_solver
 from . import loop_enum as le
 from .. import util
 from .buf_shr_scheme import BufShrScheme
-from .layer import ConvLayer
+from .layer import ConvLayer, LocalRegionLayer
+from .loop_blocking_evaluator import LoopBlockingEvaluator
 from .loop_blocking_scheme import LoopBlockingScheme
 
 '''
@@ -33,6 +35,9 @@ Include loop blocking and reordering.
 For our problem, only deal with nifm, nofm, and batch loops.
 '''
 
+# Minimum number of blocking factors to search in parallel processes.
+MIN_PARALLEL_NUM_BL_TS = 256
+
 def skip_conv(bl_ts, bl_ords):
     '''
     Skip the given loop blocking scheme for CONV layer, if it has regularized
@@ -102,53 +107,305 @@ def skip_conv(bl_ts, bl_ords):
     return False
 
 
-def _loop_blocking_cmp_key(options, cost):
+def skip_local_region(bl_ts, bl_ords):
+    '''
+    Skip the given loop blocking scheme for LocalRegionLayer, if it has
+    regularized equivalent, or it is suboptimal.
+
+    For LocalRegionLayer, the IFM loop is trivial, as the ifmaps and ofmaps are
+    one-to-one mapped. The OFM and BAT loops are the dimension loops of both
+    IFM and OFM, and there is no filter. So all the non-trivial loops are
+    dimension loops of all data categories, and the loop order does not affect
+    the fetch times at all. Any two loop orders of the same level with the
+    same non-trivial loops are equivalent.
+
+    Therefore, in addition to the rules of `skip_conv()`, a scheme is
+    regularized only if the innermost non-trivial loop is the one with the
+    smallest LoopEnum value, i.e., all the non-trivial loops are in order.
+
+    This does not apply to the top level, whose loop order is further
+    constrained by the scheduling constraint, e.g., for layer pipelining,
+    which differentiates the otherwise equivalent orders.
+
+    The rules only apply when the IFM loop is trivial at all levels.
+    '''
+    if skip_conv(bl_ts, bl_ords):
+        return True
+
+    for t_, ord_ in zip(bl_ts[1:], bl_ords[1:]):
+        nt_loops = [lpe for lpe in range(le.NUM) if t_[lpe] > 1]
+        if nt_loops and min(nt_loops, key=lambda lpe, o=ord_: o[lpe]) \
+                != nt_loops[0]:
+            return True
+
+    return False
+
+
+def gen_regularized_ords(bl_ts, local_region=False):
+    '''
+    Generator for the loop orders of all levels for CONV layer, given the
+    blocking factors `bl_ts`.
+
+    Only generate the regularized and not suboptimal schemes, i.e., exactly
+    those not skipped by `skip_conv()`, in the same order as filtering the
+    product of the permutations of all levels.
+
+    If `local_region` is True, generate those not skipped by
+    `skip_local_region()` for LocalRegionLayer instead.
+    '''
+    # The loop orders only depend on which loops are non-trivial.
+    nt_loops_list = tuple(tuple(lpe for lpe in range(le.NUM) if t_[lpe] > 1)
+                          for t_ in bl_ts)
+    # Whether the innermost non-trivial loop is fixed at each ordered level.
+    fixed_innermost_list = (False,) + (local_region,) * (len(bl_ts) - 2)
+    return iter(_regularized_ords(nt_loops_list, fixed_innermost_list))
+
+
+@functools.lru_cache(maxsize=None)
+def _regularized_ords(nt_loops_list, fixed_innermost_list,
+                      outer_level_innermost_nt_loop=None):
+    '''
+    Get the regularized and not suboptimal loop orders of the levels with the
+    given non-trivial loops `nt_loops_list`, as a tuple of the loop order
+    tuples. The last level has no loop order.
+
+    `fixed_innermost_list` indicates for each level with loop order whether
+    the innermost non-trivial loop is fixed to the one with the smallest
+    LoopEnum value. See `skip_local_region()`.
+
+    `outer_level_innermost_nt_loop` is the closest innermost non-trivial loop
+    of the outer levels. See `skip_conv()`.
+    '''
+    nt_loops = nt_loops_list[0]
+
+    if len(nt_loops_list) == 1:
+        # Last level, all non-trivial loops are non-innermost.
+        if outer_level_innermost_nt_loop in nt_loops:
+            return ()
+        return ((),)
+
+    # Candidates of the innermost non-trivial loop.
+    if not nt_loops:
+        innermost_nt_loops = (None,)
+    elif fixed_innermost_list[0]:
+        innermost_nt_loops = nt_loops[:1]
+    else:
+        innermost_nt_loops = nt_loops
+
+    bl_ords_list = []
+
+    for innermost_nt_loop in innermost_nt_loops:
+
+        # Suboptimal.
+        if outer_level_innermost_nt_loop != innermost_nt_loop \
+                and outer_level_innermost_nt_loop in nt_loops:
+            continue
+
+        # Regularized order, see `skip_conv()`.
+        lp_ord = sorted(range(le.NUM),
+                        key=lambda lpe, inl=innermost_nt_loop:
+                        (lpe != inl, lpe not in nt_loops, lpe))
+        ord_ = tuple(lp_ord.index(lpe) for lpe in range(le.NUM))
+
+        inner_bl_ords_list = _regularized_ords(
+            nt_loops_list[1:], fixed_innermost_list[1:],
+            innermost_nt_loop if innermost_nt_loop is not None
+            else outer_level_innermost_nt_loop)
+
+        bl_ords_list += [(ord_,) + inner_bl_ords
+                         for inner_bl_ords in inner_bl_ords_list]
+
+    # Same order as the product of the permutations.
+    return tuple(sorted(bl_ords_list))
+
+
+def _ords_generator(nested_loop_desc, list_ords):
+    '''
+    Get the function that generates the loop orders to sweep for the given
+    blocking factors, which skips the equivalent and suboptimal loop orders
+    if applicable, or otherwise returns all loop orders `list_ords`.
+    '''
+    if nested_loop_desc.data_loops == ConvLayer.data_loops():
+        return gen_regularized_ords
+    if nested_loop_desc.data_loops == LocalRegionLayer.data_loops() \
+            and nested_loop_desc.loopcnt[le.IFM] == 1:
+        return functools.partial(gen_regularized_ords, local_region=True)
+    return lambda _: list_ords
+
+
+def _loop_blocking_cmp_key(options):
+    '''
+    Get the compare key function of the loop blocking schemes, which takes a
+    tuple of the data access cost and the time.
+
+    For the Pareto-optimal goal, the key is the objective tuple of the data
+    access cost and the time.
+    '''
     if options.opt_goal == 'ed':
-        return lambda lbs: lbs.get_access_cost(cost) * lbs.time
+        return lambda acc_cost, time: acc_cost * time
     if options.opt_goal == 'd':
-        return lambda lbs: (lbs.time, lbs.get_access_cost(cost))
-    assert options.opt_goal == 'e'
-    return lambda lbs: (lbs.get_access_cost(cost), lbs.time)
+        return lambda acc_cost, time: (time, acc_cost)
+    assert options.opt_goal in ('e', 'pareto')
+    return lambda acc_cost, time: (acc_cost, time)
+
+
+def _neg_key(key):
+    '''
+    Negate the compare key of the loop blocking schemes, in order to use
+    heapq as a max-heap.
+    '''
+    if isinstance(key, tuple):
+        return tuple(-k for k in key)
+    return -key
+
+
+def _key_isclose(key1, key2):
+    '''
+    Whether the two compare keys of the loop blocking schemes are close to
+    each other, tolerating the different floating-point rounding.
+    '''
+    if isinstance(key1, tuple):
+        return len(key1) == len(key2) \
+                and all(util.isclose(k1, k2) for k1, k2 in zip(key1, key2))
+    return util.isclose(key1, key2)
 
 
 def _gen_loopblocking_perprocess(
         nested_loop_desc, resource, bufshr, constraint, cost, options,
-        gen_tifm, gen_tofm, gen_tbat, gen_ords):
-
-    def _gen_bl_ts():
-        '''
-        Generator for blocking factors.
-
-        Transpose LoopEnum-major to BL-major.
-        '''
-        gen_lp_ts = [None] * le.NUM
-        gen_lp_ts[le.IFM], gen_lp_ts[le.OFM], gen_lp_ts[le.BAT] = \
-                constraint.filter_gen_ts(gen_tifm, gen_tofm, gen_tbat)
-        for lp_ts in itertools.product(*gen_lp_ts):
-            bl_ts = tuple(zip(*lp_ts))
-            yield bl_ts
-
-    def _sweep():
-        ''' Sweep all. '''
-        is_conv_loops = (nested_loop_desc.data_loops == ConvLayer.data_loops())
-        for bl_ts, bl_ords in itertools.product(_gen_bl_ts(), gen_ords):
-            if is_conv_loops and skip_conv(bl_ts, bl_ords):
+        list_ords, list_bl_ts):
+    '''
+    Sweep the given blocking factors `list_bl_ts` with all loop orders
+    `list_ords`.
+
+    Return the top schemes as compact tuples of (sort key, blocking factors,
+    loop orders), instead of the LoopBlockingScheme instances, in order to
+    reduce the data transferred between processes. The caller should rebuild
+    the LoopBlockingScheme instances from the blocking factors and loop orders.
+
+    If `options.loopblocking_bound_prune` is set, skip the blocking factors
+    whose lower bound is no better than the current top schemes. The returned
+    top schemes are identical to those without pruning.
+
+    For the Pareto-optimal goal, return the entire Pareto-optimal frontier
+    among the given candidates, without the size cap.
+    '''
+    if options.opt_goal == 'pareto':
+        return _gen_loopblocking_perprocess_pareto(
+            nested_loop_desc, resource, bufshr, constraint, cost, options,
+            list_ords, list_bl_ts)
+
+
+    cmp_key = _loop_blocking_cmp_key(options)
+
+    # Evaluate the candidates without constructing LoopBlockingScheme
+    # instances.
+    evaluator = LoopBlockingEvaluator(nested_loop_desc, resource, bufshr, cost,
+                                      options)
+
+    gen_ords = _ords_generator(nested_loop_desc, list_ords)
+
+    # Keep the top schemes in a heap with the worst one on the top. Ties are
+    # broken by the sweep order, the same as heapq.nsmallest.
+    tops = []
+    seq = 0
+
+    for bl_ts in list_bl_ts:
+
+        # Skip all loop orders of the blocking factors, if the lower bound
+        # cannot beat the current worst top scheme.
+        if options.loopblocking_bound_prune and len(tops) >= options.ntops:
+            if cmp_key(*evaluator.lower_bound(bl_ts)) >= _neg_key(tops[0][0]):
                 continue
+
+        for bl_ords in gen_ords(bl_ts):
             if not constraint.is_valid_top_bl(bl_ts[0], bl_ords[0]):
                 continue
-            lbs = LoopBlockingScheme(
-                nested_loop_desc, bl_ts, bl_ords, resource, bufshr,
-                options)
-            yield lbs
 
-    return heapq.nsmallest(options.ntops, _sweep(),
-                           key=_loop_blocking_cmp_key(options, cost))
+            key = cmp_key(*evaluator.evaluate(bl_ts, bl_ords))
+            item = (_neg_key(key), -seq, bl_ts, bl_ords)
+            seq += 1
+
+            if len(tops) < options.ntops:
+                heapq.heappush(tops, item)
+            elif key < _neg_key(tops[0][0]):
+                heapq.heapreplace(tops, item)
+
+    return [(_neg_key(nk), bl_ts, bl_ords)
+            for nk, _, bl_ts, bl_ords in sorted(tops, reverse=True)]
+
+
+def _gen_loopblocking_perprocess_pareto(
+        nested_loop_desc, resource, bufshr, constraint, cost, options,
+        list_ords, list_bl_ts):
+    '''
+    Sweep the given blocking factors `list_bl_ts` with all loop orders
+    `list_ords`, and return the Pareto-optimal frontier in the same compact
+    tuple format as `_gen_loopblocking_perprocess`.
+    '''
+
+    cmp_key = _loop_blocking_cmp_key(options)
+
+    evaluator = LoopBlockingEvaluator(nested_loop_desc, resource, bufshr, cost,
+                                      options)
+
+    gen_ords = _ords_generator(nested_loop_desc, list_ords)
+
+    def _is_dominated(key, frontier):
+        # Weakly dominated, i.e., including the identical objectives, of which
+        # only the first one is kept.
+        return any(fk[0] <= key[0] and fk[1] <= key[1] for fk, _, _ in frontier)
+
+    frontier = []
+
+    for bl_ts in list_bl_ts:
+
+        # Skip all loop orders of the blocking factors, if the lower bound is
+        # already dominated by the current frontier.
+        if options.loopblocking_bound_prune \
+                and _is_dominated(cmp_key(*evaluator.lower_bound(bl_ts)),
+                                  frontier):
+            continue
+
+        for bl_ords in gen_ords(bl_ts):
+            if not constraint.is_valid_top_bl(bl_ts[0], bl_ords[0]):
+                continue
+
+            key = cmp_key(*evaluator.evaluate(bl_ts, bl_ords))
+            if _is_dominated(key, frontier):
+                continue
+
+            frontier = [item for item in frontier
+                        if not (key[0] <= item[0][0] and key[1] <= item[0][1])]
+            frontier.append((key, bl_ts, bl_ords))
+
+    return util.pareto_frontier(frontier, key=lambda tpl: tpl[0])
+
+
+def _gen_bl_ts(nested_loop_desc, constraint):
+    '''
+    Generator for blocking factors.
+
+    Transpose LoopEnum-major to BL-major.
+    '''
+    gen_lp_ts = [None] * le.NUM
+    gen_lp_ts[le.IFM], gen_lp_ts[le.OFM], gen_lp_ts[le.BAT] = \
+            constraint.filter_gen_ts(
+                util.factorize(nested_loop_desc.loopcnt[le.IFM], 3),
+                util.factorize(nested_loop_desc.loopcnt[le.OFM], 3),
+                util.factorize(nested_loop_desc.loopcnt[le.BAT], 3))
+    for lp_ts in itertools.product(*gen_lp_ts):
+        bl_ts = tuple(zip(*lp_ts))
+        yield bl_ts
 
 
 def gen_loopblocking(nested_loop_desc, resource, part, constraint, cost,
-                     options):
+                     options, pool=None):
     '''
     Generator for loop blocking.
+
+    `pool` is an optional multiprocessing.Pool instance shared across calls. If
+    None and `options.nprocesses` > 1, a temporary pool is created and torn
+    down within this call.
     '''
 
     # Buffer sharing scheme.
@@ -160,7 +417,8 @@ def gen_loopblocking(nested_loop_desc, resource, part, constraint, cost,
             and nested_loop_desc.data_loops == ConvLayer.data_loops():
         gen = loop_blocking_solver.gen_loopblocking_gbuf_reside
 
-        for bl_ts, bl_ords in gen(nested_loop_desc, resource, options):
+        for bl_ts, bl_ords in gen(nested_loop_desc, resource, options,
+                                  bufshr=bufshr):
             lbs = LoopBlockingScheme(nested_loop_desc, bl_ts, bl_ords,
                                      resource, bufshr, options)
             if constraint.is_valid_top_bl(lbs.bl_ts[0], lbs.bl_ords[0]):
@@ -169,55 +427,66 @@ def gen_loopblocking(nested_loop_desc, resource, part, constraint, cost,
 
     ## Exhaustive search.
 
-    results = []
-
-    def retrieve_result():
-        ''' Retrieve results from multiprocessing.Pool. '''
-        for r in results:
-            for t in r.get(timeout=3600):
-                yield t
-
-    def retrieve_result_st():
-        ''' Retrieve results from single-process processing. '''
-        for r in results:
-            for t in r:
-                yield t
-
-    if options.nprocesses > 1:
-        pool = Pool(processes=options.nprocesses)
-        apply_func = pool.apply_async
-        retrieve_func = retrieve_result()
-    else:
-        pool = None
-        apply_func = util.apply
-        retrieve_func = retrieve_result_st()
-
     # Exhaustive generators.
-    gen_tifm = util.factorize(nested_loop_desc.loopcnt[le.IFM], 3)
-    gen_tofm = util.factorize(nested_loop_desc.loopcnt[le.OFM], 3)
-    gen_tbat = util.factorize(nested_loop_desc.loopcnt[le.BAT], 3)
-    gen_ords = itertools.product(itertools.permutations(range(le.NUM)),
-                                 itertools.permutations(range(le.NUM)))
-
-    # Split the design space for multiprocessing.
-    # Let each process factorize tbat and orders, which constantly have many
-    # factors that can amortize the multiprocessing overhead.
     # Note that we must materialize them into lists, since generators cannot be
     # pickled. See
     # http://peadrop.com/blog/2009/12/29/why-you-cannot-pickle-generators/
-    list_tbat = list(gen_tbat)
-    list_ords = list(gen_ords)
-    for tifm, tofm in itertools.product(gen_tifm, gen_tofm):
-        r = apply_func(_gen_loopblocking_perprocess,
-                       (nested_loop_desc, resource, bufshr, constraint, cost,
-                        options, [tifm], [tofm], list_tbat, list_ords))
-        results.append(r)
-
-    for lbs in heapq.nsmallest(options.ntops, retrieve_func,
-                               key=_loop_blocking_cmp_key(options, cost)):
-        yield lbs
+    list_bl_ts = list(_gen_bl_ts(nested_loop_desc, constraint))
+    list_ords = list(itertools.product(itertools.permutations(range(le.NUM)),
+                                       itertools.permutations(range(le.NUM))))
+
+    # Search in this process if there are too few blocking factors to amortize
+    # the multiprocessing overhead, e.g., for pooling and element-wise layers.
+    if len(list_bl_ts) < MIN_PARALLEL_NUM_BL_TS:
+        pool = None
+
+    # Only tear down the pool if it is created locally.
+    local_pool = None
+    if pool is None and options.nprocesses > 1 \
+            and len(list_bl_ts) >= MIN_PARALLEL_NUM_BL_TS:
+        pool = local_pool = Pool(processes=options.nprocesses)
+
+    args = (nested_loop_desc, resource, bufshr, constraint, cost, options,
+            list_ords)
 
     if pool is not None:
-        pool.close()
-        pool.join()
+        # Split the design space into equal-sized chunks of blocking factors,
+        # each of which is swept with all loop orders. The chunks are
+        # dynamically dispatched to the worker processes as a work queue, so
+        # the workload is balanced even if the factorization is skewed.
+        chunk_size = options.loopblocking_chunk_size
+        if not chunk_size:
+            # Several chunks per process to balance the load, while still
+            # amortizing the multiprocessing overhead.
+            chunk_size = util.idivc(len(list_bl_ts), options.nprocesses * 4)
+        chunk_size = max(chunk_size, 1)
+        chunks = [list_bl_ts[i:i + chunk_size]
+                  for i in range(0, len(list_bl_ts), chunk_size)]
+        # Use ordered imap to retrieve the results, which keeps the top
+        # results deterministic regardless of the process scheduling.
+        results = pool.imap(
+            functools.partial(_gen_loopblocking_perprocess, *args), chunks)
+    else:
+        results = [_gen_loopblocking_perprocess(*args, list_bl_ts)]
+
+    # Rebuild the top schemes.
+    cmp_key = _loop_blocking_cmp_key(options)
+    if options.opt_goal == 'pareto':
+        tops = util.pareto_frontier(itertools.chain(*results),
+                                    key=lambda tpl: tpl[0], cap=options.ntops)
+    else:
+        tops = heapq.nsmallest(options.ntops, itertools.chain(*results),
+                               key=lambda tpl: tpl[0])
+    for key, bl_ts, bl_ords in tops:
+        lbs = LoopBlockingScheme(nested_loop_desc, bl_ts, bl_ords, resource,
+                                 bufshr, options)
+        # Finalize the lazily calculated stats, and check consistency. The
+        # evaluator may round differently from the scheme.
+        acc_cost = lbs.get_access_cost(cost)
+        assert not lbs.is_valid() \
+                or _key_isclose(key, cmp_key(acc_cost, lbs.time))
+        yield lbs
 
+    if local_pool is not None:
+        local_pool.close()
+        local_pool.join()
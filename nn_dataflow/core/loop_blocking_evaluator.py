@@ -0,0 +1,331 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import math
+
+from . import data_category_enum as de
+from . import loop_enum as le
+from . import mem_hier_enum as me
+from .node_region import NodeRegion
+from .. import util
+
+class LoopBlockingEvaluator():
+    '''
+    Batch evaluator of loop blocking schemes for one nested loop.
+
+    Calculate the validity, the data access cost, and the time of a large
+    number of loop blocking candidates, without constructing a
+    LoopBlockingScheme instance for each of them. All quantities that only
+    depend on the nested loop, the resource, and the options are calculated
+    once, and each candidate only goes through the unit counts, buffer sizes,
+    fetch times, and access counts.
+
+    The results are identical to those of LoopBlockingScheme, i.e.,
+    `get_access_cost()` and `time`. Buffer sharing does not change these
+    results, so its costly exploration is deferred to the LoopBlockingScheme
+    instances of the surviving top candidates.
+    '''
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, nested_loop_desc, resource, bufshr, cost, options):
+
+        nld = nested_loop_desc
+
+        # Data dimension loops and unrelated loops of each data category.
+        self.dim_loops = [nld.data_loops[dce].loops() for dce in range(de.NUM)]
+        self.unrel_loops = [tuple(lpe for lpe in range(le.NUM)
+                                  if lpe not in self.dim_loops[dce])
+                            for dce in range(de.NUM)]
+
+        # Unit sizes.
+        self.usize_gbuf = nld.usize_gbuf
+        self.usize_regf = nld.usize_regf
+
+        # Capacities.
+        self.size_gbuf = resource.size_gbuf
+        self.size_regf = resource.size_regf
+
+        # Initial buffer sharing subgroup sizes, see
+        # LoopBlockingScheme._init_bufshr().
+        self.bufshr_subgrp_size = tuple(
+            bufshr.size(dce) if options.hw_gbuf_sharing else 1
+            for dce in range(de.NUM))
+
+        # Conservative stored in gbuf, see LoopBlockingScheme.__init__().
+        self.stored_in_gbuf = tuple(not options.sw_gbuf_bypass[dce]
+                                    for dce in range(de.NUM))
+
+        # Data src/dst regions.
+        self.src_is_dram = (resource.src_data_region.type == NodeRegion.DRAM)
+        self.dst_is_dram = (resource.dst_data_region.type == NodeRegion.DRAM)
+        self.src_is_local = (resource.src_data_region == resource.proc_region)
+        self.dst_is_local = (resource.dst_data_region == resource.proc_region)
+
+        # Filter pinning.
+        self.no_time_mux = resource.no_time_mux
+
+        # Access forwarding, see LoopBlockingScheme._set_accfwd().
+        if options.hw_access_forwarding or options.hw_gbuf_sharing:
+            self.accfwd_reduction = tuple(bufshr.size(dce)
+                                          for dce in range(de.NUM))
+        else:
+            self.accfwd_reduction = (1,) * de.NUM
+
+        self.num_nodes = resource.proc_region.dim.size()
+        self.array_bus_width = resource.array_bus_width
+        self.dram_bandwidth = resource.dram_bandwidth
+
+        self.unit_time = nld.unit_time
+        self.unit_access_regf = nld.unit_access[me.REGF]
+        self.total_access = [[nld.total_access_at_of(mhe, dce)
+                              for dce in range(de.NUM)]
+                             for mhe in range(me.NUM)]
+
+        self.cost = cost
+
+    def evaluate(self, bl_ts, bl_ords):
+        '''
+        Evaluate the loop blocking scheme with blocking factors `bl_ts` and
+        loop orders `bl_ords`, see LoopBlockingScheme.
+
+        Return a tuple of the data access cost and the time. Invalid scheme
+        has both infinite cost and time.
+        '''
+        # pylint: disable=too-many-locals,too-many-branches
+
+        invalid = (float('inf'), float('inf'))
+
+        # Blocking factor products of the levels below GBUF and REGF, and of
+        # all levels.
+        lp_ts = list(zip(*bl_ts))
+        bl_tp_regf = [ts[2] for ts in lp_ts]
+        bl_tp_gbuf = [ts[1] * ts[2] for ts in lp_ts]
+        lcnt = util.prod(ts[0] * ts[1] * ts[2] for ts in lp_ts)
+        # Blocking factor products of the levels above DRAM, GBUF, and REGF.
+        bl_tp_above = [(1,) * le.NUM, bl_ts[0],
+                       [ts[0] * ts[1] for ts in lp_ts]]
+
+        # Buffered unit counts.
+        unit_cnt_gbuf = [util.prod(bl_tp_gbuf[lpe] for lpe in dls)
+                         for dls in self.dim_loops]
+        unit_cnt_regf = [util.prod(bl_tp_regf[lpe] for lpe in dls)
+                         for dls in self.dim_loops]
+
+        stored_in_gbuf = list(self.stored_in_gbuf)
+
+        def _is_oversized():
+            size_gbuf = 0
+            for dce in range(de.NUM):
+                size = unit_cnt_gbuf[dce] * self.usize_gbuf[dce]
+                size *= 1 if stored_in_gbuf[dce] else 0
+                size_gbuf += util.idivc(size, self.bufshr_subgrp_size[dce])
+            size_regf = sum(uc * us for uc, us
+                            in zip(unit_cnt_regf, self.usize_regf))
+            return size_regf > self.size_regf or size_gbuf > self.size_gbuf
+
+        if _is_oversized():
+            return invalid
+
+        # Fetch times.
+        fetch = []
+        for bl in range(2):
+            bl_t = bl_ts[bl]
+            bl_ord = bl_ords[bl]
+
+            fe = [0] * de.NUM
+
+            for dce in range(de.NUM):
+
+                # Innermost non-trivial dimension loop.
+                inntdim_lp = None
+                for lpe in self.dim_loops[dce]:
+                    if bl_t[lpe] > 1 and (inntdim_lp is None
+                                          or bl_ord[lpe] < bl_ord[inntdim_lp]):
+                        inntdim_lp = lpe
+
+                if inntdim_lp is None:
+                    fe[dce] = fetch[bl-1][dce] if bl > 0 else 1
+                    continue
+
+                f = 1
+                for lpe in self.unrel_loops[dce]:
+                    bl_start = bl + (bl_ord[lpe] > bl_ord[inntdim_lp])
+                    f *= bl_tp_above[bl_start][lpe]
+
+                fe[dce] = 2 * f - 1 if dce == de.OFM else f
+
+            fetch.append(fe)
+        fetch_gbuf, fetch_regf = fetch
+
+        # Data src/dst regions.
+        if not self.src_is_dram:
+            if fetch_gbuf[de.IFM] > 1:
+                return invalid
+            if self.src_is_local:
+                stored_in_gbuf[de.IFM] = True
+        if not self.dst_is_dram:
+            if fetch_gbuf[de.OFM] > 1:
+                return invalid
+            if self.dst_is_local:
+                stored_in_gbuf[de.OFM] = True
+
+        # Only store in gbuf if having reuse.
+        for dce in range(de.NUM):
+            if not stored_in_gbuf[dce] and fetch_gbuf[dce] < fetch_regf[dce]:
+                stored_in_gbuf[dce] = True
+
+        if _is_oversized():
+            return invalid
+
+        # Filter pinning.
+        if self.no_time_mux \
+                and all(bl_ts[0][lpe] == 1 for lpe in self.dim_loops[de.FIL]):
+            fetch_gbuf[de.FIL] = 0
+
+        # Accesses, in the same way as LoopBlockingScheme._calc_stats().
+        num_nodes = self.num_nodes
+        total_access = self.total_access
+
+        access = [None] * me.NUM
+
+        access[me.REGF] = [v * lcnt * t * num_nodes
+                           for v, t in zip(self.unit_access_regf, [1, 1, 2])]
+
+        access[me.ITCN] = [total_access[me.ITCN][dce]
+                           * fetch_regf[dce]
+                           * num_nodes
+                           for dce in range(de.NUM)]
+
+        access[me.GBUF] = [total_access[me.GBUF][dce]
+                           * fetch_regf[dce]
+                           * stored_in_gbuf[dce]
+                           * num_nodes
+                           for dce in range(de.NUM)]
+
+        access[me.DRAM] = [(total_access[me.DRAM][dce]
+                            if stored_in_gbuf[dce]
+                            else total_access[me.GBUF][dce])
+                           * fetch_gbuf[dce]
+                           * num_nodes
+                           / self.accfwd_reduction[dce]
+                           for dce in range(de.NUM)]
+
+        return self._access_cost_time(lcnt, access)
+
+    def lower_bound(self, bl_ts):
+        '''
+        Get a lower bound of the evaluation results of all loop blocking
+        schemes with blocking factors `bl_ts`, regardless of the loop orders.
+
+        Return a tuple of the data access cost and the time, each of which is
+        no larger than that returned by `evaluate()` with any loop orders.
+        If all such schemes are invalid, both are infinite.
+        '''
+
+        lp_ts = list(zip(*bl_ts))
+        lcnt = util.prod(ts[0] * ts[1] * ts[2] for ts in lp_ts)
+
+        # The buffered unit counts do not depend on the loop orders.
+        unit_cnt_gbuf = [util.prod(lp_ts[lpe][1] * lp_ts[lpe][2]
+                                   for lpe in dls)
+                         for dls in self.dim_loops]
+        unit_cnt_regf = [util.prod(lp_ts[lpe][2] for lpe in dls)
+                         for dls in self.dim_loops]
+
+        # Data that are always stored in gbuf for valid schemes.
+        stored_in_gbuf = list(self.stored_in_gbuf)
+        if not self.src_is_dram and self.src_is_local:
+            stored_in_gbuf[de.IFM] = True
+        if not self.dst_is_dram and self.dst_is_local:
+            stored_in_gbuf[de.OFM] = True
+
+        size_gbuf = 0
+        for dce in range(de.NUM):
+            size = unit_cnt_gbuf[dce] * self.usize_gbuf[dce]
+            size *= 1 if stored_in_gbuf[dce] else 0
+            size_gbuf += util.idivc(size, self.bufshr_subgrp_size[dce])
+        size_regf = sum(uc * us for uc, us
+                        in zip(unit_cnt_regf, self.usize_regf))
+        if size_regf > self.size_regf or size_gbuf > self.size_gbuf:
+            return (float('inf'), float('inf'))
+
+        # Fetch times are at least 1, except for pinned filters.
+        fetch_gbuf = [1] * de.NUM
+        if self.no_time_mux \
+                and all(bl_ts[0][lpe] == 1 for lpe in self.dim_loops[de.FIL]):
+            fetch_gbuf[de.FIL] = 0
+
+        # Accesses, with the minimum fetch times, and the cheaper choice of
+        # whether to store in gbuf if undetermined.
+        num_nodes = self.num_nodes
+        total_access = self.total_access
+
+        access = [None] * me.NUM
+
+        access[me.REGF] = [v * lcnt * t * num_nodes
+                           for v, t in zip(self.unit_access_regf, [1, 1, 2])]
+
+        access[me.ITCN] = [total_access[me.ITCN][dce]
+                           * num_nodes
+                           for dce in range(de.NUM)]
+
+        access[me.GBUF] = [total_access[me.GBUF][dce]
+                           * stored_in_gbuf[dce]
+                           * num_nodes
+                           for dce in range(de.NUM)]
+
+        access[me.DRAM] = [(total_access[me.DRAM][dce]
+                            if stored_in_gbuf[dce]
+                            else min(total_access[me.DRAM][dce],
+                                     total_access[me.GBUF][dce]))
+                           * fetch_gbuf[dce]
+                           * num_nodes
+                           / self.accfwd_reduction[dce]
+                           for dce in range(de.NUM)]
+
+        return self._access_cost_time(lcnt, access)
+
+    def _access_cost_time(self, lcnt, access):
+        '''
+        Get the data access cost and the time from the total loop count
+        `lcnt` and the accesses `access`, which is modified in place for the
+        remote gbuf accesses.
+        '''
+        num_nodes = self.num_nodes
+
+        remote_gbuf_access = [0.] * de.NUM
+        if not self.src_is_dram:
+            remote_gbuf_access[de.IFM] += access[me.DRAM][de.IFM]
+            access[me.DRAM][de.IFM] = 0
+        if not self.dst_is_dram:
+            remote_gbuf_access[de.OFM] += access[me.DRAM][de.OFM]
+            access[me.DRAM][de.OFM] = 0
+
+        # Time.
+        proc_time = self.unit_time * lcnt
+        dram_time = int(math.ceil(sum(access[me.DRAM])
+                                  / self.dram_bandwidth))
+        bus_time = util.idivc(int(math.ceil(1. * max(access[me.GBUF])
+                                            / num_nodes)),
+                              self.array_bus_width)
+        time = max(proc_time, bus_time, dram_time)
+
+        # Access cost, in the same way as
+        # LoopBlockingScheme.get_access_cost().
+        acc_cost = sum(c * sum(a) for c, a in zip(self.cost.mem_hier, access))
+        acc_cost += self.cost.mem_hier_at(me.GBUF) * sum(remote_gbuf_access)
+
+        return acc_cost, time
@@ -20,17 +20,24 @@ from . import data_category_enum as de
 from . import loop_enum as le
 from .. import util
 from .layer import ConvLayer
+from .node_region import NodeRegion
 
 '''
 Analytical solvers for loop blocking.
 '''
 
-def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
+def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce,
+                       bufshr_grp_size=(1,) * de.NUM):
     '''
     Solve the analytical optimal loop blocking scheme, with the given data
     category `reside_dce` is the only one in GBUF; all the other data
     categories bypass GBUF.
 
+    `bufshr_grp_size` are the buffer sharing group sizes indexed by
+    DataCategoryEnum, over which the GBUF data are shared.
+
+    Return None if no valid scheme exists.
+
     At the GBUF blocking level, the loops for the reside data category are at
     the outer, meaning it is only accessed once into GBUF. The others bypass
     GBUF and are streamed multiple times from DRAM to REGF.
@@ -65,6 +72,14 @@ def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
     similarly, if tx2 is minimized to 1 (so tx1 is not 1), ty1 must be 1. At
     least one of these two cases must be feasible for REGF capacity.
 
+    With buffer sharing, the GBUF data size is divided by the group size.
+
+    If the src/dst data regions are not DRAM, the IFM/OFM data can only be
+    fetched once, i.e., tx0 = 1 for data yz, and ty0 = 1 for data xz. If the
+    data region is the processing region itself, the data are also forced to
+    be stored in GBUF, and take the GBUF capacity (Ny // ty0) * tz2 * sgyz
+    or (Nx // tx0) * tz2 * sgxz, with tz2 at least 1.
+
     Although opt I is a convex optimization, we need to further require tx0 and
     ty0 to be factors of Nx and Ny, respectively. So we use exhaustive search
     to solve opt I.
@@ -76,6 +91,7 @@ def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
         tz0         elsewise
     s.t.
         tx2 * ty2 * srxy + ty2 * tz2 * sryz + tx2 * tz2 * srxz <= Sregf
+        GBUF capacity, if any bypass data category is forced in GBUF
 
     If tx1 and ty1 could be 1, which means the reside data category could put
     all GBUF data Nx // tx0 and Ny // ty0 directly into REGF, then it is the
@@ -117,8 +133,32 @@ def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
     lsgbuf = [nested_loop_desc.usize_gbuf_of(dce) for dce in ldce]  # xy, yz, xz
     lsregf = [nested_loop_desc.usize_regf_of(dce) for dce in ldce]  # xy, yz, xz
 
+    lshr = [bufshr_grp_size[dce] for dce in ldce]  # xy, yz, xz
+
+    # Data categories in non-DRAM regions, which can only be fetched once, and
+    # must be stored in GBUF if in the processing region.
+    lonce = [False] * 3  # xy, yz, xz
+    lstored = [True, False, False]  # xy, yz, xz
+    for idx, dce in enumerate(ldce):
+        if dce == de.IFM:
+            region = resource.src_data_region
+        elif dce == de.OFM:
+            region = resource.dst_data_region
+        else:
+            continue
+        if region.type != NodeRegion.DRAM:
+            lonce[idx] = True
+            if region == resource.proc_region:
+                lstored[idx] = True
+
     size_gbuf, size_regf = resource.size_gbuf, resource.size_regf
 
+    def gbuf_size(tx, ty, tz):
+        ''' GBUF data size with the given loop factors below the top level. '''
+        lunits = [tx * ty, ty * tz, tx * tz]
+        return sum(util.idivc(units * sg, shr) for units, sg, shr, stored
+                   in zip(lunits, lsgbuf, lshr, lstored) if stored)
+
     def goal_opt1(tx0, ty0):
         ''' Opt I goal function. min goal(). '''
         lnumloops = [lnum[0] * lnum[1], lnum[1] * lnum[2], lnum[0] * lnum[2]]
@@ -128,7 +168,9 @@ def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
 
     def constraints_opt1(tx0, ty0):
         ''' Opt I constraints. s.t. constraints(). '''
-        if (lnum[0] // tx0) * (lnum[1] // ty0) * lsgbuf[0] > size_gbuf:
+        if (lonce[1] and tx0 > 1) or (lonce[2] and ty0 > 1):
+            return False
+        if gbuf_size(lnum[0] // tx0, lnum[1] // ty0, 1) > size_gbuf:
             return False
         if min(lnum[0] // tx0 * (lsregf[0] + lsregf[2]) + lsregf[1],
                lnum[1] // ty0 * (lsregf[0] + lsregf[1]) + lsregf[2]) \
@@ -149,15 +191,19 @@ def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
                 min_goal = goal
                 tx0, ty0 = tx0_, ty0_
 
+    if math.isinf(min_goal):
+        return None
+
     def goal_opt2(tx2, ty2):
         ''' Opt II goal function. max goal(). '''
         tz2 = (size_regf - tx2 * ty2 * lsregf[0]) * 1. \
                 / (ty2 * lsregf[1] + tx2 * lsregf[2])
-        if tz2 < 0:
-            return -float('inf')
-        tz2_adj = util.closest_factor(lnum[2], tz2)
-        if tz2_adj[0] <= tz2:
-            return tz2_adj[0]
+        # The maximum factor that also fits in GBUF.
+        while tz2 >= 1:
+            tz2 = util.closest_factor(lnum[2], tz2)[0]
+            if gbuf_size(lnum[0] // tx0, lnum[1] // ty0, tz2) <= size_gbuf:
+                return tz2
+            tz2 -= 1
         return -float('inf')
 
     # Try tx1 = ty1 = 1.
@@ -189,8 +235,25 @@ def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
     bl_ord_1[llpe[1]] = 1 if tx1 > 1 else 0
     bl_ord_1[llpe[2]] = 2
 
+    def top_fetch_ok(tx0, ty0, bl_ord_0):
+        ''' Whether the data fetched once only have one top-level fetch. '''
+        # With loop x at the inner, data yz are reused across loop x, but data
+        # xz are fetched ty0 times if loop x is non-trivial. Similar for y.
+        x_inner = bl_ord_0[llpe[0]] < bl_ord_0[llpe[1]]
+        fetch_yz = tx0 if ty0 > 1 and not x_inner else 1
+        fetch_xz = ty0 if tx0 > 1 and x_inner else 1
+        return not (lonce[1] and fetch_yz > 1) \
+                and not (lonce[2] and fetch_xz > 1)
+
     # Special adjustment when tz0 = 1: merge tx1/ty1 into tx0/ty0.
-    if tz0 == 1:
+    # Opt I ensures tx0 = 1 if data yz are fetched once, and ty0 = 1 if data
+    # xz are fetched once, and the merged loop is at the inner of the top
+    # level, so the merge keeps both the fetch-once requirement and the GBUF
+    # capacity. Still check them, and skip the merge if violated.
+    if tz0 == 1 \
+            and top_fetch_ok(tx0 * tx1, ty0 * ty1, bl_ord_1) \
+            and gbuf_size(lnum[0] // tx0 // tx1, lnum[1] // ty0 // ty1,
+                          tz2) <= size_gbuf:
         tx0 *= tx1
         tx1 = 1
         ty0 *= ty1
@@ -210,10 +273,13 @@ def _solve_gbuf_reside(nested_loop_desc, resource, reside_dce):
     return bl_ts, bl_ords
 
 
-def gen_loopblocking_gbuf_reside(nested_loop_desc, resource, options):
+def gen_loopblocking_gbuf_reside(nested_loop_desc, resource, options,
+                                 bufshr=None):
     '''
     Generator for loop blocking schemes that are solved from gbuf reside
     analytical models.
+
+    `bufshr` is the BufShrScheme instance, used if buffer sharing is enabled.
     '''
     if nested_loop_desc.data_loops != ConvLayer.data_loops():
         raise ValueError('loop_blocking_solver: solver only applies to '
@@ -227,6 +293,13 @@ def gen_loopblocking_gbuf_reside(nested_loop_desc, resource, options):
                if dce != reside_dce):
             reside_dce_list.append(reside_dce)
 
+    bufshr_grp_size = tuple(bufshr.size(dce)
+                            if bufshr and options.hw_gbuf_sharing else 1
+                            for dce in range(de.NUM))
+
     for reside_dce in reside_dce_list:
-        yield _solve_gbuf_reside(nested_loop_desc, resource, reside_dce)
+        sol = _solve_gbuf_reside(nested_loop_desc, resource, reside_dce,
+                                 bufshr_grp_size=bufshr_grp_size)
+        if sol is not None:
+            yield sol
 
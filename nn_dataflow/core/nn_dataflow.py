@@ -15,17 +15,26 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
 from collections import defaultdict
+from multiprocessing.pool import Pool
+import os
+import pickle
 import sys
+import time
 
+from . import data_category_enum as de
+from . import mem_hier_enum as me
 from . import partition
+from .. import util
 from .cost import Cost
 from .data_layout import DataLayout
 from .fmap_range import FmapPosition, FmapRange
 from .inter_layer_pipeline import InterLayerPipeline
+from .layer import ConvLayer
 from .map_strategy import MapStrategy
 from .network import Network
 from .nn_dataflow_scheme import NNDataflowScheme
 from .resource import Resource
+from .schedule_cache import ScheduleCache
 from .scheduling import SchedulingCondition, Scheduling
 
 class NNDataflow():
@@ -70,6 +79,11 @@ class NNDataflow():
                                       self.resource)
         self.ordered_layer_list = self.ilp.ordered_layer_list()
 
+        # The live layers after each layer is scheduled, i.e., the scheduled,
+        # input, and external layers whose ofmaps are still used by the
+        # following layers.
+        self.live_layers_dict = self._make_live_layers_dict()
+
         # NNDataflowScheme tops.
         # The top schemes are organized by the ending layers, and keeping
         # extended to the end of the network.
@@ -78,18 +92,130 @@ class NNDataflow():
         # Default compare key function.
         self.cmp_key = lambda nndf: (nndf.total_cost, nndf.total_time)
 
-    def schedule_search(self, options):
+        # Segment lower-bound pruning stats, as a tuple of the numbers of the
+        # pruned segments and all segments.
+        self.segment_prune_stats = (0, 0)
+
+    def schedule_search(self, options, shared_pernode_cache=None):
         '''
         Search the optimized dataflows.
+
+        `shared_pernode_cache` is an optional dict of the per-node search
+        results to use, which can be shared across multiple searches in the
+        same process. Its keys include the resource, cost, and options, so it
+        is safe to share across different problems. A new one is used if None.
+        '''
+        self._set_cmp_key(options)
+
+        # Worker pool shared by all loop blocking searches, to avoid repeatedly
+        # creating and tearing down processes for each layer.
+        # With parallel segment search, each worker process also keeps a copy
+        # of this instance to search the segments.
+        if options.nprocesses <= 1:
+            pool = None
+        elif options.parallel_segment_search:
+            pool = Pool(processes=options.nprocesses,
+                        initializer=_init_segment_worker,
+                        initargs=(self.network, self.batch_size,
+                                  self.resource, self.cost, self.map_strategy,
+                                  options))
+        else:
+            pool = Pool(processes=options.nprocesses)
+        # Persistent cache of the per-node search results across runs.
+        persistent_cache = ScheduleCache(options.sched_cache_dir) \
+                if options.sched_cache_dir else None
+        # Per-node search results shared across layers, since many different
+        # layers have the same shape after partitioning.
+        if shared_pernode_cache is None:
+            shared_pernode_cache = {}
+        for sched in self.layer_sched_dict.values():
+            sched.pool = pool
+            sched.persistent_cache = persistent_cache
+            sched.shared_pernode_cache = shared_pernode_cache
+
+        try:
+            nndf_tops = self._schedule_search(options, pool=pool)
+        finally:
+            for sched in self.layer_sched_dict.values():
+                sched.pool = None
+                sched.persistent_cache = None
+                sched.shared_pernode_cache = None
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if persistent_cache is not None:
+                persistent_cache.close()
+
+        # Cache stats.
+        cache_hits = 0
+        cache_misses = 0
+        seen_scheds = set()
+        for sched in self.layer_sched_dict.values():
+            if sched in seen_scheds:
+                continue
+            seen_scheds.add(sched)
+            h, m = sched.cache_stats()
+            cache_hits += h
+            cache_misses += m
+
+        return nndf_tops, (cache_hits, cache_misses)
+
+    def _set_cmp_key(self, options):
+        '''
+        Set the compare key function according to the optimization goal.
         '''
-        # Set key function.
         if options.opt_goal == 'ed':
             self.cmp_key = lambda nndf: nndf.total_cost * nndf.total_time
         elif options.opt_goal == 'd':
             self.cmp_key = lambda nndf: (nndf.total_time, nndf.total_cost)
         else:
-            assert options.opt_goal == 'e'
+            assert options.opt_goal in ('e', 'pareto')
 
+    def _pick_tops(self, nndf_tops, options, layer_name=None,
+                   in_segment=False):
+        '''
+        Pick the top n NNDataflowScheme instances by the compare key, or the
+        Pareto-optimal frontier of the total cost and time capped at n.
+
+        If `options.layer_dp_state_merge`, only keep the best one among the
+        partial schedules up to the layer `layer_name` with the same state for
+        the following layers, since they would be extended in the same way.
+        `in_segment` indicates whether the following layers continue the last
+        segment.
+        '''
+        if options.opt_goal == 'pareto':
+            return util.pareto_frontier(
+                nndf_tops, key=lambda nndf: (nndf.total_cost, nndf.total_time),
+                cap=options.ntops)
+
+        nndf_tops = sorted(nndf_tops, key=self.cmp_key)
+        # No need to merge for the last layer, without following layers.
+        if not options.layer_dp_state_merge or layer_name is None \
+                or layer_name == self.ordered_layer_list[-1]:
+            return nndf_tops[:options.ntops]
+
+        live_layers = self.live_layers_dict[layer_name]
+        tops = []
+        states = set()
+        for nndf in nndf_tops:
+            state = nndf.dp_state(live_layers, in_segment=in_segment)
+            if state in states:
+                continue
+            states.add(state)
+            tops.append(nndf)
+            if len(tops) >= options.ntops:
+                break
+        return tops
+
+    def _schedule_search(self, options, pool=None):
+        '''
+        Search the optimized dataflows layer by layer. Return the final top
+        NNDataflowScheme instances.
+
+        `pool` is the shared worker pool. With parallel segment search, the
+        segments ending at the same layer are searched in parallel by the
+        workers.
+        '''
         # Group the segments by the ending layers.
         segments = defaultdict(list)
         for seg in self.ilp.gen_segment(options):
@@ -99,36 +225,144 @@ class NNDataflow():
         # Clear and reset.
         self.nndf_tops = {}
 
+        # Checkpoint.
+        ckpt_key = self._checkpoint_key(options) \
+                if options.checkpoint_path else None
+        if options.checkpoint_resume:
+            self.nndf_tops = self._load_checkpoint(options.checkpoint_path,
+                                                   ckpt_key)
+            if options.verbose and self.nndf_tops:
+                sys.stderr.write('Resume from checkpoint {} with {} layers '
+                                 'done.\n'.format(options.checkpoint_path,
+                                                  len(self.nndf_tops) - 1))
+                sys.stderr.flush()
+
         # Initial input layout.
-        self.nndf_tops[None] = []
-        for input_layout, ext_layout_dict in self._gen_input_layout(options):
-            nndf = NNDataflowScheme(self.network, input_layout, ext_layout_dict)
-            self.nndf_tops[None].append(nndf)
+        if None not in self.nndf_tops:
+            self.nndf_tops[None] = []
+            for input_layout, ext_layout_dict \
+                    in self._gen_input_layout(options):
+                nndf = NNDataflowScheme(self.network, input_layout,
+                                        ext_layout_dict)
+                self.nndf_tops[None].append(nndf)
+
+        # Wall-clock time budget.
+        deadline = time.time() + options.time_budget
+        over_budget = False
+
+        def _degrade_if_over_budget(options):
+            ''' Degrade the options once the time budget is consumed. '''
+            nonlocal over_budget
+            if not over_budget and time.time() > deadline:
+                over_budget = True
+                options = self._over_budget_options(options)
+                if options.verbose:
+                    sys.stderr.write('Time budget exhausted, degrade search '
+                                     'for the remaining layers.\n')
+                    sys.stderr.flush()
+            return options
+
+        # Segment lower-bound pruning stats.
+        num_pruned_segs = 0
+        num_segs = 0
 
         # Schedule layers.
         for layer_name in self.ordered_layer_list:
+            if layer_name in self.nndf_tops:
+                # Already done in the resumed checkpoint.
+                continue
+
             if options.verbose:
                 sys.stderr.write('-> {}\n'.format(layer_name))
                 sys.stderr.flush()
 
+            # Degrade the search for the remaining layers once the time budget
+            # is consumed, in order to quickly finish a complete schedule.
+            options = _degrade_if_over_budget(options)
+
             # The top schemes ending with the current layer.
             tops = []
 
             # The segments ended with the current layer. Use them to extend the
             # current top schemes.
-            for seg in segments[layer_name]:
-                if options.verbose:
-                    sys.stderr.write('  - {}\n'.format(seg.seg))
-                    sys.stderr.flush()
-                tops += self._segment_schedule_search(seg, options)
+            # Only schedule individual layers without pipelining if over
+            # budget.
+            layer_segments = [seg for seg in segments[layer_name]
+                              if not over_budget
+                              or (len(seg) == 1 and len(seg[0]) == 1)]
+
+            if options.parallel_segment_search and pool is not None \
+                    and len(layer_segments) > 1:
+                # The segments are independent of each other. Search in two
+                # waves: first the single-layer segments, then the others
+                # which are pruned by the lower bound against the tops of the
+                # first wave. Use ordered imap in each wave, and merge the
+                # results in the same order as sequential search.
+                # Loop blocking search is sequential in each worker.
+                worker_options = options._replace(nprocesses=1)
+                seg_tops_dict = {}
+                for wave in [True, False]:
+                    wave_segments = []
+                    for idx, seg in enumerate(layer_segments):
+                        if (len(seg) == 1 and len(seg[0]) == 1) != wave:
+                            continue
+                        prev_nndf_tops = self._prev_nndf_tops(seg)
+                        num_segs += 1
+                        if self._prune_segment(seg, prev_nndf_tops, tops,
+                                               options, layer_name):
+                            num_pruned_segs += 1
+                            continue
+                        wave_segments.append((idx, seg, prev_nndf_tops))
+                    results = pool.imap(
+                        _segment_schedule_search_worker,
+                        [(seg, prev_nndf_tops, worker_options, deadline)
+                         for _, seg, prev_nndf_tops in wave_segments])
+                    for (idx, seg, _), seg_tops in zip(wave_segments,
+                                                       results):
+                        if options.verbose:
+                            sys.stderr.write('  - {}\n'.format(seg.seg))
+                            sys.stderr.flush()
+                        seg_tops_dict[idx] = seg_tops
+                        tops += seg_tops
+                # Merge in the sequential order.
+                tops = [nndf for idx in range(len(layer_segments))
+                        for nndf in seg_tops_dict.get(idx, [])]
+            else:
+                for seg in layer_segments:
+                    # Also check the time budget within the layer.
+                    options = _degrade_if_over_budget(options)
+                    if over_budget and (len(seg) > 1 or len(seg[0]) > 1):
+                        continue
+
+                    prev_nndf_tops = self._prev_nndf_tops(seg)
+                    num_segs += 1
+                    if self._prune_segment(seg, prev_nndf_tops, tops,
+                                           options, layer_name):
+                        num_pruned_segs += 1
+                        continue
+
+                    if options.verbose:
+                        sys.stderr.write('  - {}\n'.format(seg.seg))
+                        sys.stderr.flush()
+                    tops += self._segment_schedule_search(
+                        seg, prev_nndf_tops, options, deadline=deadline)
 
             # Always pick and keep top n.
-            tops = sorted(tops, key=self.cmp_key)[:options.ntops]
+            tops = self._pick_tops(tops, options, layer_name)
 
             # Add to the top list.
             assert layer_name not in self.nndf_tops
             self.nndf_tops[layer_name] = tops
 
+            if ckpt_key is not None:
+                self._save_checkpoint(options.checkpoint_path, ckpt_key)
+
+        self.segment_prune_stats = (num_pruned_segs, num_segs)
+        if options.verbose:
+            sys.stderr.write('Pruned {} of {} segments by lower bound.\n'
+                             .format(num_pruned_segs, num_segs))
+            sys.stderr.flush()
+
         # Final top schemes.
         nndf_tops = self.nndf_tops.get(self.ordered_layer_list[-1], [])
         if not nndf_tops:
@@ -137,35 +371,141 @@ class NNDataflow():
         for nndf in nndf_tops:
             assert len(nndf) == len(self.network)
 
-        # Cache stats.
-        cache_hits = 0
-        cache_misses = 0
-        seen_scheds = set()
-        for sched in self.layer_sched_dict.values():
-            if sched in seen_scheds:
-                continue
-            seen_scheds.add(sched)
-            h, m = sched.cache_stats()
-            cache_hits += h
-            cache_misses += m
+        return nndf_tops
 
-        return nndf_tops, (cache_hits, cache_misses)
+    def _checkpoint_key(self, options):
+        '''
+        Get the key identifying the search problem of a checkpoint.
+        '''
+        # Exclude the options that do not affect the results.
+        options = options.result_key()
+        return ScheduleCache.make_key(
+            str(self.network),
+            [(l, self.network[l]) for l in self.network],
+            self.batch_size, self.resource, self.cost, self.map_strategy,
+            options)
+
+    def _save_checkpoint(self, path, key):
+        '''
+        Save the top schemes of the scheduled layers to the checkpoint file.
+        '''
+        # Write to a temporary file first, so the previous checkpoint survives
+        # if killed during writing.
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as fh:
+            pickle.dump((key, self.nndf_tops), fh)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _load_checkpoint(path, key):
+        '''
+        Load the top schemes of the scheduled layers from the checkpoint file.
+        Return an empty dict if the file does not exist.
+        '''
+        if not os.path.isfile(path):
+            return {}
+        with open(path, 'rb') as fh:
+            ckpt_key, nndf_tops = pickle.load(fh)
+        if ckpt_key != key:
+            raise ValueError('NNDataflow: checkpoint {} does not match the '
+                             'network, resource, cost, or options.'
+                             .format(path))
+        return nndf_tops
+
+    @staticmethod
+    def _over_budget_options(options):
+        '''
+        Get the degraded options used after the time budget is consumed.
 
-    def _segment_schedule_search(self, segment, options):
+        Only keep the top one scheme, and use the analytical loop blocking
+        solver if allowed, i.e., all but one data categories can bypass GBUF.
         '''
-        Schedule the given PipelineSegment `segment`.
+        options = options._replace(ntops=1)
+        if sum(options.sw_gbuf_bypass) >= de.NUM - 1:
+            options = options._replace(sw_solve_loopblocking=True)
+        return options
 
-        Return new top NNDataflowScheme instances that include this segment.
-        Will NOT update the `nndf_tops` attribute.
+    def _prev_nndf_tops(self, segment):
+        '''
+        Get the top NNDataflowScheme instances that end with the latest layer
+        before the given PipelineSegment `segment`.
         '''
-        # We take the top schemes that end with the latest previous layer as
-        # the initial state.
         first_layer_idx = self.ordered_layer_list.index(segment[0][0])
         if first_layer_idx == 0:
-            prev_nndf_tops = self.nndf_tops[None]
-        else:
-            prev_nndf_tops = self.nndf_tops.get(
-                self.ordered_layer_list[first_layer_idx - 1], [])
+            return self.nndf_tops[None]
+        return self.nndf_tops.get(
+            self.ordered_layer_list[first_layer_idx - 1], [])
+
+    def _prune_segment(self, segment, prev_nndf_tops, tops, options,
+                       layer_name):
+        '''
+        Whether to skip the PipelineSegment `segment`, if its lower bound
+        cannot beat the current top n of the schemes `tops` ending at the layer
+        `layer_name`.
+
+        The constraints of the pruned segment are all skipped, which does not
+        affect the frontier filtering of other segments, so the top schemes are
+        unchanged.
+        '''
+        if not options.segment_bound_prune or options.opt_goal != 'e':
+            return False
+        curr_tops = self._pick_tops(tops, options, layer_name)
+        if len(curr_tops) >= options.ntops \
+                and self._segment_cost_lower_bound(segment, prev_nndf_tops) \
+                > curr_tops[-1].total_cost:
+            if options.verbose:
+                sys.stderr.write('  - {} pruned\n'.format(segment.seg))
+                sys.stderr.flush()
+            return True
+        return False
+
+    def _segment_cost_lower_bound(self, segment, prev_nndf_tops):
+        '''
+        Get the lower bound of the total cost of the schemes that extend the
+        previous top NNDataflowScheme instances `prev_nndf_tops` with the
+        given PipelineSegment `segment`.
+
+        The static cost is excluded, as it may be adjusted by pipelining. Each
+        layer at least costs its ops and fetching its filters from DRAM once,
+        unless the filters can be pinned on-chip without time multiplexing.
+        '''
+        if not prev_nndf_tops:
+            return float('inf')
+
+        # Total cost is no less than the sum of the non-static layer cost.
+        prev_cost = min(nndf.sum_cost - nndf.sum_static_cost
+                        for nndf in prev_nndf_tops)
+
+        seg_cost = 0
+        for ltpl, rtpl in zip(segment, segment.allocation()):
+            for layer_name, resource in zip(ltpl, rtpl):
+                layer = self.network[layer_name]
+                seg_cost += layer.total_ops(self.batch_size) \
+                        * self.cost.mac_op
+                if isinstance(layer, ConvLayer) and not resource.no_time_mux:
+                    seg_cost += layer.total_filter_size() \
+                            * self.cost.mem_hier[me.DRAM]
+
+        # Leave a margin for the approximate ops count with partitioning. The
+        # scheduled ops of each layer are only checked to be within a relative
+        # tolerance of 1e-4 to the layer ops (see Scheduling.schedule_search),
+        # and the filter fetch and all other costs are non-negative, so a
+        # relative margin of 1e-3 on the segment cost keeps the bound safe.
+        return prev_cost + seg_cost * (1 - 1e-3)
+
+    def _segment_schedule_search(self, segment, prev_nndf_tops, options,
+                                 deadline=float('inf')):
+        '''
+        Schedule the given PipelineSegment `segment`, starting from the
+        previous top NNDataflowScheme instances `prev_nndf_tops`, i.e., those
+        that end with the latest layer before the segment.
+
+        The constraints of a multi-layer segment are no longer explored after
+        the wall-clock `deadline`.
+
+        Return new top NNDataflowScheme instances that include this segment.
+        Will NOT update the `nndf_tops` attribute.
+        '''
         if not prev_nndf_tops:
             return []
 
@@ -194,9 +534,14 @@ class NNDataflow():
         # Cost hint Pareto-optimal frontier.
         frontier = set()
 
+        multi_layer = len(segment) > 1 or len(segment[0]) > 1
+
         # Explore constraints.
         for constraint, hints in segment.gen_constraint(max_time_ovhd):
 
+            if multi_layer and time.time() > deadline:
+                break
+
             # Filter out off-frontier constraints.
             if any(all(h >= fh for h, fh in zip(hints, fhints))
                    for fhints in frontier):
@@ -230,7 +575,7 @@ class NNDataflow():
             nndf_tops += seg_nndf_tops
 
         # Always pick and keep top n.
-        return sorted(nndf_tops, key=self.cmp_key)[:options.ntops]
+        return self._pick_tops(nndf_tops, options, segment[-1][-1])
 
     def _layer_schedule_search(self, layer_name, resource, constraint,
                                spatial_idx, temporal_idx, fwd_data_region,
@@ -291,7 +636,26 @@ class NNDataflow():
                 nndf_tops.append(nndf)
 
         # Always pick and keep top n at each layer.
-        return sorted(nndf_tops, key=self.cmp_key)[:options.ntops]
+        return self._pick_tops(nndf_tops, options, layer_name,
+                               in_segment=True)
+
+    def _make_live_layers_dict(self):
+        '''
+        Make the dict mapping each layer to the live layers after it is
+        scheduled, in the order of `ordered_layer_list`.
+        '''
+        last_use = {}
+        for idx, layer_name in enumerate(self.ordered_layer_list):
+            for p in self.network.prevs(layer_name):
+                last_use[p] = idx
+
+        live_layers_dict = {}
+        candidates = [None] + list(self.network.ext_layers())
+        for idx, layer_name in enumerate(self.ordered_layer_list):
+            candidates.append(layer_name)
+            live_layers_dict[layer_name] = tuple(
+                l for l in candidates if last_use.get(l, -1) > idx)
+        return live_layers_dict
 
     def _gen_input_layout(self, options):
         '''
@@ -334,3 +698,34 @@ class NNDataflow():
                  for ext_frng in ext_frngs])) if ext_layers else None
 
             yield input_layout, ext_layout_dict
+
+
+# Per-process NNDataflow instance for parallel segment search.
+_SEGMENT_WORKER = None
+
+def _init_segment_worker(network, batch_size, resource, cost, map_strategy,
+                         options):
+    '''
+    Initialize the worker process for parallel segment search, with its own
+    NNDataflow instance and caches, which stay warm across tasks.
+    '''
+    global _SEGMENT_WORKER  # pylint: disable=global-statement
+    nnd = NNDataflow(network, batch_size, resource, cost, map_strategy)
+    nnd._set_cmp_key(options)  # pylint: disable=protected-access
+    persistent_cache = ScheduleCache(options.sched_cache_dir) \
+            if options.sched_cache_dir else None
+    shared_pernode_cache = {}
+    for sched in nnd.layer_sched_dict.values():
+        sched.persistent_cache = persistent_cache
+        sched.shared_pernode_cache = shared_pernode_cache
+    _SEGMENT_WORKER = nnd
+
+
+def _segment_schedule_search_worker(args):
+    '''
+    Worker task for parallel segment search.
+    '''
+    segment, prev_nndf_tops, options, deadline = args
+    # pylint: disable=protected-access
+    return _SEGMENT_WORKER._segment_schedule_search(segment, prev_nndf_tops,
+                                                    options, deadline=deadline)
@@ -16,9 +16,9 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 
 from collections import OrderedDict
 from collections.abc import MutableMapping
+import copy
 
 from . import mem_hier_enum as me
-from .. import util
 from .data_layout import DataLayout
 from .network import Network
 from .pipeline_segment_timing import PipelineSegmentTiming
@@ -28,7 +28,18 @@ class NNDataflowScheme(MutableMapping):
     '''
     Neural network dataflow result, as a specialized OrderedDict of layer
     scheduling results.
+
+    The scheduled layers and the finished segment timing are stored as
+    persistent linked lists, which are structurally shared among the copies.
+    So copying and then extending with a new layer take constant time
+    regardless of the number of scheduled layers.
+
+    The positions of the scheduled layers are indexed in an append-only index,
+    which is also shared among the copies as long as they schedule the layers
+    in the same order, so checking whether a layer is scheduled also takes
+    constant time.
     '''
+    # pylint: disable=too-many-instance-attributes
 
     def __init__(self, network, input_layout, ext_layout_dict=None):
         # pylint: disable=super-init-not-called
@@ -54,7 +65,17 @@ class NNDataflowScheme(MutableMapping):
         self.input_layout = input_layout
         self.ext_layout_dict = ext_layout_dict
 
-        self.res_dict = OrderedDict()
+        # Scheduled layers as a linked list from the latest one, with each
+        # node a tuple of (layer name, SchedulingResult, next node).
+        self._res_chain = None
+        self._num_layers = 0
+        # Shared append-only index of the scheduled layer names in order, and
+        # the positions of the names. The first `_num_layers` names are the
+        # scheduled layers of this instance.
+        self._layer_order = []
+        self._layer_pos = {}
+        # Lazily materialized dict of the scheduled layers.
+        self._res_dict = None
 
         # Naive sum of all layer cost.
         self.sum_cost = 0
@@ -62,14 +83,36 @@ class NNDataflowScheme(MutableMapping):
         # Naive sum of all layer time, used to adjust cost.
         self.sum_time = 0
 
-        # A list of segment schedule timing information.
-        self.segment_timing_list = []
+        # Timing information of the finished segments as a linked list from
+        # the latest one, with each node a tuple of (PipelineSegmentTiming,
+        # next node), and the sum of their time.
+        self._prev_seg_timing_chain = None
+        self._prev_seg_time = 0
+        # Timing information of the last segment, which is copied on write if
+        # shared with the copies.
+        self._last_seg_timing = None
+        self._last_seg_timing_shared = False
 
         self.last_seg_idx = -1
 
+    def __contains__(self, layer_name):
+        ''' Whether the layer is scheduled. '''
+        pos = self._layer_pos.get(layer_name)
+        return pos is not None and pos < self._num_layers
+
     def __getitem__(self, layer_name):
         ''' Get the SchedulingResult of a scheduled layer. '''
-        return self.res_dict[layer_name]
+        if layer_name not in self:
+            raise KeyError(layer_name)
+        if self._res_dict is not None:
+            return self._res_dict[layer_name]
+        # Walk back from the latest layer, which is fast for the recent
+        # previous layers.
+        node = self._res_chain
+        for _ in range(self._num_layers - 1 - self._layer_pos[layer_name]):
+            node = node[2]
+        assert node[0] == layer_name
+        return node[1]
 
     def __setitem__(self, layer_name, sched_result):
         ''' Add the SchedulingResult of a new layer. '''
@@ -77,7 +120,7 @@ class NNDataflowScheme(MutableMapping):
             raise KeyError('NNDataflowScheme: layer {} does not belong to '
                            'network {}.'
                            .format(layer_name, self.network.net_name))
-        if layer_name in self.res_dict:
+        if layer_name in self:
             raise KeyError('NNDataflowScheme: layer {} already exists.'
                            .format(layer_name))
         if not isinstance(sched_result, SchedulingResult):
@@ -88,30 +131,50 @@ class NNDataflowScheme(MutableMapping):
         for p in prevs:
             if p is None or p in self.network.ext_layers():
                 continue
-            if p not in self.res_dict:
+            if p not in self:
                 raise KeyError('NNDataflowScheme: layer {} has its previous '
                                'layer {} not scheduled yet.'
                                .format(layer_name, p))
 
-        self.res_dict[layer_name] = sched_result
+        seg_idx = sched_result.sched_seq[0]
+        if seg_idx not in (self.last_seg_idx, self.last_seg_idx + 1):
+            raise ValueError('NNDataflowScheme: segment index is invalid. '
+                             'segment {} follows {}.'
+                             .format(seg_idx, self.last_seg_idx))
+
+        pos = self._num_layers
+        if len(self._layer_order) > pos \
+                and self._layer_order[pos] != layer_name:
+            # Diverge from the other copies sharing the index.
+            self._layer_order = self._layer_order[:pos]
+            self._layer_pos = {l: p for p, l in enumerate(self._layer_order)}
+        if len(self._layer_order) == pos:
+            self._layer_order.append(layer_name)
+            self._layer_pos[layer_name] = pos
+
+        self._res_chain = (layer_name, sched_result, self._res_chain)
+        self._num_layers += 1
+        self._res_dict = None
 
         self.sum_cost += sched_result.total_cost
         self.sum_static_cost += sched_result.scheme['cost_static']
         self.sum_time += sched_result.total_time
 
-        seg_idx = sched_result.sched_seq[0]
         if seg_idx == self.last_seg_idx + 1:
-            self.segment_timing_list.append(
-                PipelineSegmentTiming(self.network, seg_idx))
+            if self._last_seg_timing is not None:
+                # Finish the last segment.
+                self._prev_seg_timing_chain = (self._last_seg_timing,
+                                               self._prev_seg_timing_chain)
+                self._prev_seg_time += self._last_seg_timing.time
+            self._last_seg_timing = PipelineSegmentTiming(self.network,
+                                                          seg_idx)
+            self._last_seg_timing_shared = False
             self.last_seg_idx += 1
-        elif seg_idx == self.last_seg_idx:
-            pass
-        else:
-            raise ValueError('NNDataflowScheme: segment index is invalid. '
-                             'segment {} follows {}.'
-                             .format(seg_idx, self.last_seg_idx))
-        assert len(self.segment_timing_list) - 1 == self.last_seg_idx
-        self.segment_timing_list[-1].add(layer_name, sched_result)
+        elif self._last_seg_timing_shared:
+            self._last_seg_timing = self._last_seg_timing.copy()
+            self._last_seg_timing_shared = False
+        assert self._last_seg_timing.seg_idx == self.last_seg_idx
+        self._last_seg_timing.add(layer_name, sched_result)
 
     def __delitem__(self, layer_name):
         ''' Not legal to call. '''
@@ -124,36 +187,104 @@ class NNDataflowScheme(MutableMapping):
 
     def __len__(self):
         ''' Get the number of scheduled layers. '''
-        return len(self.res_dict)
+        return self._num_layers
+
+    def __getstate__(self):
+        # Flatten the linked lists, to avoid deep recursion in pickling.
+        state = self.__dict__.copy()
+        state['_res_chain'] = list(self.res_dict.items())
+        state['_res_dict'] = None
+        state['_layer_order'] = None
+        state['_layer_pos'] = None
+        state['_prev_seg_timing_chain'] = self.segment_timing_list[:-1]
+        return state
+
+    def __setstate__(self, state):
+        res_chain = None
+        for layer_name, sched_result in state['_res_chain']:
+            res_chain = (layer_name, sched_result, res_chain)
+        state['_layer_order'] = [l for l, _ in state['_res_chain']]
+        state['_layer_pos'] = {l: p for p, l
+                               in enumerate(state['_layer_order'])}
+        state['_res_chain'] = res_chain
+        seg_timing_chain = None
+        for timing in state['_prev_seg_timing_chain']:
+            seg_timing_chain = (timing, seg_timing_chain)
+        state['_prev_seg_timing_chain'] = seg_timing_chain
+        self.__dict__.update(state)
+
+    @property
+    def res_dict(self):
+        ''' Get an OrderedDict of the SchedulingResult of all layers. '''
+        if self._res_dict is None:
+            items = []
+            node = self._res_chain
+            while node is not None:
+                items.append(node[:2])
+                node = node[2]
+            self._res_dict = OrderedDict(reversed(items))
+        return self._res_dict
+
+    @property
+    def segment_timing_list(self):
+        ''' Get a list of segment schedule timing information. '''
+        if self._last_seg_timing is None:
+            return []
+        timing_list = [self._last_seg_timing]
+        node = self._prev_seg_timing_chain
+        while node is not None:
+            timing_list.append(node[0])
+            node = node[1]
+        return timing_list[::-1]
 
     def copy(self):
         '''
         Return a shallow copy.
 
         Shallow copy of layer SchedulingResult is sufficient, since they are
-        read-only.
+        read-only. The scheduled layers are structurally shared.
         '''
-        nndf = NNDataflowScheme(self.network, self.input_layout,
-                                self.ext_layout_dict)
-        nndf.update(self)
-        assert util.isclose(nndf.total_cost, self.total_cost, rel_tol=1e-5)
-        assert util.isclose(nndf.total_time, self.total_time, rel_tol=1e-5)
+        nndf = copy.copy(self)
+        self._last_seg_timing_shared = True
+        # The copy is the same class, so mark its shared state directly.
+        nndf._last_seg_timing_shared = True  # pylint: disable=protected-access
         return nndf
 
     def fmap_layout(self, layers):
         '''
         Get a DataLayout instance that merges the ofmaps of all given layers.
         '''
-        def _ofmap_layout(layer_name):
-            if layer_name is None:
-                return self.input_layout
-            try:
-                return self.ext_layout_dict[layer_name]
-            except KeyError:
-                pass
-            return self.res_dict[layer_name].ofmap_layout
+        return DataLayout.concat(*[self._ofmap_layout(l) for l in layers])
 
-        return DataLayout.concat(*[_ofmap_layout(l) for l in layers])
+    def dp_state(self, live_layers, in_segment=False):
+        '''
+        Get the state of the partial schedule that determines the scheduling
+        of the following layers, as a hashable tuple.
+
+        `live_layers` are the layers whose ofmaps are used by the following
+        layers. If `in_segment`, the following layers continue the last
+        segment, so the state also includes the timing and the top blocking
+        factors of the layers in the last segment.
+        '''
+        state = (self.last_seg_idx,
+                 tuple(self._ofmap_layout(l) for l in live_layers))
+        if in_segment and self._last_seg_timing is not None:
+            timing = self._last_seg_timing
+            state += (timing.bat_ngrp,
+                      tuple(tuple(tlist) for tlist in timing.timing_list),
+                      tuple(self[l].scheme['to'][0]
+                            for l in timing.layer2idx))
+        return state
+
+    def _ofmap_layout(self, layer_name):
+        ''' Get the ofmap DataLayout of the given layer. '''
+        if layer_name is None:
+            return self.input_layout
+        try:
+            return self.ext_layout_dict[layer_name]
+        except KeyError:
+            pass
+        return self[layer_name].ofmap_layout
 
     @property
     def total_cost(self):
@@ -167,30 +298,32 @@ class NNDataflowScheme(MutableMapping):
     @property
     def total_time(self):
         ''' Get the total time. '''
+        if self._last_seg_timing is None:
+            return 0
         # Special case, when the entire network fits in one segment. No
         # pipeline filling/draining delay.
-        if len(self.segment_timing_list) == 1 \
+        if self._prev_seg_timing_chain is None \
                 and self.__len__() == len(self.network):
-            return self.segment_timing_list[0].critical_time
-        return sum(t.time for t in self.segment_timing_list)
+            return self._last_seg_timing.critical_time
+        return self._prev_seg_time + self._last_seg_timing.time
 
     @property
     def total_ops(self):
         ''' Get the total ops. '''
-        return sum(sr.total_ops for sr in self.values())
+        return sum(sr.total_ops for sr in self.res_dict.values())
 
     @property
     def total_accesses(self):
         ''' Get the total accesses at all memory hierarchies as a list. '''
         accesses = [0] * me.NUM
-        for sr in self.values():
+        for sr in self.res_dict.values():
             accesses = [a + a1 for a, a1 in zip(accesses, sr.total_accesses)]
         return accesses
 
     @property
     def total_noc_hops(self):
         ''' Get the total NoC hops. '''
-        return sum(sr.total_noc_hops for sr in self.values())
+        return sum(sr.total_noc_hops for sr in self.res_dict.values())
 
     def segment_time_list(self):
         ''' Get the time for each segment. '''
@@ -33,6 +33,16 @@ OPTION_LIST = ['sw_gbuf_bypass',
                'opt_goal',
                'ntops',
                'nprocesses',
+               'loopblocking_chunk_size',
+               'loopblocking_bound_prune',
+               'sched_cache_dir',
+               'time_budget',
+               'checkpoint_path',
+               'checkpoint_resume',
+               'parallel_segment_search',
+               'layer_dp_state_merge',
+               'segment_bound_prune',
+               'partition_bound_prune',
                'verbose',
               ]
 
@@ -76,6 +86,16 @@ class Option(namedtuple('Option', OPTION_LIST)):
         kwdict.setdefault('opt_goal', 'e')
         kwdict.setdefault('ntops', 1)
         kwdict.setdefault('nprocesses', 1)
+        kwdict.setdefault('loopblocking_chunk_size', 0)
+        kwdict.setdefault('loopblocking_bound_prune', True)
+        kwdict.setdefault('sched_cache_dir', None)
+        kwdict.setdefault('time_budget', float('inf'))
+        kwdict.setdefault('checkpoint_path', None)
+        kwdict.setdefault('checkpoint_resume', False)
+        kwdict.setdefault('parallel_segment_search', False)
+        kwdict.setdefault('layer_dp_state_merge', False)
+        kwdict.setdefault('segment_bound_prune', True)
+        kwdict.setdefault('partition_bound_prune', True)
         kwdict.setdefault('verbose', False)
 
         assert set(kwdict) == set(OPTION_LIST)
@@ -88,20 +108,10 @@ class Option(namedtuple('Option', OPTION_LIST)):
             raise ValueError('Option: sw_gbuf_bypass must have length {}'
                              .format(de.NUM))
 
-        if ntp.sw_solve_loopblocking and ntp.hw_gbuf_sharing:
-            raise ValueError('Option: sw_solve_loopblocking and '
-                             'hw_gbuf_sharing cannot be simultaneously '
-                             'enabled.')
-
         if ntp.hw_access_forwarding and ntp.hw_gbuf_sharing:
             raise ValueError('Option: hw_access_forwarding is implied by '
                              'hw_gbuf_sharing, thus cannot be both enabled.')
 
-        if ntp.sw_solve_loopblocking and ntp.hw_gbuf_save_writeback:
-            raise ValueError('Option: sw_solve_loopblocking and '
-                             'hw_gbuf_save_writeback cannot be simultaneously '
-                             'enabled.')
-
         if ntp.partition_ifmaps and not ntp.partition_hybrid:
             raise ValueError('Option: partition_ifmaps requires '
                              'partition_hybrid to be set.')
@@ -120,9 +130,34 @@ class Option(namedtuple('Option', OPTION_LIST)):
             raise ValueError('Option: layer_pipeline_max_degree must be '
                              'positive.')
 
-        if ntp.opt_goal not in ['e', 'd', 'ed']:
+        if ntp.opt_goal not in ['e', 'd', 'ed', 'pareto']:
             raise ValueError('Option: opt_goal is invalid, must be one of '
-                             '\'e\', \'d\', and \'ed\'.')
+                             '\'e\', \'d\', \'ed\', and \'pareto\'.')
+
+        if not isinstance(ntp.loopblocking_chunk_size, int):
+            raise TypeError('Option: loopblocking_chunk_size must be an '
+                            'integer.')
+        if ntp.loopblocking_chunk_size < 0:
+            raise ValueError('Option: loopblocking_chunk_size must be '
+                             'non-negative, 0 for automatic.')
+
+        if ntp.sched_cache_dir is not None \
+                and not isinstance(ntp.sched_cache_dir, str):
+            raise TypeError('Option: sched_cache_dir must be None or a '
+                            'string.')
+
+        if not isinstance(ntp.time_budget, (int, float)):
+            raise TypeError('Option: time_budget must be a number.')
+        if ntp.time_budget < 0:
+            raise ValueError('Option: time_budget must be non-negative.')
+
+        if ntp.checkpoint_path is not None \
+                and not isinstance(ntp.checkpoint_path, str):
+            raise TypeError('Option: checkpoint_path must be None or a '
+                            'string.')
+        if ntp.checkpoint_resume and not ntp.checkpoint_path:
+            raise ValueError('Option: checkpoint_resume requires '
+                             'checkpoint_path to be set.')
 
         return ntp
 
@@ -131,3 +166,26 @@ class Option(namedtuple('Option', OPTION_LIST)):
         ''' List of options. '''
         return OPTION_LIST
 
+
+    def result_key(self, per_node=False):
+        '''
+        Get the options used as part of the key of the search results, with
+        the options that do not affect the results reset to the defaults.
+
+        If `per_node`, also reset the options that only affect the
+        network-level search, but not the per-node search.
+        '''
+        options = self._replace(nprocesses=1,
+                                loopblocking_chunk_size=0,
+                                loopblocking_bound_prune=True,
+                                sched_cache_dir=None,
+                                time_budget=float('inf'),
+                                checkpoint_path=None,
+                                checkpoint_resume=False,
+                                parallel_segment_search=False,
+                                segment_bound_prune=True,
+                                partition_bound_prune=True,
+                                verbose=False)
+        if per_node:
+            options = options._replace(layer_dp_state_merge=False)
+        return options
@@ -17,12 +17,6 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 from collections import namedtuple, OrderedDict, Counter
 import itertools
 
-from sympy import symbols
-from sympy import Basic as symbasic
-from sympy import Eq as symeq
-from sympy.core.containers import Tuple as symtuple
-from sympy.functions.elementary.piecewise import Piecewise as sympiecewise
-
 from .. import util
 from .layer import ConvLayer
 from .network import Network
@@ -42,6 +36,8 @@ class PipelineSegment():
     # Scheduling index in the segment, as a tuple of spatial and temporal
     # scheduling indices.
     SchedIndex = namedtuple('SchedIndex', ['sp_idx', 'tm_idx'])
+    # Nested name for pickling.
+    SchedIndex.__qualname__ = 'PipelineSegment.SchedIndex'
 
     def __init__(self, seg, network, batch_size, resource, max_util_drop=0.05,
                  with_opt=True):
@@ -122,27 +118,26 @@ class PipelineSegment():
             pos = self.cstr_topbat_idx
             vals[pos] = [t for t in vals[pos] if t >= min_topbat]
 
+        # Compile the symbolic constraints into lookup tables, so each point
+        # in the product only substitutes the symbols once per layer.
+        compiled_symargs = self._compile_symargs(self.cstr_symargs, syms)
+
         for valp in itertools.product(*vals):
 
             constraint = tuple()
 
-            for atpl in self._subs_symargs(self.cstr_symargs,
-                                           tuple(zip(syms, valp))):
+            for ctpl_symargs in compiled_symargs:
                 ctpl = tuple()
-                for a in atpl:
-                    # Construct kwargs, adjust the types of the values.
-                    kwargs = {}
-                    kwargs['topbat'] = int(a.get('topbat', 0))
-                    kwargs['fbifm'] = bool(a.get('fbifm', False))
-                    if not kwargs['fbifm']:
-                        kwargs['topifm'] = int(a.get('topifm', 0))
-                    kwargs['fbofm'] = bool(a.get('fbofm', False))
-                    if not kwargs['fbofm']:
-                        kwargs['topofm'] = int(a.get('topofm', 0))
-                    kwargs['update_dict'] = a.get('update_dict')
-
-                    c = Cstr(**kwargs)
-                    ctpl += (c,)
+                for idxs, symarg, table in ctpl_symargs:
+                    key = tuple(valp[i] for i in idxs)
+                    kwargs = table.get(key)
+                    if kwargs is None:
+                        kwargs = self._make_cstr_kwargs(
+                            symarg, tuple((syms[i], valp[i]) for i in idxs))
+                        table[key] = kwargs
+                    # Always construct new instances, as the lazily updated
+                    # rules modify the constraint in-place.
+                    ctpl += (Cstr(**kwargs),)
                 constraint += (ctpl,)
 
             if None in valp:
@@ -585,6 +580,22 @@ class PipelineSegment():
         '''
         # pylint: disable=too-many-branches
 
+        if len(self.seg) == 1 and len(self.seg[0]) == 1:
+            # Fast path for a single layer, which is the only case without
+            # inter-layer pipelining. All the symbols would be used only once
+            # and removed, so there is no constraint, and no need to load the
+            # symbolic library.
+            self.cstr_symargs = [[{}]]
+            self.cstr_symvals = OrderedDict([('_dummy', [None])])
+            self.cstr_num_sp_fbs = 0
+            self.cstr_topbat_idx = None
+            return True
+
+        # Lazily import, which takes a long time.
+        from sympy import symbols
+        from sympy import Eq as symeq
+        from sympy import Piecewise as sympiecewise
+
         # Symbolic variables mapping to numerical values.
         symvals = dict()
 
@@ -845,6 +856,8 @@ class PipelineSegment():
 
         Return whether the symargs and symvals are already simplified.
         '''
+        from sympy import Tuple as symtuple
+
         for a in itertools.chain.from_iterable(symargs):
             is_fbifm = a.get('fbifm')
             is_fbofm = a.get('fbofm')
@@ -887,6 +900,8 @@ class PipelineSegment():
 
     def _simplify_symargs(self, symargs, symvals):
         ''' Simplify symargs and symvals in-place iteratively. '''
+        from sympy import Tuple as symtuple
+
         while not self._simplify_symargs_one_pass(symargs, symvals):
             pass
         used_syms = symtuple(
@@ -895,6 +910,53 @@ class PipelineSegment():
         assert set(used_syms) == set(symvals.keys())
         assert all(val for val in symvals.values())
 
+    @staticmethod
+    def _compile_symargs(symargs, syms):
+        '''
+        Compile the symbolic constraint args into per-layer lookup tables.
+
+        Return a nested lists of tuples `(idxs, symarg, table)` corresponding
+        to the layers, where `idxs` are the indices in `syms` of the symbols
+        used by the layer `symarg`, and `table` caches the constraint kwargs
+        keyed by the values of these symbols, which is filled lazily.
+        '''
+        sym_idx = dict((s, i) for i, s in enumerate(syms))
+
+        compiled = []
+        for atpl in symargs:
+            ctpl = []
+            for a in atpl:
+                free_syms = set()
+                for val in a.values():
+                    # Plain values and update_dict have no free symbols.
+                    free_syms |= getattr(val, 'free_symbols', set())
+                idxs = tuple(sorted(sym_idx[s] for s in free_syms))
+                ctpl.append((idxs, a, {}))
+            compiled.append(ctpl)
+        return compiled
+
+    @staticmethod
+    def _make_cstr_kwargs(symarg, subs_pairs):
+        '''
+        Make the constraint kwargs from the symbolic constraint args of a
+        layer, by substituting the symbols with the given (symbol, value)
+        pairs, and adjusting the types of the values.
+        '''
+        if subs_pairs:
+            a = PipelineSegment._subs_symargs([[symarg]], subs_pairs)[0][0]
+        else:
+            a = symarg
+        kwargs = {}
+        kwargs['topbat'] = int(a.get('topbat', 0))
+        kwargs['fbifm'] = bool(a.get('fbifm', False))
+        if not kwargs['fbifm']:
+            kwargs['topifm'] = int(a.get('topifm', 0))
+        kwargs['fbofm'] = bool(a.get('fbofm', False))
+        if not kwargs['fbofm']:
+            kwargs['topofm'] = int(a.get('topofm', 0))
+        kwargs['update_dict'] = a.get('update_dict')
+        return kwargs
+
     @staticmethod
     def _subs_symargs(symargs, *subs_args):
         '''
@@ -902,17 +964,20 @@ class PipelineSegment():
 
         Return a new substituted copy without modifying the original one.
         '''
+        from sympy import Tuple as symtuple
+
         # sympify=False is necessary because there may be str in the values.
         return [[dict((k, symtuple(a[k], sympify=False).subs(*subs_args)[0])
                       for k in a) for a in atpl] for atpl in symargs]
 
-    class TopOfmUpdateLambda(symbasic):
-        ''' A sympifi-able lambda function to lazily update topofm. '''
-        # pylint: disable=no-init
-        def __new__(cls, *args):
-            return super(PipelineSegment.TopOfmUpdateLambda, cls).__new__(cls)
+    class TopOfmUpdateLambda(util.ContentHashClass):
+        ''' A lambda function to lazily update topofm. '''
+        # pylint: disable=too-few-public-methods
         def __call__(self, arg_s, arg_r):
             setattr(arg_s, 'topofm', arg_r.scheme['to'][0])
+        def __repr__(self):
+            return '{}.{}()'.format(PipelineSegment.__name__,
+                                    self.__class__.__name__)
 
     def _lazify_topofm_symargs(self, symargs, symvals):
         '''
@@ -922,6 +987,8 @@ class PipelineSegment():
         layer and some local-region layers, we can turn it into a lazily update
         rule.
         '''
+        from sympy import Tuple as symtuple
+
         sym2conv = {}  # symbol --> the only CONV layer using it.
         sym2lrs = {}   # symbol --> list of local-region layer using it.
         unqual_syms = set()  # symbols used by two or more CONV layers.
@@ -15,6 +15,7 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
 from collections import namedtuple, OrderedDict
+import copy
 
 from . import loop_enum as le
 from .loop_blocking_scheme import LoopBlockingScheme
@@ -38,6 +39,8 @@ class PipelineSegmentTiming():
     LayerTiming = namedtuple('LayerTiming', ['time', 'node_time', 'dram_time',
                                              'num_nodes', 'ngrp',
                                              'ts_xb', 'td_xb'])
+    # Nested name for pickling.
+    LayerTiming.__qualname__ = 'PipelineSegmentTiming.LayerTiming'
 
     def __init__(self, network, seg_idx):
 
@@ -90,6 +93,17 @@ class PipelineSegmentTiming():
                         for timing in tlist)
         return (self.time - time_indv) / time_indv
 
+    def copy(self):
+        '''
+        Return a copy, which can be added with new layers independently.
+
+        The layer timing tuples are shared since they are read-only.
+        '''
+        timing = copy.copy(self)
+        timing.layer2idx = self.layer2idx.copy()
+        timing.timing_list = [tlist[:] for tlist in self.timing_list]
+        return timing
+
     def add(self, layer_name, sched_result):
         ''' Add the SchedulingResult of a new layer. '''
 
@@ -86,3 +86,26 @@ class Resource(namedtuple('Resource', RESOURCE_LIST)):
 
         return ntp
 
+    def canonical(self):
+        '''
+        Get the canonical form of the resource, with all node regions
+        translated so that the processing node region has the origin at
+        (0, 0).
+
+        Resources that only differ in the absolute offset of the node regions
+        have the same canonical form, which can be used to share the
+        scheduling results that only depend on the relative positions.
+        '''
+        offset = self.proc_region.origin
+        if offset == PhyDim2(0, 0):
+            return self
+
+        def _translate(region):
+            return region._replace(origin=region.origin - offset)
+
+        return self._replace(
+            proc_region=_translate(self.proc_region),
+            dram_region=_translate(self.dram_region),
+            src_data_region=_translate(self.src_data_region),
+            dst_data_region=_translate(self.dst_data_region))
+
@@ -0,0 +1,119 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+
+from .. import util
+from ..version import get_version
+
+class ScheduleCache():
+    '''
+    Persistent on-disk cache of scheduling results across runs.
+
+    The results are pickled and stored in an SQLite database under the given
+    directory, keyed by a stable hash of the scheduling arguments. The cache is
+    invalidated if the nn_dataflow version, including the local changes, does
+    not match the one that populated the cache.
+    '''
+
+    FILENAME = 'schedule_cache.sqlite'
+
+    def __init__(self, cache_dir, version=None):
+
+        if version is None:
+            version = get_version(with_local=True)
+        self.version = version
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, self.FILENAME)
+
+        # Allow long waiting for the lock, as multiple processes may share the
+        # cache.
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta '
+                              '(name TEXT PRIMARY KEY, value TEXT)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                              '(key TEXT PRIMARY KEY, value BLOB)')
+
+            row = self.conn.execute('SELECT value FROM meta '
+                                    'WHERE name = \'version\'').fetchone()
+            if row is None or row[0] != self.version:
+                # Invalidate the results of other versions.
+                self.conn.execute('DELETE FROM cache')
+                self.conn.execute('INSERT OR REPLACE INTO meta (name, value) '
+                                  'VALUES (\'version\', ?)', (self.version,))
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        '''
+        Get the cached value of the given `key`. Return None if not cached.
+        '''
+        row = self.conn.execute('SELECT value FROM cache WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key, value):
+        '''
+        Cache the value of the given `key`.
+        '''
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO cache (key, value) '
+                              'VALUES (?, ?)',
+                              (key, sqlite3.Binary(pickle.dumps(value))))
+
+    def close(self):
+        ''' Close the underlying database. '''
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    @staticmethod
+    def make_key(*args):
+        '''
+        Make a stable cache key from the arguments, which is consistent across
+        runs, unlike the built-in hash.
+        '''
+        return hashlib.sha1(repr(tuple(_stable_repr(a) for a in args))
+                            .encode()).hexdigest()
+
+
+def _stable_repr(obj):
+    '''
+    Get the representation of the object, which only depends on its content.
+    '''
+    if isinstance(obj, util.ContentHashClass):
+        return (obj.__class__.__name__,
+                tuple(sorted((k, _stable_repr(v))
+                             for k, v in obj.__dict__.items())))
+    if isinstance(obj, dict):
+        return tuple(sorted((repr(k), _stable_repr(v))
+                            for k, v in obj.items()))
+    if isinstance(obj, (set, frozenset)):
+        return tuple(sorted(repr(_stable_repr(v)) for v in obj))
+    if isinstance(obj, type):
+        return obj.__module__ + '.' + obj.__qualname__
+    return repr(obj)
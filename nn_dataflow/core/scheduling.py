@@ -30,6 +30,7 @@ from .fmap_range import FmapPosition, FmapRange
 from .layer import Layer
 from .map_strategy import MapStrategy
 from .resource import Resource
+from .schedule_cache import ScheduleCache
 from .scheduling_constraint import SchedulingConstraint
 
 class SchedulingCondition(namedtuple('SchedulingCondition',
@@ -137,6 +138,9 @@ class SchedulingResult(namedtuple('SchedulingResult',
         return self.scheme['num_nodes']
 
 
+_ResultBound = namedtuple('_ResultBound', ['total_cost', 'total_time'])
+
+
 class Scheduling():
     '''
     Layer scheduling.
@@ -161,6 +165,19 @@ class Scheduling():
         # Default compare key function.
         self.cmp_key = lambda res: (res.total_cost, res.total_time)
 
+        # Shared worker pool for loop blocking search. Not part of the cache
+        # keys, since it does not affect the results.
+        self.pool = None
+
+        # Persistent on-disk cache of the per-node search results shared
+        # across runs, a ScheduleCache instance.
+        self.persistent_cache = None
+
+        # In-memory cache of the per-node search results shared across the
+        # Scheduling instances of different layers, a dict keyed by the
+        # partitioned layer shape.
+        self.shared_pernode_cache = None
+
     @fastcache.clru_cache(maxsize=1024)
     def schedule_search(self, condition, options):
         '''
@@ -172,9 +189,7 @@ class Scheduling():
         elif options.opt_goal == 'd':
             self.cmp_key = lambda res: (res.total_time, res.total_cost)
         else:
-            assert options.opt_goal == 'e'
-
-        tops = []
+            assert options.opt_goal in ('e', 'pareto')
 
         resource = condition.resource
         proc_region = resource.proc_region
@@ -196,14 +211,44 @@ class Scheduling():
         # Filter nodes. All memory nodes can store filters. Deduplicate.
         filter_nodes = frozenset(resource.dram_region.iter_node())
 
-        # Explore parallel partitioning schemes.
+        # The single-node schedules only depend on the relative positions of
+        # the node regions. Use the canonical resource to share them across
+        # different region offsets. The absolute positions are accounted for
+        # by the ofmap layout and the NoC hops below.
+        canonical_resource = resource.canonical()
+
+        # Explore parallel partitioning schemes, and the single-node schedules
+        # of each.
+        part_lbs_tops = []
         for part in partition.gen_partition(self.layer, self.batch_size,
                                             proc_region.dim, options,
                                             guaranteed=True):
-            # Explore single-node schedules.
             lbs_tops = list(self.schedule_search_per_node(
-                part, resource, condition.constraint, options))
-            if not lbs_tops:
+                part, canonical_resource, condition.constraint, options))
+            if lbs_tops:
+                part_lbs_tops.append((part, lbs_tops))
+
+        # The NoC hops dominate the search time of the layers with small
+        # single-node search spaces, e.g., element-wise layers. Visit the
+        # partitioning schemes in the order of their lower bounds without the
+        # NoC cost, and skip those that cannot make into the top results.
+        bound_prune = options.partition_bound_prune and self.cost.noc_hop >= 0
+        part_idx_list = list(range(len(part_lbs_tops)))
+        if bound_prune:
+            part_bounds = [[self._result_lower_bound(lbs) for lbs in lbs_tops]
+                           for _, lbs_tops in part_lbs_tops]
+            part_idx_list.sort(key=lambda idx: min(
+                self.cmp_key(b) for b in part_bounds[idx]))
+
+        # Tuples of the indices and results, where the indices keep the
+        # original order to break ties.
+        tops = []
+
+        for part_idx in part_idx_list:
+            part, lbs_tops = part_lbs_tops[part_idx]
+
+            if bound_prune and self._is_pruned(part_bounds[part_idx], tops,
+                                               options):
                 continue
 
             # Ofmap layout.
@@ -223,12 +268,17 @@ class Scheduling():
                 filter_nodes, ifmap_layout, ofmap_layout, options)
 
             # Make scheduling result.
-            tops += [self._get_result(lbs, part, ofmap_layout,
-                                      condition.sched_seq, unit_nhops)
-                     for lbs in lbs_tops]
+            tops += [((part_idx, lbs_idx),
+                      self._get_result(lbs, part, ofmap_layout,
+                                       condition.sched_seq, unit_nhops))
+                     for lbs_idx, lbs in enumerate(lbs_tops)]
+
+            if options.opt_goal != 'pareto':
+                tops = sorted(tops, key=lambda tpl: (self.cmp_key(tpl[1]),
+                                                     tpl[0]))[:options.ntops]
 
         # Pick the top n.
-        tops = sorted(tops, key=self.cmp_key)[:options.ntops]
+        tops = self._pick_tops([res for _, res in sorted(tops)], options)
 
         # Check total op count.
         total_layer_ops = self.layer.total_ops(self.batch_size)
@@ -245,6 +295,53 @@ class Scheduling():
 
         return list(tops)
 
+    def _result_lower_bound(self, lbs):
+        '''
+        Get the lower bound of the scheduling result from the loop blocking
+        scheme, without the NoC cost which depends on the data layouts. Return
+        a _ResultBound instance, which has the total cost and time as the
+        scheduling results.
+        '''
+        # Finalize the lazily calculated stats before using the ops and time.
+        cost_access = lbs.get_access_cost(self.cost)
+        cost_op = self.cost.mac_op * lbs.ops
+        cost_static = self.cost.idl_unit * lbs.time
+        return _ResultBound(total_cost=cost_op + cost_access + cost_static,
+                            total_time=lbs.time)
+
+    def _is_pruned(self, bounds, tops, options):
+        '''
+        Whether the results with the lower bounds `bounds` cannot make into the
+        top results, given the current top results `tops` as tuples of the
+        indices and results.
+        '''
+        if options.opt_goal == 'pareto':
+            # Weakly dominated by a current result with different objectives.
+            # The actual results, no better than the bounds, cannot be on the
+            # frontier regardless of the order.
+            return all(any(res.total_cost <= b.total_cost
+                           and res.total_time <= b.total_time
+                           and (res.total_cost, res.total_time) != b
+                           for _, res in tops)
+                       for b in bounds)
+
+        # Keep the ties, which may be ordered before the current ones.
+        if len(tops) < options.ntops:
+            return False
+        worst_key = self.cmp_key(tops[-1][1])
+        return all(self.cmp_key(b) > worst_key for b in bounds)
+
+    def _pick_tops(self, tops, options):
+        '''
+        Pick the top n scheduling results by the compare key, or the
+        Pareto-optimal frontier of the total cost and time capped at n.
+        '''
+        if options.opt_goal == 'pareto':
+            return util.pareto_frontier(
+                tops, key=lambda res: (res.total_cost, res.total_time),
+                cap=options.ntops)
+        return sorted(tops, key=self.cmp_key)[:options.ntops]
+
     def cache_stats(self):
         '''
         Get the cache hits/misses stats. Return a tuple of (hits, misses).
@@ -260,12 +357,28 @@ class Scheduling():
         single node after partitioning. Return the top LoopBlockingScheme
         instances.
         '''
-        lbs_tops = []
-
         # Partitioned layer.
         p_layer, p_batch_size, p_occ = part.part_layer(self.layer,
                                                        self.batch_size)
 
+        key = self._pernode_key(p_layer, p_batch_size, p_occ, part, resource,
+                                constraint, options)
+
+        if self.shared_pernode_cache is not None:
+            lbs_tops = self.shared_pernode_cache.get(key, None)
+            if lbs_tops is not None:
+                return lbs_tops
+
+        if self.persistent_cache is not None:
+            persistent_key = ScheduleCache.make_key(*key)
+            lbs_tops = self.persistent_cache.get(persistent_key)
+            if lbs_tops is not None:
+                if self.shared_pernode_cache is not None:
+                    self.shared_pernode_cache[key] = lbs_tops
+                return lbs_tops
+
+        lbs_tops = []
+
         # Mapping strategy.
         map_strategy = self.map_strategy_class(p_layer, p_batch_size, p_occ,
                                                resource.dim_array)
@@ -276,13 +389,34 @@ class Scheduling():
             # Explore loop blocking schemes.
             for lbs in loop_blocking.gen_loopblocking(
                     nested_loop_desc, resource, part, constraint, self.cost,
-                    options):
+                    options, pool=self.pool):
 
                 if lbs.is_valid():
                     lbs_tops.append(lbs)
 
+        if self.shared_pernode_cache is not None:
+            self.shared_pernode_cache[key] = lbs_tops
+        if self.persistent_cache is not None:
+            self.persistent_cache.put(persistent_key, lbs_tops)
+
         return lbs_tops
 
+    def _pernode_key(self, p_layer, p_batch_size, p_occ, part, resource,
+                     constraint, options):
+        '''
+        Get the key of the per-node search, which only depends on the
+        partitioned layer shape instead of the original layer, so it is shared
+        across different layers.
+        '''
+        # The partitioning scheme only affects the loop blocking schemes
+        # through buffer sharing and access forwarding.
+        if not options.hw_gbuf_sharing and not options.hw_access_forwarding:
+            part = None
+        # Exclude the options that do not affect the results.
+        options = options.result_key(per_node=True)
+        return (p_layer, p_batch_size, p_occ, part, resource, constraint,
+                options, self.cost, self.map_strategy_class)
+
     def _get_result(self, lbs, part, ofmap_layout, sched_seq, unit_nhops):
         '''
         Make the schedule result from loop blocking and partitioning.
@@ -14,6 +14,9 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+import os
+import pickle
+import tempfile
 import unittest
 import sys
 
@@ -29,6 +32,7 @@ from nn_dataflow.core import NNDataflow
 from nn_dataflow.core import Option
 from nn_dataflow.core import PhyDim2
 from nn_dataflow.core import Resource
+from nn_dataflow.core import ScheduleCache
 
 from nn_dataflow.nns import import_network
 
@@ -163,6 +167,38 @@ class TestNNDataflow(unittest.TestCase):
         tops, _ = nnd.schedule_search(options)
         self.assertTrue(tops)
 
+    def test_pipelining_solve_loopblocking(self):
+        ''' Pipelining with buffer sharing and loop blocking solver. '''
+        network = self.simple_net
+        batch_size = 1
+
+        resource = self.resource._replace(
+            proc_region=NodeRegion(origin=PhyDim2(0, 0),
+                                   dim=PhyDim2(4, 4),
+                                   type=NodeRegion.PROC)
+        )
+
+        options = Option(sw_gbuf_bypass=(True, True, True),
+                         sw_solve_loopblocking=True,
+                         hw_gbuf_sharing=True,
+                         hw_gbuf_save_writeback=True,
+                         partition_hybrid=True,
+                         partition_interlayer=True)
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+
+        tops, _ = nnd.schedule_search(options)
+        self.assertTrue(tops)
+
+        # Temporal pipelining with the solver.
+        self.assertTrue(any(sched.sched_seq[2] > 0
+                            for sched in tops[0].values()))
+
+        # Compared to exhaustive search.
+        tops_exh, _ = nnd.schedule_search(
+            options._replace(sw_solve_loopblocking=False))
+        self.assertLess(tops[0].total_cost, tops_exh[0].total_cost * 1.1)
+
     def test_fast_forward_infeasible(self):
         ''' Enter fast forward due to infeasible constraint. '''
         network = self.simple_net
@@ -288,6 +324,377 @@ class TestNNDataflow(unittest.TestCase):
         self.assertIs(nnd.layer_sched_dict['pool1_a'],
                       nnd.layer_sched_dict['pool1_b'])
 
+    def test_shared_pool(self):
+        ''' Shared worker pool across layers. '''
+        network = self.simple_net
+        batch_size = 4
+
+        nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                         self.map_strategy)
+
+        tops1, _ = nnd.schedule_search(self.options)
+        self.assertTrue(tops1)
+
+        nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                         self.map_strategy)
+
+        tops4, _ = nnd.schedule_search(self.options._replace(nprocesses=4))
+        self.assertTrue(tops4)
+
+        self.assertAlmostEqual(tops1[0].total_cost, tops4[0].total_cost)
+        self.assertAlmostEqual(tops1[0].total_time, tops4[0].total_time)
+
+        # Pool is released after search.
+        self.assertTrue(all(sched.pool is None
+                            for sched in nnd.layer_sched_dict.values()))
+        self.assertTrue(all(sched.shared_pernode_cache is None
+                            for sched in nnd.layer_sched_dict.values()))
+
+    def test_persistent_cache(self):
+        ''' Persistent schedule cache across searches. '''
+        network = self.simple_net
+        batch_size = 4
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            options = self.options._replace(sched_cache_dir=cache_dir)
+
+            nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                             self.map_strategy)
+            tops1, _ = nnd.schedule_search(options)
+            self.assertTrue(tops1)
+
+            # Cache is released after search.
+            self.assertTrue(all(sched.persistent_cache is None
+                                for sched in nnd.layer_sched_dict.values()))
+
+            cache = ScheduleCache(cache_dir)
+            self.assertGreater(len(cache), 0)
+            cache.close()
+
+            nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                             self.map_strategy)
+            tops2, _ = nnd.schedule_search(options)
+            self.assertTrue(tops2)
+
+        self.assertAlmostEqual(tops1[0].total_cost, tops2[0].total_cost)
+        self.assertAlmostEqual(tops1[0].total_time, tops2[0].total_time)
+
+    def test_time_budget(self):
+        ''' Time budget. '''
+        network = self.simple_net
+        batch_size = 4
+
+        options = Option(partition_interlayer=True, hw_gbuf_save_writeback=True,
+                         ntops=4)
+
+        nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                         self.map_strategy)
+        tops, _ = nnd.schedule_search(options)
+        self.assertTrue(tops)
+
+        # Degrade from the beginning.
+        nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                         self.map_strategy)
+        tops_bgt, _ = nnd.schedule_search(options._replace(time_budget=0))
+        self.assertEqual(len(tops_bgt), 1)
+
+        nndf = tops_bgt[0]
+        self.assertEqual(len(nndf), len(network))
+        # No pipelining.
+        self.assertEqual(len(nndf.segment_timing_list), len(network))
+        self.assertGreaterEqual(nndf.total_cost, tops[0].total_cost)
+
+        # Degraded options.
+        # pylint: disable=protected-access
+        opts = NNDataflow._over_budget_options(options)
+        self.assertEqual(opts.ntops, 1)
+        self.assertFalse(opts.sw_solve_loopblocking)
+        opts = NNDataflow._over_budget_options(
+            options._replace(sw_gbuf_bypass=(True, True, True)))
+        self.assertEqual(opts.ntops, 1)
+        self.assertTrue(opts.sw_solve_loopblocking)
+        opts = NNDataflow._over_budget_options(
+            Option(sw_gbuf_bypass=(True, False, True), ntops=4))
+        self.assertEqual(opts.ntops, 1)
+        self.assertTrue(opts.sw_solve_loopblocking)
+
+    def test_time_budget_default_options(self):
+        ''' Time budget with default options. '''
+        network = self.simple_net
+        batch_size = 4
+
+        # The solver is not used without bypassing, which finds no schemes.
+        nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                         self.map_strategy)
+        tops_bgt, _ = nnd.schedule_search(Option(time_budget=0))
+        self.assertEqual(len(tops_bgt), 1)
+        self.assertEqual(len(tops_bgt[0]), len(network))
+
+    def test_time_budget_in_segment(self):
+        ''' Time budget checked within the segment search. '''
+        network = self.simple_net
+        batch_size = 4
+
+        options = Option(partition_interlayer=True, hw_gbuf_save_writeback=True)
+
+        nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                         self.map_strategy)
+        _ = nnd.schedule_search(options)
+
+        # pylint: disable=protected-access
+        segments = [seg for seg in nnd.ilp.gen_segment(options)
+                    if len(seg) > 1 or len(seg[0]) > 1]
+        self.assertTrue(segments)
+        cnt = 0
+        for seg in segments:
+            prev_nndf_tops = nnd._prev_nndf_tops(seg)
+            seg_tops = nnd._segment_schedule_search(seg, prev_nndf_tops,
+                                                    options)
+            cnt += len(seg_tops)
+            # No constraint is explored after the deadline.
+            self.assertListEqual(nnd._segment_schedule_search(
+                seg, prev_nndf_tops, options, deadline=0), [])
+        self.assertGreater(cnt, 0)
+
+        # Single-layer segments are always scheduled.
+        seg = next(seg for seg in nnd.ilp.gen_segment(options)
+                   if len(seg) == 1 and len(seg[0]) == 1)
+        self.assertTrue(nnd._segment_schedule_search(
+            seg, nnd._prev_nndf_tops(seg), options, deadline=0))
+
+    def test_checkpoint(self):
+        ''' Checkpoint and resume. '''
+        network = self.simple_net
+        batch_size = 4
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ckpt = os.path.join(tmpdir, 'ckpt')
+            options = self.options._replace(checkpoint_path=ckpt)
+
+            nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                             self.map_strategy)
+            tops1, _ = nnd.schedule_search(options)
+            self.assertTrue(tops1)
+            self.assertTrue(os.path.isfile(ckpt))
+
+            # Emulate a killed search, with only the first layer done.
+            with open(ckpt, 'rb') as fh:
+                key, nndf_tops = pickle.load(fh)
+            first_layer = nnd.ordered_layer_list[0]
+            nndf_tops = {k: v for k, v in nndf_tops.items()
+                         if k in (None, first_layer)}
+            with open(ckpt, 'wb') as fh:
+                pickle.dump((key, nndf_tops), fh)
+
+            nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                             self.map_strategy)
+            tops2, _ = nnd.schedule_search(
+                options._replace(checkpoint_resume=True))
+            self.assertTrue(tops2)
+            self.assertEqual(len(tops2[0]), len(network))
+            self.assertAlmostEqual(tops1[0].total_cost, tops2[0].total_cost)
+            self.assertAlmostEqual(tops1[0].total_time, tops2[0].total_time)
+
+            # Mismatched checkpoint.
+            nnd = NNDataflow(network, batch_size * 2, self.resource,
+                             self.cost, self.map_strategy)
+            with self.assertRaisesRegex(ValueError,
+                                        'NNDataflow: .*checkpoint.*'):
+                _ = nnd.schedule_search(
+                    options._replace(checkpoint_resume=True))
+
+            # Resume from non-existing checkpoint.
+            os.remove(ckpt)
+            nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                             self.map_strategy)
+            tops3, _ = nnd.schedule_search(
+                options._replace(checkpoint_resume=True))
+            self.assertAlmostEqual(tops1[0].total_cost, tops3[0].total_cost)
+
+    def test_parallel_segment_search(self):
+        ''' Parallel segment search. '''
+        network = self.complex_net
+        batch_size = 4
+
+        # Multiple nodes for spatial pipelining.
+        resource = self.resource._replace(
+            proc_region=NodeRegion(origin=PhyDim2(0, 0),
+                                   dim=PhyDim2(4, 4),
+                                   type=NodeRegion.PROC))
+
+        options = Option(hw_gbuf_save_writeback=True,
+                         partition_interlayer=True, ntops=4)
+
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+        tops1, _ = nnd.schedule_search(options)
+        self.assertTrue(tops1)
+
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+        tops4, _ = nnd.schedule_search(options._replace(
+            nprocesses=4, parallel_segment_search=True))
+
+        self.assertEqual(len(tops1), len(tops4))
+        for nndf1, nndf4 in zip(tops1, tops4):
+            self.assertAlmostEqual(nndf1.total_cost, nndf4.total_cost)
+            self.assertAlmostEqual(nndf1.total_time, nndf4.total_time)
+            self.assertListEqual(list(nndf1), list(nndf4))
+            for layer_name in nndf1:
+                self.assertEqual(nndf1[layer_name].sched_seq,
+                                 nndf4[layer_name].sched_seq)
+
+    def test_layer_dp_state_merge(self):
+        ''' Merge partial schedules with the same state in layer DP. '''
+        network = self.complex_net
+        batch_size = 4
+
+        resource = self.resource._replace(
+            proc_region=NodeRegion(origin=PhyDim2(0, 0),
+                                   dim=PhyDim2(4, 4),
+                                   type=NodeRegion.PROC))
+
+        options = Option(hw_gbuf_save_writeback=True,
+                         partition_interlayer=True, ntops=4)
+
+        def _num_dup_states(nnd):
+            num = 0
+            for layer_name in nnd.ordered_layer_list[:-1]:
+                states = [nndf.dp_state(nnd.live_layers_dict[layer_name])
+                          for nndf in nnd.nndf_tops[layer_name]]
+                num += len(states) - len(set(states))
+            return num
+
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+        tops1, _ = nnd.schedule_search(options)
+        self.assertTrue(tops1)
+        self.assertGreater(_num_dup_states(nnd), 0)
+
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+        tops2, _ = nnd.schedule_search(
+            options._replace(layer_dp_state_merge=True))
+        self.assertEqual(len(tops2), len(tops1))
+        self.assertEqual(_num_dup_states(nnd), 0)
+
+        self.assertAlmostEqual(tops2[0].total_cost, tops1[0].total_cost)
+        self.assertAlmostEqual(tops2[0].total_time, tops1[0].total_time)
+
+    def test_segment_bound_prune(self):
+        ''' Segment lower-bound pruning. '''
+        network = self.simple_net
+        batch_size = 4
+
+        resource = self.resource._replace(
+            proc_region=NodeRegion(origin=PhyDim2(0, 0),
+                                   dim=PhyDim2(4, 4),
+                                   type=NodeRegion.PROC))
+
+        for ntops in [1, 4]:
+            options = Option(hw_gbuf_save_writeback=True,
+                             partition_hybrid=True,
+                             partition_interlayer=True, ntops=ntops)
+
+            nnd = NNDataflow(network, batch_size, resource, self.cost,
+                             self.map_strategy)
+            tops1, _ = nnd.schedule_search(options)
+            self.assertTrue(tops1)
+            num_pruned, num_segs = nnd.segment_prune_stats
+            self.assertGreater(num_pruned, 0)
+            self.assertGreater(num_segs, num_pruned)
+
+            nnd = NNDataflow(network, batch_size, resource, self.cost,
+                             self.map_strategy)
+            tops2, _ = nnd.schedule_search(
+                options._replace(segment_bound_prune=False))
+            self.assertTupleEqual(nnd.segment_prune_stats, (0, num_segs))
+
+            self.assertEqual(len(tops1), len(tops2))
+            for nndf1, nndf2 in zip(tops1, tops2):
+                self.assertEqual(nndf1.total_cost, nndf2.total_cost)
+                self.assertEqual(nndf1.total_time, nndf2.total_time)
+
+    def test_segment_bound_prune_parallel(self):
+        ''' Segment lower-bound pruning with parallel segment search. '''
+        network = self.simple_net
+        batch_size = 4
+
+        resource = self.resource._replace(
+            proc_region=NodeRegion(origin=PhyDim2(0, 0),
+                                   dim=PhyDim2(4, 4),
+                                   type=NodeRegion.PROC))
+
+        options = Option(hw_gbuf_save_writeback=True,
+                         partition_hybrid=True,
+                         partition_interlayer=True, ntops=4)
+
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+        tops1, _ = nnd.schedule_search(options)
+        self.assertTrue(tops1)
+        _, num_segs = nnd.segment_prune_stats
+
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+        tops4, _ = nnd.schedule_search(options._replace(
+            nprocesses=4, parallel_segment_search=True))
+        num_pruned4, num_segs4 = nnd.segment_prune_stats
+        self.assertGreater(num_pruned4, 0)
+        self.assertEqual(num_segs4, num_segs)
+
+        self.assertEqual(len(tops1), len(tops4))
+        for nndf1, nndf4 in zip(tops1, tops4):
+            self.assertAlmostEqual(nndf1.total_cost, nndf4.total_cost)
+            self.assertAlmostEqual(nndf1.total_time, nndf4.total_time)
+            self.assertListEqual(list(nndf1), list(nndf4))
+
+    def test_shared_pernode_cache(self):
+        ''' Per-node cache shared across searches. '''
+        network = self.simple_net
+        batch_size = 4
+
+        options = Option()
+
+        nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                         self.map_strategy)
+        tops1, _ = nnd.schedule_search(options)
+        self.assertTrue(tops1)
+
+        shared_pernode_cache = {}
+        for _ in range(2):
+            nnd = NNDataflow(network, batch_size, self.resource, self.cost,
+                             self.map_strategy)
+            tops2, _ = nnd.schedule_search(
+                options, shared_pernode_cache=shared_pernode_cache)
+            self.assertTrue(shared_pernode_cache)
+
+            self.assertEqual(len(tops1), len(tops2))
+            for nndf1, nndf2 in zip(tops1, tops2):
+                self.assertEqual(nndf1.total_cost, nndf2.total_cost)
+                self.assertEqual(nndf1.total_time, nndf2.total_time)
+
+        # Not shared with a different cost.
+        num_cached = len(shared_pernode_cache)
+        nnd = NNDataflow(network, batch_size, self.resource,
+                         self.cost._replace(mac_op=2), self.map_strategy)
+        nnd.schedule_search(options, shared_pernode_cache=shared_pernode_cache)
+        self.assertGreater(len(shared_pernode_cache), num_cached)
+
+    def test_live_layers(self):
+        ''' Live layers after each layer. '''
+        nnd = NNDataflow(self.simple_net, 4, self.resource, self.cost,
+                         self.map_strategy)
+        self.assertTupleEqual(
+            nnd.live_layers_dict[nnd.ordered_layer_list[-1]], tuple())
+
+        for idx, layer_name in enumerate(nnd.ordered_layer_list):
+            following = nnd.ordered_layer_list[idx + 1:]
+            for l in nnd.live_layers_dict[layer_name]:
+                self.assertTrue(l is None or l in self.simple_net)
+                self.assertTrue(any(l in self.simple_net.prevs(f)
+                                    for f in following))
+
     def test_opt_goal(self):
         ''' Optimization goal. '''
         network = self.alex_net
@@ -342,6 +749,48 @@ class TestNNDataflow(unittest.TestCase):
         self.assertLess(tops_ed[0].total_cost * tops_ed[0].total_time,
                         tops_d[0].total_cost * tops_d[0].total_time * 1.05)
 
+    def test_opt_goal_pareto(self):
+        ''' Pareto-optimal optimization goal. '''
+        network = self.simple_net
+
+        batch_size = 8
+
+        resource = self.resource._replace(
+            proc_region=NodeRegion(origin=PhyDim2(0, 0),
+                                   dim=PhyDim2(8, 8),
+                                   type=NodeRegion.PROC)
+        )
+
+        nnd = NNDataflow(network, batch_size, resource, self.cost,
+                         self.map_strategy)
+
+        options = Option(sw_gbuf_bypass=(True, True, True),
+                         sw_solve_loopblocking=True,
+                         partition_hybrid=True,
+                         partition_batch=True,
+                         opt_goal='pareto',
+                         ntops=16)
+        tops, _ = nnd.schedule_search(options)
+        self.assertGreater(len(tops), 1)
+        self.assertLessEqual(len(tops), options.ntops)
+
+        # Sorted and non-dominated.
+        for nndf1, nndf2 in zip(tops, tops[1:]):
+            self.assertLess(nndf1.total_cost, nndf2.total_cost)
+            self.assertGreater(nndf1.total_time, nndf2.total_time)
+
+        # The two ends are the scalarized optimums.
+        tops_e, _ = nnd.schedule_search(options._replace(opt_goal='e'))
+        tops_d, _ = nnd.schedule_search(options._replace(opt_goal='d'))
+        self.assertAlmostEqual(tops[0].total_cost, tops_e[0].total_cost)
+        self.assertAlmostEqual(tops[-1].total_time, tops_d[0].total_time)
+
+        # Size cap.
+        tops_cap, _ = nnd.schedule_search(options._replace(ntops=2))
+        self.assertEqual(len(tops_cap), 2)
+        self.assertAlmostEqual(tops_cap[0].total_cost, tops[0].total_cost)
+        self.assertAlmostEqual(tops_cap[-1].total_time, tops[-1].total_time)
+
     def test_ext_layer(self):
         ''' With external layers. '''
         network = self.alex_net
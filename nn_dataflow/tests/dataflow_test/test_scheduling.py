@@ -14,6 +14,9 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+import itertools
+import math
+import tempfile
 import unittest
 
 from nn_dataflow.core import ConvLayer, LocalRegionLayer, PoolingLayer
@@ -24,9 +27,11 @@ from nn_dataflow.core import MapStrategyEyeriss
 from nn_dataflow.core import NodeRegion
 from nn_dataflow.core import Option
 from nn_dataflow.core import ParallelEnum as pe
+from nn_dataflow.core import partition
 from nn_dataflow.core import PartitionScheme
 from nn_dataflow.core import PhyDim2
 from nn_dataflow.core import Resource
+from nn_dataflow.core import ScheduleCache
 from nn_dataflow.core import Scheduling
 from nn_dataflow.core import SchedulingCondition, SchedulingResult
 from nn_dataflow.core import SchedulingConstraint
@@ -212,6 +217,80 @@ class TestScheduling(unittest.TestCase):
 
         self.assertFalse(res)
 
+    def test_schedule_search_bound_prune(self):
+        ''' Schedule search with and without partition pruning. '''
+        shared_cache = {}
+
+        for wlkey, opt_goal, ntops in itertools.product(
+                ['POOL', 'LR'], ['e', 'ed', 'pareto'], [1, 10]):
+            layer = self.layers[wlkey]
+
+            condition = SchedulingCondition(
+                resource=self.resource,
+                constraint=self.none_cstr,
+                ifmap_layout=self.ifmap_layouts[wlkey],
+                sched_seq=self.sched_seq)
+
+            res_list = []
+            for prune in [True, False]:
+                schd = Scheduling(layer, self.batch_size, self.cost,
+                                  MapStrategyEyeriss)
+                schd.shared_pernode_cache = shared_cache
+                res_list.append(schd.schedule_search(
+                    condition, self.options._replace(
+                        opt_goal=opt_goal, ntops=ntops,
+                        partition_bound_prune=prune)))
+
+            self.assertTrue(res_list[0])
+            self.assertEqual(len(res_list[0]), len(res_list[1]))
+            for res1, res2 in zip(*res_list):
+                self.assertDictEqual(res1.scheme, res2.scheme)
+                self.assertEqual(res1.ofmap_layout, res2.ofmap_layout)
+
+    def test_schedule_search_bound_prune_solver(self):
+        ''' Schedule search partition pruning with loop blocking solver. '''
+        # pylint: disable=no-member
+        Scheduling.schedule_search_per_node.cache_clear()
+
+        layer = self.layers['BASE']
+        options = self.options._replace(sw_gbuf_bypass=(True, True, True),
+                                        sw_solve_loopblocking=True)
+
+        schd = Scheduling(layer, self.batch_size, self.cost,
+                          MapStrategyEyeriss)
+
+        # The solved schemes are not finalized, but the bounds are valid.
+        # pylint: disable=protected-access
+        cnt = 0
+        for part in partition.gen_partition(
+                layer, self.batch_size, self.resource.proc_region.dim,
+                options, guaranteed=True):
+            for lbs in schd.schedule_search_per_node(
+                    part, self.resource, self.none_cstr, options):
+                bound = schd._result_lower_bound(lbs)
+                self.assertTrue(math.isfinite(bound.total_cost))
+                self.assertTrue(math.isfinite(bound.total_time))
+                cnt += 1
+        self.assertGreater(cnt, 0)
+
+        condition = SchedulingCondition(
+            resource=self.resource,
+            constraint=self.none_cstr,
+            ifmap_layout=self.ifmap_layouts['BASE'],
+            sched_seq=self.sched_seq)
+
+        Scheduling.schedule_search_per_node.cache_clear()
+        res_list = []
+        for prune in [True, False]:
+            res_list.append(schd.schedule_search(
+                condition, options._replace(partition_bound_prune=prune)))
+
+        self.assertTrue(res_list[0])
+        self.assertEqual(len(res_list[0]), len(res_list[1]))
+        for res1, res2 in zip(*res_list):
+            self.assertDictEqual(res1.scheme, res2.scheme)
+            self.assertEqual(res1.ofmap_layout, res2.ofmap_layout)
+
     def test_pernode_sched_cache(self):
         ''' Per-node scheduling cache. '''
         # pylint: disable=no-member
@@ -283,3 +362,131 @@ class TestScheduling(unittest.TestCase):
         self.assertEqual(h2, h + 1)
         self.assertEqual(m2, m)
 
+
+    def test_persistent_sched_cache(self):
+        ''' Persistent per-node scheduling cache. '''
+        # pylint: disable=no-member
+        Scheduling.schedule_search.cache_clear()
+        Scheduling.schedule_search_per_node.cache_clear()
+
+        layer = self.layers['BASE']
+
+        part = PartitionScheme(order=(pe.BATP, pe.INPP, pe.OUTP, pe.OFMP),
+                               pdims=((2, 4), (2, 1), (1, 1), (1, 1)))
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+
+            schd = Scheduling(layer, self.batch_size, self.cost,
+                              MapStrategyEyeriss)
+            schd.persistent_cache = ScheduleCache(cache_dir, version='test')
+            lbs_tops1 = schd.schedule_search_per_node(
+                part, self.resource, self.cstr, self.options)
+            self.assertEqual(schd.persistent_cache.misses, 1)
+            schd.persistent_cache.close()
+
+            Scheduling.schedule_search_per_node.cache_clear()
+
+            # A new instance with options that do not affect the results.
+            schd = Scheduling(ConvLayer(8, 16, 28, 3), self.batch_size,
+                              self.cost, MapStrategyEyeriss)
+            schd.persistent_cache = ScheduleCache(cache_dir, version='test')
+            lbs_tops2 = schd.schedule_search_per_node(
+                part, self.resource, self.cstr,
+                self.options._replace(nprocesses=4, verbose=True))
+            self.assertEqual(schd.persistent_cache.hits, 1)
+            self.assertEqual(schd.persistent_cache.misses, 0)
+            schd.persistent_cache.close()
+
+        self.assertEqual(len(lbs_tops1), len(lbs_tops2))
+        for lbs1, lbs2 in zip(lbs_tops1, lbs_tops2):
+            self.assertEqual(lbs1.bl_ts, lbs2.bl_ts)
+            self.assertEqual(lbs1.bl_ords, lbs2.bl_ords)
+            self.assertAlmostEqual(lbs1.get_access_cost(self.cost),
+                                   lbs2.get_access_cost(self.cost))
+
+    def test_pernode_sched_cache_canonical(self):
+        ''' Per-node scheduling cache with translated resource. '''
+        # pylint: disable=no-member
+        Scheduling.schedule_search.cache_clear()
+        Scheduling.schedule_search_per_node.cache_clear()
+
+        layer = self.layers['BASE']
+
+        schd = Scheduling(layer, self.batch_size, self.cost,
+                          MapStrategyEyeriss)
+
+        def _translate(region):
+            return region._replace(origin=region.origin + PhyDim2(4, 4))
+        resource = self.resource._replace(
+            proc_region=_translate(self.resource.proc_region),
+            dram_region=_translate(self.resource.dram_region),
+            src_data_region=_translate(self.resource.src_data_region),
+            dst_data_region=_translate(self.resource.dst_data_region))
+
+        ifmap_layout = DataLayout(
+            frngs=self.ifmap_layouts['BASE'].frngs,
+            regions=(resource.src_data_region,),
+            parts=self.ifmap_layouts['BASE'].parts)
+
+        condition = SchedulingCondition(resource=self.resource,
+                                        constraint=self.cstr,
+                                        ifmap_layout=self.ifmap_layouts['BASE'],
+                                        sched_seq=self.sched_seq)
+        tops1 = schd.schedule_search(condition, self.options)
+
+        h, m = schd.cache_stats()
+        self.assertEqual(h, 0)
+
+        condition = SchedulingCondition(resource=resource,
+                                        constraint=self.cstr,
+                                        ifmap_layout=ifmap_layout,
+                                        sched_seq=self.sched_seq)
+        tops2 = schd.schedule_search(condition, self.options)
+
+        # All per-node searches hit the cache.
+        self.assertTupleEqual(schd.cache_stats(), (h + m, m))
+
+        self.assertEqual(len(tops1), len(tops2))
+        for t1, t2 in zip(tops1, tops2):
+            self.assertAlmostEqual(t1.total_cost, t2.total_cost)
+            self.assertEqual(t1.scheme['tvals'], t2.scheme['tvals'])
+            self.assertTrue(t2.ofmap_layout.is_in(resource.dst_data_region))
+
+    def test_shared_pernode_sched_cache(self):
+        ''' Per-node scheduling cache shared across layers. '''
+        # pylint: disable=no-member
+        Scheduling.schedule_search_per_node.cache_clear()
+
+        shared_cache = {}
+
+        schd1 = Scheduling(ConvLayer(8, 16, 28, 3), self.batch_size,
+                           self.cost, MapStrategyEyeriss)
+        schd1.shared_pernode_cache = shared_cache
+        schd2 = Scheduling(ConvLayer(8, 32, 28, 3), self.batch_size,
+                           self.cost, MapStrategyEyeriss)
+        schd2.shared_pernode_cache = shared_cache
+
+        part1 = PartitionScheme(order=(pe.BATP, pe.INPP, pe.OUTP, pe.OFMP),
+                                pdims=((1, 1), (1, 1), (1, 2), (1, 1)))
+        part2 = PartitionScheme(order=(pe.BATP, pe.INPP, pe.OUTP, pe.OFMP),
+                                pdims=((1, 2), (1, 1), (1, 2), (1, 1)))
+        self.assertEqual(part1.part_layer(schd1.layer, self.batch_size),
+                         part2.part_layer(schd2.layer, self.batch_size))
+
+        lbs_tops1 = schd1.schedule_search_per_node(
+            part1, self.resource, self.cstr, self.options)
+        self.assertEqual(len(shared_cache), 1)
+
+        # Different layer and partitioning with the same partitioned layer.
+        lbs_tops2 = schd2.schedule_search_per_node(
+            part2, self.resource, self.cstr, self.options)
+        self.assertEqual(len(shared_cache), 1)
+        self.assertIs(lbs_tops1, lbs_tops2)
+
+        # Partitioning matters with access forwarding.
+        options = self.options._replace(hw_access_forwarding=True)
+        lbs_tops1 = schd1.schedule_search_per_node(
+            part1, self.resource, self.cstr, options)
+        lbs_tops2 = schd2.schedule_search_per_node(
+            part2, self.resource, self.cstr, options)
+        self.assertEqual(len(shared_cache), 3)
@@ -14,8 +14,13 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+import itertools
+from multiprocessing.pool import Pool
+
 from nn_dataflow.core import loop_blocking
 from nn_dataflow.core import DataCategoryEnum as de
+from nn_dataflow.core import LoopEnum as le
+from nn_dataflow import util
 
 from . import TestLoopBlockingFixture
 
@@ -75,6 +80,87 @@ class TestLoopBlocking(TestLoopBlockingFixture):
                            'test_skip_ratio: skip ratio {} too low.'
                            .format(skip_ratio))
 
+    def test_gen_regularized_ords(self):
+        ''' gen_regularized_ords same as skip_conv. '''
+
+        all_bl_ords = list(itertools.product(
+            itertools.permutations(range(le.NUM)),
+            itertools.permutations(range(le.NUM))))
+
+        for lp_ts in itertools.product(itertools.product([1, 2], repeat=3),
+                                       repeat=le.NUM):
+            bl_ts = tuple(zip(*lp_ts))
+
+            exp_bl_ords = [bl_ords for bl_ords in all_bl_ords
+                           if not loop_blocking.skip_conv(bl_ts, bl_ords)]
+            bl_ords_list = list(loop_blocking.gen_regularized_ords(bl_ts))
+
+            self.assertListEqual(bl_ords_list, exp_bl_ords,
+                                 'test_gen_regularized_ords: mismatch for {}.'
+                                 .format(bl_ts))
+
+            exp_bl_ords = [bl_ords for bl_ords in all_bl_ords
+                           if not loop_blocking.skip_local_region(bl_ts,
+                                                                  bl_ords)]
+            bl_ords_list = list(loop_blocking.gen_regularized_ords(
+                bl_ts, local_region=True))
+
+            self.assertListEqual(bl_ords_list, exp_bl_ords,
+                                 'test_gen_regularized_ords: local region '
+                                 'mismatch for {}.'.format(bl_ts))
+
+    def test_skip_local_region_eqv(self):
+        ''' skip_local_region equivalent. '''
+
+        for bl_ts, bl_ords in self._gen_loopblocking_all(wlkey='POOL'):
+
+            if loop_blocking.skip_conv(bl_ts, bl_ords) \
+                    or not loop_blocking.skip_local_region(bl_ts, bl_ords):
+                continue
+
+            # Put the non-trivial loops in order below the top level.
+            reg_ords = (bl_ords[0],)
+            for t_ in bl_ts[1:len(bl_ords)]:
+                lp_ord = sorted(range(le.NUM),
+                                key=lambda lpe, t=t_: (t[lpe] == 1, lpe))
+                reg_ords += (tuple(lp_ord.index(lpe)
+                                   for lpe in range(le.NUM)),)
+
+            # The regularized scheme may still be suboptimal.
+            self.assertEqual(loop_blocking.skip_local_region(bl_ts, reg_ords),
+                             loop_blocking.skip_conv(bl_ts, reg_ords),
+                             'test_skip_local_region_eqv: regularized {} {} '
+                             'is skipped.'.format(bl_ts, reg_ords))
+
+            lbs = self._lbs(bl_ts, bl_ords, wlkey='POOL', rsrckey='LG')
+            reg_lbs = self._lbs(bl_ts, reg_ords, wlkey='POOL', rsrckey='LG')
+
+            self.assertListEqual(lbs.get_access(), reg_lbs.get_access(),
+                                 msg=('test_skip_local_region_eqv: access '
+                                      'mismatch. orig {} {}, reg {}.'
+                                      .format(bl_ts, bl_ords, reg_ords)))
+            self.assertEqual(lbs.time, reg_lbs.time)
+            self.assertListEqual(self._get_lbs_size(lbs),
+                                 self._get_lbs_size(reg_lbs))
+
+    def test_gen_loopblocking_local_region(self):
+        ''' gen_loopblocking for LocalRegionLayer same as all schemes. '''
+
+        for rsrckey in ['BASE', 'LG']:
+
+            costs = [lbs.get_access_cost(self.cost)
+                     for lbs in (self._lbs(*sch, wlkey='POOL', rsrckey=rsrckey)
+                                 for sch in self._gen_loopblocking_all(
+                                     wlkey='POOL'))
+                     if lbs.is_valid()]
+
+            tops = list(self._gen_loopblocking(wlkey='POOL', rsrckey=rsrckey,
+                                               skip_invalid=True))
+
+            self.assertAlmostEqual(tops[0].get_access_cost(self.cost),
+                                   min(costs))
+            self.assertLess(len(tops), len(costs))
+
     def test_gen_loopblocking_all(self):
         ''' gen_loopblocking cover all. '''
 
@@ -101,6 +187,63 @@ class TestLoopBlocking(TestLoopBlockingFixture):
 
         self.assertEqual(cnt1, cnt8)
 
+    def test_gen_loopblocking_mp_chunk(self):
+        ''' gen_loopblocking multiprocessing with chunk size. '''
+
+        tops1 = list(self._gen_loopblocking(optkey='NTOPS'))
+
+        for chunk_size in [1, 3, 100]:
+            options = self.options['NTOPS']._replace(
+                nprocesses=4, loopblocking_chunk_size=chunk_size)
+            tops4 = list(loop_blocking.gen_loopblocking(
+                self.nld['BASE'], self.resource['BASE'], self.part,
+                self.none_cstr, self.cost, options))
+
+            self.assertEqual(len(tops1), len(tops4))
+            for lbs1, lbs4 in zip(tops1, tops4):
+                self.assertEqual(lbs1.bl_ts, lbs4.bl_ts)
+                self.assertEqual(lbs1.bl_ords, lbs4.bl_ords)
+
+        cnt1 = len(list(self._gen_loopblocking(rsrckey='LG')))
+        cnt8 = len(list(self._gen_loopblocking(rsrckey='LG', optkey='MPCHK')))
+        self.assertEqual(cnt1, cnt8)
+
+    def test_gen_loopblocking_shared_pool(self):
+        ''' gen_loopblocking with shared pool. '''
+
+        cnt1 = 0
+        for _ in self._gen_loopblocking(rsrckey='LG'):
+            cnt1 += 1
+
+        pool = Pool(processes=4)
+
+        # Reuse the same pool across calls.
+        for _ in range(2):
+            cnt4 = 0
+            for _ in self._gen_loopblocking(rsrckey='LG', pool=pool):
+                cnt4 += 1
+            self.assertEqual(cnt1, cnt4)
+
+        pool.close()
+        pool.join()
+
+    def test_gen_loopblocking_small_inproc(self):
+        ''' gen_loopblocking in-process for small search space. '''
+
+        tops1 = list(self._gen_loopblocking(wlkey='POOL', rsrckey='LG'))
+
+        # The pool is not used, otherwise raises as it is closed.
+        pool = Pool(processes=4)
+        pool.close()
+        pool.join()
+        tops4 = list(self._gen_loopblocking(wlkey='POOL', rsrckey='LG',
+                                            optkey='MP', pool=pool))
+
+        self.assertEqual(len(tops1), len(tops4))
+        for lbs1, lbs4 in zip(tops1, tops4):
+            self.assertEqual(lbs1.bl_ts, lbs4.bl_ts)
+            self.assertEqual(lbs1.bl_ords, lbs4.bl_ords)
+
     def test_gen_loopblocking_no_eqv(self):
         ''' gen_loopblocking no equivalent. '''
 
@@ -137,6 +280,54 @@ class TestLoopBlocking(TestLoopBlockingFixture):
                 self.assertAlmostEqual(cost_curr,
                                        top_lbs.get_access_cost(self.cost))
 
+    def test_gen_loopblocking_prune(self):
+        ''' gen_loopblocking with and without lower-bound pruning. '''
+
+        for rsrckey, optkey, ntops in itertools.product(
+                ['LG', 'SRCNOTDATA', 'FILPIN'], ['BASE', 'BYP'], [1, 10]):
+
+            options = self.options[optkey]._replace(ntops=ntops)
+
+            tops = [list(loop_blocking.gen_loopblocking(
+                self.nld['BASE'], self.resource[rsrckey], self.part,
+                self.none_cstr, self.cost,
+                options._replace(loopblocking_bound_prune=prune)))
+                    for prune in [True, False]]
+
+            self.assertEqual(len(tops[0]), len(tops[1]))
+            for lbs1, lbs2 in zip(*tops):
+                self.assertEqual(lbs1.bl_ts, lbs2.bl_ts)
+                self.assertEqual(lbs1.bl_ords, lbs2.bl_ords)
+
+    def test_gen_loopblocking_pareto(self):
+        ''' gen_loopblocking with Pareto-optimal goal. '''
+
+        resource = self.resource['LG']._replace(dram_bandwidth=2,
+                                                array_bus_width=2)
+        options = self.options['BASE']._replace(opt_goal='pareto', ntops=100)
+
+        def _keys(opts):
+            return [(lbs.get_access_cost(self.cost), lbs.time)
+                    for lbs in loop_blocking.gen_loopblocking(
+                        self.nld['BASE'], resource, self.part,
+                        self.none_cstr, self.cost, opts)
+                    if lbs.is_valid()]
+
+        keys = _keys(options)
+        self.assertTrue(keys)
+
+        # Same as the frontier of all schemes.
+        all_keys = _keys(options._replace(opt_goal='e', ntops=2 ** 30))
+        self.assertListEqual(keys,
+                             util.pareto_frontier(all_keys, key=lambda k: k))
+
+        # Pruning and parallel search do not change the frontier.
+        self.assertListEqual(
+            keys, _keys(options._replace(loopblocking_bound_prune=False)))
+        self.assertListEqual(
+            keys, _keys(options._replace(nprocesses=4,
+                                         loopblocking_chunk_size=3)))
+
     def test_gen_loopblocking_byp_sol(self):
         ''' gen_loopblocking using bypass solvers. '''
 
@@ -171,14 +362,25 @@ class TestLoopBlocking(TestLoopBlockingFixture):
 
         self.assertLessEqual(cnt2, cnt1)
 
+    def test_key_isclose(self):
+        ''' Compare keys close with different rounding. '''
+        # pylint: disable=protected-access
+        key_isclose = loop_blocking._key_isclose
+
+        self.assertTrue(key_isclose((0.1 + 0.2, 3.), (0.3, 3.)))
+        self.assertTrue(key_isclose(0.1 + 0.2, 0.3))
+        self.assertFalse(key_isclose((0.3, 3.), (0.3, 3.1)))
+        self.assertFalse(key_isclose(0.3, 0.31))
+
     def _gen_loopblocking(self, wlkey='BASE', rsrckey='BASE',
-                          optkey='BASE', cstr=None, skip_invalid=False):
+                          optkey='BASE', cstr=None, skip_invalid=False,
+                          pool=None):
         ''' gen_loopblocking trampoline. '''
         if cstr is None:
             cstr = self.none_cstr
         for lbs in loop_blocking.gen_loopblocking(
                 self.nld[wlkey], self.resource[rsrckey], self.part, cstr,
-                self.cost, self.options[optkey]):
+                self.cost, self.options[optkey], pool=pool):
             if not skip_invalid or lbs.is_valid():
                 yield lbs
 
@@ -0,0 +1,129 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import itertools
+
+from nn_dataflow.core import BufShrScheme
+from nn_dataflow.core import LoopBlockingScheme
+from nn_dataflow.core import LoopEnum as le
+from nn_dataflow.core.loop_blocking_evaluator import LoopBlockingEvaluator
+from nn_dataflow import util
+
+from . import TestLoopBlockingFixture
+
+class TestLoopBlockingEvaluator(TestLoopBlockingFixture):
+    ''' Tests for LoopBlockingEvaluator. '''
+
+    def test_evaluate(self):
+        ''' evaluate matches LoopBlockingScheme. '''
+        for rsrckey, optkey in itertools.product(
+                ['BASE', 'SM', 'SRCNOTDATA', 'DSTNOTDATA', 'DATALOCAL',
+                 'FILPIN'],
+                ['BASE', 'BYP', 'ACCFWD']):
+            self._check_evaluate(rsrckey=rsrckey, optkey=optkey)
+
+    def test_evaluate_pool(self):
+        ''' evaluate matches LoopBlockingScheme with PoolingLayer. '''
+        for rsrckey in ['BASE', 'SM']:
+            self._check_evaluate(wlkey='POOL', rsrckey=rsrckey)
+
+    def test_evaluate_zero_size(self):
+        ''' evaluate matches LoopBlockingScheme with zero data size. '''
+        for wlkey in ['ZERO_FIL', 'ZERO_IFM']:
+            self._check_evaluate(wlkey=wlkey)
+
+    def test_evaluate_bufshr(self):
+        ''' evaluate matches LoopBlockingScheme with buffer sharing. '''
+        for part in itertools.islice(self._gen_all_partition(), 0, None, 16):
+
+            p_nld = self._part_nld(part)
+            bufshr = BufShrScheme(self.resource['PAR'].proc_region, part)
+
+            for optkey in ['BUFSHR', 'BUFSHR-BYP']:
+
+                evaluator = LoopBlockingEvaluator(
+                    p_nld, self.resource['PAR'], bufshr, self.cost,
+                    self.options[optkey])
+
+                for bl_ts, bl_ords in itertools.islice(
+                        self._gen_nld_loopblocking_all(p_nld), 0, None, 37):
+                    lbs = LoopBlockingScheme(
+                        p_nld, bl_ts, bl_ords, self.resource['PAR'], bufshr,
+                        self.options[optkey])
+                    self._assert_eval_equal(lbs, evaluator, bl_ts, bl_ords)
+
+    def test_lower_bound(self):
+        ''' lower_bound is no larger than evaluate. '''
+        for rsrckey, optkey in itertools.product(
+                ['BASE', 'SM', 'SRCNOTDATA', 'DSTNOTDATA', 'DATALOCAL',
+                 'FILPIN'],
+                ['BASE', 'BYP', 'ACCFWD']):
+
+            evaluator = LoopBlockingEvaluator(
+                self.nld['BASE'], self.resource[rsrckey], self.bufshr,
+                self.cost, self.options[optkey])
+
+            bounds = {}
+
+            for bl_ts, bl_ords in itertools.islice(
+                    self._gen_loopblocking_all(), 0, None, 5):
+                if bl_ts not in bounds:
+                    bounds[bl_ts] = evaluator.lower_bound(bl_ts)
+                lb_cost, lb_time = bounds[bl_ts]
+                acc_cost, time = evaluator.evaluate(bl_ts, bl_ords)
+                self.assertLessEqual(lb_cost, acc_cost)
+                self.assertLessEqual(lb_time, time)
+                if lb_cost == float('inf'):
+                    self.assertEqual(acc_cost, float('inf'))
+
+    def _check_evaluate(self, wlkey='BASE', rsrckey='BASE', optkey='BASE'):
+        ''' Check evaluate results for all schemes. '''
+        evaluator = LoopBlockingEvaluator(
+            self.nld[wlkey], self.resource[rsrckey], self.bufshr, self.cost,
+            self.options[optkey])
+
+        # Sample the schemes to save test time.
+        for bl_ts, bl_ords in itertools.islice(
+                self._gen_loopblocking_all(wlkey=wlkey), 0, None, 5):
+            lbs = self._lbs(bl_ts, bl_ords, wlkey=wlkey, rsrckey=rsrckey,
+                            optkey=optkey)
+            self._assert_eval_equal(lbs, evaluator, bl_ts, bl_ords)
+
+    def _assert_eval_equal(self, lbs, evaluator, bl_ts, bl_ords):
+        ''' Assert evaluate results equal to the LoopBlockingScheme. '''
+        acc_cost, time = evaluator.evaluate(bl_ts, bl_ords)
+        self.assertEqual(acc_cost, lbs.get_access_cost(self.cost),
+                         'evaluate: access cost mismatch for {} {}.'
+                         .format(bl_ts, bl_ords))
+        self.assertEqual(time, lbs.time,
+                         'evaluate: time mismatch for {} {}.'
+                         .format(bl_ts, bl_ords))
+
+    @staticmethod
+    def _gen_nld_loopblocking_all(nld):
+        ''' Generate all schemes for the given nested loop. '''
+        for ti, to, tb, orders in itertools.product(
+                util.factorize(nld.loopcnt[le.IFM], 3),
+                util.factorize(nld.loopcnt[le.OFM], 3),
+                util.factorize(nld.loopcnt[le.BAT], 3),
+                itertools.product(
+                    itertools.permutations(range(le.NUM)),
+                    itertools.permutations(range(le.NUM)))):
+            lp_ts = [None] * le.NUM
+            lp_ts[le.IFM] = ti
+            lp_ts[le.OFM] = to
+            lp_ts[le.BAT] = tb
+            yield tuple(zip(*lp_ts)), orders
@@ -176,6 +176,9 @@ class TestLoopBlockingFixture(unittest.TestCase):
         self.options['BASE'] = Option(ntops=2 ** 30)
         # Multiprocessing.
         self.options['MP'] = Option(ntops=2 ** 30, nprocesses=8)
+        # Multiprocessing with small chunks.
+        self.options['MPCHK'] = Option(ntops=2 ** 30, nprocesses=8,
+                                       loopblocking_chunk_size=1)
         # Limited top schemes.
         self.options['NTOPS'] = Option(ntops=10)
         # Bypass.
@@ -14,6 +14,8 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+import itertools
+
 from nn_dataflow.core import BufShrScheme
 from nn_dataflow.core import DataCategoryEnum as de
 from nn_dataflow.core import loop_blocking
@@ -118,6 +120,33 @@ class TestLoopBlockingPartition(TestLoopBlockingFixture):
                                         in zip(bufshr_subgrp_size,
                                                bufshr_grp_size)))
 
+    def test_bufshr_mp(self):
+        ''' Scheme using bufshr with multiprocessing. '''
+
+        options = self.options['BUFSHR']._replace(ntops=10)
+        options_mp = options._replace(nprocesses=4)
+
+        for part in itertools.islice(self._gen_all_partition(), 0, None, 8):
+
+            p_nld = self._part_nld(part)
+
+            tops = list(loop_blocking.gen_loopblocking(
+                p_nld, self.resource['PAR'], part, self.none_cstr,
+                self.cost, options))
+            tops_mp = list(loop_blocking.gen_loopblocking(
+                p_nld, self.resource['PAR'], part, self.none_cstr,
+                self.cost, options_mp))
+
+            # Rebuilt schemes are the same, including the buffer sharing loop
+            # orders.
+            self.assertEqual(len(tops), len(tops_mp))
+            for lbs, lbs_mp in zip(tops, tops_mp):
+                self.assertEqual(lbs.bl_ts, lbs_mp.bl_ts)
+                self.assertEqual(lbs.bl_ords, lbs_mp.bl_ords)
+                self.assertEqual(lbs.bufshr_bs_t, lbs_mp.bufshr_bs_t)
+                self.assertEqual(lbs.get_access_cost(self.cost),
+                                 lbs_mp.get_access_cost(self.cost))
+
     def test_bufshr_access(self):
         ''' Access of scheme using bufshr. '''
 
@@ -14,10 +14,14 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+from nn_dataflow.core import BufShrScheme
 from nn_dataflow.core import DataCategoryEnum as de
 from nn_dataflow.core import loop_blocking_solver
+from nn_dataflow.core import LoopBlockingScheme
 from nn_dataflow.core import MemHierEnum as me
+from nn_dataflow.core import NodeRegion
 from nn_dataflow.core import Option
+from nn_dataflow.core import PhyDim2
 
 from . import TestLoopBlockingFixture
 
@@ -145,6 +149,114 @@ class TestLoopBlockingSolver(TestLoopBlockingFixture):
 
             self.test_reside_sol_opt(wlkey=wlkey)
 
+    def test_reside_sol_opt_data_region(self):
+        ''' Data reside solution optimal with non-DRAM data regions. '''
+
+        for rsrckey in ['SRCNOTDATA', 'DSTNOTDATA']:
+
+            for size_gbuf, size_regf in [(4096, 16), (16384, 32)]:
+
+                key = '{}-{}'.format(rsrckey, size_gbuf)
+                self.resource[key] = self.resource[rsrckey]._replace(
+                    size_gbuf=size_gbuf, size_regf=size_regf)
+
+                self.test_reside_sol_opt(rsrckey=key)
+
+    def test_reside_sol_data_local(self):
+        ''' Data reside solution with local data regions. '''
+
+        resource = self.resource['DATALOCAL']._replace(size_gbuf=65536,
+                                                       size_regf=64)
+        self.resource['DATALOCAL-SM'] = resource
+
+        for reside_dce in range(de.NUM):
+
+            optkey = self.optkeys_bypsol[reside_dce]
+
+            for bl_ts, bl_ords \
+                    in loop_blocking_solver.gen_loopblocking_gbuf_reside(
+                            self.nld['BASE'], resource,
+                            self.options[optkey]):
+
+                lbs = self._lbs(bl_ts, bl_ords, rsrckey='DATALOCAL-SM',
+                                optkey='BYP')
+                self.assertTrue(lbs.is_valid())
+                self.assertTrue(lbs.stored_in_gbuf[de.IFM])
+                self.assertTrue(lbs.stored_in_gbuf[de.OFM])
+                self.assertEqual(lbs.fetch[0][de.IFM], 1)
+                self.assertEqual(lbs.fetch[0][de.OFM], 1)
+
+    def test_reside_sol_bufshr(self):
+        ''' Data reside solution with buffer sharing. '''
+
+        resource = self.resource['PAR']._replace(size_gbuf=4000)
+
+        shared = [False] * de.NUM
+
+        for part in self._gen_all_partition():
+
+            p_nld = self._part_nld(part)
+
+            bufshr = BufShrScheme(resource.proc_region, part)
+
+            for reside_dce in range(de.NUM):
+
+                options = self.options[self.optkeys_bypsol[reside_dce]] \
+                        ._replace(hw_gbuf_sharing=True)
+
+                for bl_ts, bl_ords \
+                        in loop_blocking_solver.gen_loopblocking_gbuf_reside(
+                                p_nld, resource, options, bufshr=bufshr):
+
+                    lbs = LoopBlockingScheme(p_nld, bl_ts, bl_ords, resource,
+                                             bufshr, options)
+                    self.assertTrue(lbs.is_valid())
+
+                    if lbs.bufshr_subgrp_size[reside_dce] > 1:
+                        shared[reside_dce] = True
+
+        # The reside data category uses the shared capacity.
+        self.assertTrue(all(shared))
+
+    def test_reside_sol_bufshr_data_region(self):
+        ''' Data reside solution with buffer sharing and data regions. '''
+
+        gen_sol = loop_blocking_solver.gen_loopblocking_gbuf_reside
+
+        resource = self.resource['PAR']._replace(size_gbuf=4000)
+        far_region = NodeRegion(origin=PhyDim2(5, 5), dim=PhyDim2(1, 1),
+                                type=NodeRegion.PROC)
+
+        for src_region, dst_region in [(far_region, resource.dram_region),
+                                       (resource.dram_region, far_region),
+                                       (resource.proc_region,
+                                        resource.proc_region)]:
+
+            rsrc = resource._replace(src_data_region=src_region,
+                                     dst_data_region=dst_region)
+
+            for part in self._gen_all_partition():
+
+                p_nld = self._part_nld(part)
+
+                bufshr = BufShrScheme(rsrc.proc_region, part)
+
+                for reside_dce in range(de.NUM):
+
+                    options = self.options[self.optkeys_bypsol[reside_dce]] \
+                            ._replace(hw_gbuf_sharing=True)
+
+                    for bl_ts, bl_ords in gen_sol(p_nld, rsrc, options,
+                                                  bufshr=bufshr):
+
+                        lbs = LoopBlockingScheme(p_nld, bl_ts, bl_ords, rsrc,
+                                                 bufshr, options)
+                        self.assertTrue(lbs.is_valid())
+                        if src_region.type != NodeRegion.DRAM:
+                            self.assertEqual(lbs.fetch[0][de.IFM], 1)
+                        if dst_region.type != NodeRegion.DRAM:
+                            self.assertEqual(lbs.fetch[0][de.OFM], 1)
+
     def test_reside_sol_cnt(self):
         ''' Data reside solution count. '''
 
@@ -15,12 +15,16 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
 import itertools
+import os
+import subprocess
+import sys
 
 from nn_dataflow.core import ConvLayer
 from nn_dataflow.core import NodeRegion
 from nn_dataflow.core import PhyDim2
 from nn_dataflow.core import PipelineSegment
 from nn_dataflow.core import PipelineSegmentTiming
+from nn_dataflow.core import SchedulingConstraintLayerPipeline
 
 from . import TestPipelineFixture
 
@@ -430,6 +434,26 @@ class TestPipelineSegment(TestPipelineFixture):
         for constraint, _ in segment.gen_constraint():
             self._validate_constraint(segment, constraint)
 
+    def test_gen_constraint_single_layer_lazy_import(self):
+        ''' gen_constraint() single-layer segment without sympy. '''
+        cwd = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', '..', '..')
+        code = '''if True:
+            import sys
+            from nn_dataflow.core import PipelineSegment
+            from nn_dataflow.tests.pipeline_test import TestPipelineFixture
+            fixture = TestPipelineFixture()
+            fixture.setUp()
+            net = fixture.net['net1']
+            segment = PipelineSegment(((net.firsts()[0],),), net,
+                                      fixture.batch_size, fixture.resource)
+            assert segment.valid
+            assert len(list(segment.gen_constraint())) == 1
+            sys.exit(1 if 'sympy' in sys.modules else 0)
+            '''
+        self.assertEqual(subprocess.call([sys.executable, '-c', code],
+                                         cwd=cwd), 0)
+
     def test_gen_constraint_fbofm_init(self):
         ''' gen_constraint() deciding fbofm_init. '''
 
@@ -592,6 +616,45 @@ class TestPipelineSegment(TestPipelineFixture):
                                        'to large.')
                 last_hints = hints
 
+    def test_gen_constraint_compiled(self):
+        ''' gen_constraint() compiled symargs match direct substitution. '''
+
+        # Use ZFNet to include local-region layers with lazily updated rules.
+        net = self.net['zfnet']
+
+        for segment in self._gen_all_segment(net):
+            if not segment.valid:
+                continue
+
+            syms = list(segment.cstr_symvals.keys())
+            cstrs = {}
+
+            for constraint, hints in segment.gen_constraint():
+
+                if None in segment.cstr_symvals[syms[0]]:
+                    # Dummy symbol.
+                    subs_args = tuple()
+                else:
+                    subs_args = tuple(zip(syms, hints))
+                subs_symargs = segment._subs_symargs(
+                    segment.cstr_symargs, subs_args)
+
+                for c, a in zip(itertools.chain.from_iterable(constraint),
+                                itertools.chain.from_iterable(subs_symargs)):
+                    kwargs = {'topbat': int(a.get('topbat', 0)),
+                              'fbifm': bool(a.get('fbifm', False)),
+                              'fbofm': bool(a.get('fbofm', False)),
+                              'update_dict': a.get('update_dict')}
+                    if not kwargs['fbifm']:
+                        kwargs['topifm'] = int(a.get('topifm', 0))
+                    if not kwargs['fbofm']:
+                        kwargs['topofm'] = int(a.get('topofm', 0))
+                    self.assertEqual(
+                        c, SchedulingConstraintLayerPipeline(**kwargs))
+                    # New instances every time, as they can be updated.
+                    self.assertNotIn(id(c), cstrs)
+                    cstrs[id(c)] = c
+
     def test_gen_constraint_max_ovhd(self):
         ''' gen_constraint() with max_time_overhead. '''
 
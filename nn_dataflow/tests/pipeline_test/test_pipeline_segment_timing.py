@@ -100,6 +100,30 @@ class TestPipelineSegmentTiming(TestPipelineFixture):
         timing.add('2', self._make_sched_res((3, 2, 0), 123, top_tb=4))
         self.assertEqual(timing.bat_ngrp, 1)
 
+    def test_copy(self):
+        ''' copy(). '''
+        timing = PipelineSegmentTiming(self.net1, 3)
+        timing.add('0', self._make_sched_res((3, 0, 0), 123,
+                                             top_to=3, top_tb=2))
+        timing.add('1', self._make_sched_res((3, 1, 0), 141,
+                                             top_ti=3, top_tb=2))
+
+        timing2 = timing.copy()
+        timing2.add('1p', self._make_sched_res((3, 1, 1), 12,
+                                               top_ti=3, top_tb=2))
+        timing2.add('2', self._make_sched_res((3, 2, 0), 123, top_tb=4))
+
+        self.assertTupleEqual(timing.last_sched_seq, (3, 1, 0))
+        self.assertEqual(timing.bat_ngrp, 2)
+        self.assertListEqual(list(timing.layer2idx), ['0', '1'])
+        self.assertListEqual([len(tl) for tl in timing.timing_list], [1, 1])
+
+        self.assertTupleEqual(timing2.last_sched_seq, (3, 2, 0))
+        self.assertEqual(timing2.bat_ngrp, 1)
+        self.assertListEqual(list(timing2.layer2idx), ['0', '1', '1p', '2'])
+        self.assertListEqual([len(tl) for tl in timing2.timing_list],
+                             [1, 2, 1])
+
     def test_add_all_lr(self):
         ''' add() all LocalRegionLayer. '''
         timing = PipelineSegmentTiming(self.netlr, 2)
@@ -16,8 +16,10 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 
 import unittest
 
+import json
 import os
 import subprocess
+import tempfile
 
 class TestNNDataflowSearch(unittest.TestCase):
     ''' Tests for NN dataflow search tool. '''
@@ -44,6 +46,12 @@ class TestNNDataflowSearch(unittest.TestCase):
         ret = self._call(self.args + ['--mem-type', '3D'])
         self.assertEqual(ret, 0)
 
+    def test_pareto(self):
+        ''' With Pareto-optimal goal. '''
+        ret = self._call(self.args + ['--goal', 'pareto', '--top', '4',
+                                      '--solve-loopblocking'])
+        self.assertEqual(ret, 0)
+
     def test_no_dataflow(self):
         ''' No dataflow scheme found. '''
         args = self.args[:]
@@ -52,6 +60,78 @@ class TestNNDataflowSearch(unittest.TestCase):
         ret = self._call(args)
         self.assertEqual(ret, 2)
 
+    def test_jobs(self):
+        ''' With batch jobs. '''
+        base = {'net': 'alex_net', 'batch': 1, 'nodes': [1, 1],
+                'array': [16, 16], 'regf': 512, 'gbuf': 131072}
+        jobs = [base, dict(base, mem_type='3D'), dict(base, gbuf=2),
+                {'net': 'alex_net'}]
+
+        with tempfile.TemporaryDirectory() as tdir:
+            jobs_path = os.path.join(tdir, 'jobs.jsonl')
+            output_path = os.path.join(tdir, 'output.jsonl')
+
+            with open(jobs_path, 'w') as jobs_file:
+                for job in jobs[:2]:
+                    jobs_file.write(json.dumps(job) + '\n')
+            ret = self._call(['python3', '-m',
+                              'nn_dataflow.tools.nn_dataflow_search',
+                              '--jobs', jobs_path, '--jobs-output', output_path,
+                              '-p', '1'])
+            self.assertEqual(ret, 0)
+            with open(output_path) as output:
+                results = [json.loads(line) for line in output]
+            self.assertListEqual([r['job'] for r in results], [0, 1])
+            self.assertTrue(all(r['result']['total_cost'] > 0
+                                for r in results))
+
+            # With failed jobs, and common arguments.
+            with open(jobs_path, 'w') as jobs_file:
+                for job in jobs[2:]:
+                    jobs_file.write(json.dumps(job) + '\n')
+            ret = self._call(['python3', '-m',
+                              'nn_dataflow.tools.nn_dataflow_search',
+                              '--jobs', jobs_path, '--jobs-output', output_path,
+                              '--disable-bypass', 'i', 'o', 'f'])
+            self.assertEqual(ret, 2)
+            with open(output_path) as output:
+                results = [json.loads(line) for line in output]
+            self.assertListEqual([r['job'] for r in results], [0, 1])
+            self.assertTrue(all('error' in r for r in results))
+            # The reason from the argument parser.
+            self.assertIn('invalid job arguments', results[1]['error'])
+            self.assertIn('arguments are required', results[1]['error'])
+
+    def test_jobs_failed_search(self):
+        ''' With batch jobs failing in the search. '''
+        base = {'net': 'alex_net', 'batch': 1, 'nodes': [1, 1],
+                'array': [16, 16], 'regf': 512, 'gbuf': 131072,
+                'solve_loopblocking': True}
+        # Resuming without checkpoint fails after the arguments are parsed.
+        jobs = [base, dict(base, resume=True), base]
+
+        with tempfile.TemporaryDirectory() as tdir:
+            jobs_path = os.path.join(tdir, 'jobs.jsonl')
+            output_path = os.path.join(tdir, 'output.jsonl')
+
+            with open(jobs_path, 'w') as jobs_file:
+                for job in jobs:
+                    jobs_file.write(json.dumps(job) + '\n')
+            ret = self._call(['python3', '-m',
+                              'nn_dataflow.tools.nn_dataflow_search',
+                              '--jobs', jobs_path, '--jobs-output', output_path,
+                              '-p', '1'])
+            self.assertEqual(ret, 2)
+            with open(output_path) as output:
+                results = [json.loads(line) for line in output]
+            self.assertListEqual([r['job'] for r in results], [0, 1, 2])
+            self.assertNotIn('error', results[0])
+            self.assertIn('error', results[1])
+            self.assertNotIn('result', results[1])
+            self.assertNotIn('error', results[2])
+            self.assertEqual(results[2]['result']['total_cost'],
+                             results[0]['result']['total_cost'])
+
     def _call(self, args):
         with open(os.devnull, 'w') as output:
             result = subprocess.call(args, cwd=self.cwd,
@@ -0,0 +1,149 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import unittest
+
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nn_dataflow.tools.nn_dataflow_server import request
+from nn_dataflow.tools.nn_dataflow_server import _Worker
+
+class TestNNDataflowServer(unittest.TestCase):
+    ''' Tests for NN dataflow scheduling server. '''
+
+    def setUp(self):
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        self.cwd = os.path.join(cwd, '..', '..', '..')
+        self.assertTrue(os.path.isdir(self.cwd))
+
+        self.tdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tdir.name, 'server.sock')
+
+        with open(os.devnull, 'w') as devnull:
+            self.server = subprocess.Popen(
+                ['python3', '-m', 'nn_dataflow.tools.nn_dataflow_server',
+                 '--socket', self.path, '--workers', '2',
+                 '--processes', '1'],
+                cwd=self.cwd, stdout=devnull, stderr=devnull)
+
+        for _ in range(600):
+            if os.path.exists(self.path):
+                break
+            time.sleep(0.1)
+        self.assertTrue(os.path.exists(self.path))
+
+        self.job = {'net': 'alex_net', 'batch': 1, 'nodes': [1, 1],
+                    'array': [16, 16], 'regf': 512, 'gbuf': 131072}
+
+    def tearDown(self):
+        self.server.terminate()
+        self.server.wait()
+        self.assertFalse(os.path.exists(self.path))
+        self.tdir.cleanup()
+
+    def test_request(self):
+        ''' Request. '''
+        resp = request(self.path, self.job, req_id=1)
+        self.assertEqual(resp['id'], 1)
+        self.assertNotIn('error', resp)
+        res = resp['result']
+
+        # Same as the search tool.
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output(
+                ['python3', '-m', 'nn_dataflow.tools.nn_dataflow_search',
+                 'alex_net', '--batch', '1', '--nodes', '1', '1',
+                 '--array', '16', '16', '--regf', '512', '--gbuf', '131072',
+                 '--processes', '1'],
+                cwd=self.cwd, stderr=devnull)
+        res_cli = json.loads(output.decode())
+        for key in res_cli:
+            if key in ('elapsed', 'cache_stats'):
+                continue
+            self.assertEqual(res[key], res_cli[key])
+
+        # Warm.
+        resp = request(self.path, self.job, req_id=2)
+        self.assertEqual(resp['result']['total_cost'], res['total_cost'])
+        self.assertLess(resp['result']['elapsed'], res['elapsed'])
+
+    def test_request_error(self):
+        ''' Request with errors. '''
+        resp = request(self.path, {'net': 'alex_net'})
+        self.assertIn('invalid job arguments', resp['error'])
+        self.assertIn('arguments are required', resp['error'])
+
+        resp = request(self.path, dict(self.job, net='not_a_net'))
+        self.assertIn('ImportError', resp['error'])
+
+        resp = request(self.path, dict(self.job, gbuf=2,
+                                       disable_bypass=['i', 'o', 'f']))
+        self.assertEqual(resp['error'], 'no valid dataflow found')
+
+    def test_concurrent_cancel(self):
+        ''' Concurrent requests and cancellation. '''
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            with sock.makefile('rw') as sfile:
+                sfile.write(json.dumps({'id': 'a',
+                                        'args': dict(self.job, batch=8)})
+                            + '\n')
+                sfile.write(json.dumps({'id': 'b', 'args': self.job}) + '\n')
+                sfile.flush()
+                time.sleep(0.5)
+                sfile.write(json.dumps({'id': 'a', 'cancel': True}) + '\n')
+                sfile.flush()
+
+                resps = dict((r['id'], r) for r in
+                             (json.loads(sfile.readline()) for _ in range(2)))
+
+        self.assertTrue(resps['a']['cancelled'])
+        self.assertNotIn('result', resps['a'])
+        self.assertGreater(resps['b']['result']['total_cost'], 0)
+
+        # The cancelled worker is replaced.
+        for req_id in range(2):
+            resp = request(self.path, self.job, req_id=req_id)
+            self.assertGreater(resp['result']['total_cost'], 0)
+
+    def test_worker_terminate(self):
+        ''' Terminated worker closes the connection. '''
+        mp_context = multiprocessing.get_context('spawn')
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Idle.
+            worker = _Worker(mp_context)
+            worker.terminate()
+            self.assertTrue(worker.conn.closed)
+
+            # Pending receiving.
+            worker = _Worker(mp_context)
+            future = worker.recv(executor)
+            worker.terminate()
+            with self.assertRaises(EOFError):
+                future.result(timeout=60)
+            # The callbacks run after the result is set.
+            for _ in range(100):
+                if worker.conn.closed:
+                    break
+                time.sleep(0.01)
+            self.assertTrue(worker.conn.closed)
@@ -0,0 +1,106 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import unittest
+
+import json
+import os
+import subprocess
+
+class TestNNDataflowSweep(unittest.TestCase):
+    ''' Tests for NN dataflow sweep tool. '''
+
+    def setUp(self):
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        self.cwd = os.path.join(cwd, '..', '..', '..')
+        self.assertTrue(os.path.isdir(self.cwd))
+        self.assertTrue(os.path.isdir(
+            os.path.join(self.cwd, 'nn_dataflow', 'tools')))
+
+        self.args = ['python3', '-m', 'nn_dataflow.tools.nn_dataflow_sweep',
+                     'alex_net', '--batch', '1',
+                     '--node', '1', '1', '--array', '16', '16',
+                     '--regf', '512', '--gbuf', '131072',
+                     '--processes', '1']
+
+    def test_sweep(self):
+        ''' Sweep. '''
+        ret, res = self._call(self.args + ['--sweep-array', '8x8', '16x16',
+                                           '--sweep-gbuf', '65536', '131072',
+                                           '--sweep-processes', '2'])
+        self.assertEqual(ret, 0)
+
+        results = res['results']
+        self.assertListEqual([r['config'] for r in results],
+                             [{'array': [8, 8], 'gbuf': 65536},
+                              {'array': [8, 8], 'gbuf': 131072},
+                              {'array': [16, 16], 'gbuf': 65536},
+                              {'array': [16, 16], 'gbuf': 131072}])
+        self.assertListEqual([r['num_pes'] for r in results],
+                             [64, 64, 256, 256])
+        self.assertTrue(all(r['total_cost'] > 0 for r in results))
+
+        # Pareto rows are not dominated.
+        keys = ['total_cost', 'total_time', 'num_pes', 'total_sram']
+        pareto = res['pareto']
+        self.assertTrue(pareto)
+        for p in pareto:
+            self.assertIn(p, results)
+            self.assertFalse(any(
+                all(r[k] <= p[k] for k in keys)
+                and any(r[k] < p[k] for k in keys)
+                for r in results))
+        # Smaller buffer is always on the frontier by area.
+        self.assertIn(results[0], pareto)
+
+    def test_sweep_sequential(self):
+        ''' Sweep in a single process. '''
+        ret, res = self._call(self.args + ['--sweep-regf', '256', '512',
+                                           '--sweep-processes', '1'])
+        self.assertEqual(ret, 0)
+        self.assertEqual(len(res['results']), 2)
+
+    def test_no_dataflow(self):
+        ''' No dataflow scheme found. '''
+        ret, res = self._call(self.args + ['--sweep-gbuf', '2', '4',
+                                           '--disable-bypass', 'i', 'o', 'f'])
+        self.assertEqual(ret, 2)
+        self.assertTrue(all(r['total_cost'] is None for r in res['results']))
+        self.assertListEqual(res['pareto'], [])
+
+    def test_failed_config(self):
+        ''' Failed configuration does not abort the sweep. '''
+        ret, res = self._call(self.args + ['--sweep-dram-bw',
+                                           '64', '-1', '128',
+                                           '--sweep-processes', '1'])
+        self.assertEqual(ret, 0)
+
+        results = res['results']
+        self.assertEqual(len(results), 3)
+        self.assertNotIn('error', results[0])
+        self.assertIn('error', results[1])
+        self.assertNotIn('error', results[2])
+        self.assertIsNone(results[1]['total_cost'])
+        self.assertTrue(results[0]['total_cost'] > 0)
+        self.assertTrue(results[2]['total_cost'] > 0)
+        self.assertNotIn(results[1], res['pareto'])
+
+    def _call(self, args):
+        with open(os.devnull, 'w') as devnull:
+            proc = subprocess.run(args, cwd=self.cwd, stdout=subprocess.PIPE,
+                                  stderr=devnull, check=False)
+        return proc.returncode, json.loads(proc.stdout.decode())
+
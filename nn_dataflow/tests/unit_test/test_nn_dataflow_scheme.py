@@ -14,6 +14,7 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+import pickle
 import unittest
 from collections import OrderedDict
 
@@ -314,6 +315,117 @@ class TestNNDataflowScheme(unittest.TestCase):
         for layer_name in df:
             self.assertEqual(id(df[layer_name]), id(df2[layer_name]))
 
+    def test_copy_extend(self):
+        ''' copy and extend independently. '''
+        df = self.dtfl
+        total_cost = df.total_cost
+        total_time = df.total_time
+
+        df2 = df.copy()
+        df2['f1'] = self.c1res._replace(sched_seq=(1, 0, 0))
+        df3 = df.copy()
+        df3['f1'] = self.c1res._replace(sched_seq=(0, 3, 0))
+
+        self.assertEqual(len(df), 3)
+        self.assertNotIn('f1', df)
+        self.assertAlmostEqual(df.total_cost, total_cost)
+        self.assertAlmostEqual(df.total_time, total_time)
+        self.assertEqual(len(df.segment_timing_list), 1)
+        self.assertEqual(len(df.segment_timing_list[0].layer2idx), 3)
+
+        self.assertEqual(len(df2), 4)
+        self.assertEqual(len(df2.segment_timing_list), 2)
+        self.assertEqual(len(df3), 4)
+        self.assertEqual(len(df3.segment_timing_list), 1)
+        self.assertEqual(len(df3.segment_timing_list[0].layer2idx), 4)
+
+        # Same as scheduling from scratch.
+        for dfx in [df2, df3]:
+            df4 = NNDataflowScheme(self.network, self.input_layout)
+            for layer_name in dfx:
+                df4[layer_name] = dfx[layer_name]
+            self.assertAlmostEqual(dfx.total_cost, df4.total_cost)
+            self.assertAlmostEqual(dfx.total_time, df4.total_time)
+            self.assertListEqual(dfx.segment_time_list(),
+                                 df4.segment_time_list())
+
+    def test_copy_extend_order(self):
+        ''' copy and extend in different orders. '''
+        df = NNDataflowScheme(self.network, self.input_layout)
+        df['c1'] = self.c1res
+
+        df2 = df.copy()
+        df2['p1'] = self.p1res
+        df2['p2'] = self.p2res
+        df3 = df.copy()
+        df3['p2'] = self.p2res._replace(sched_seq=(0, 1, 0))
+        df4 = df.copy()
+        df4['p1'] = self.p1res
+
+        self.assertIn('c1', df)
+        self.assertNotIn('p1', df)
+        self.assertNotIn('p2', df)
+        self.assertIn('p2', df2)
+        self.assertIn('p2', df3)
+        self.assertNotIn('p1', df3)
+        self.assertIn('p1', df4)
+        self.assertNotIn('p2', df4)
+        with self.assertRaises(KeyError):
+            _ = df3['p1']
+
+        self.assertListEqual(list(df2), ['c1', 'p1', 'p2'])
+        self.assertListEqual(list(df3), ['c1', 'p2'])
+        self.assertListEqual(list(df4), ['c1', 'p1'])
+        self.assertEqual(df2['p1'], self.p1res)
+        self.assertEqual(df3['p2'].sched_seq, (0, 1, 0))
+
+        df3['p1'] = self.p1res._replace(sched_seq=(0, 2, 0))
+        self.assertListEqual(list(df3), ['c1', 'p2', 'p1'])
+        self.assertEqual(df3['p1'].sched_seq, (0, 2, 0))
+        self.assertEqual(df2['p2'], self.p2res)
+
+        with self.assertRaisesRegex(KeyError, 'NNDataflowScheme: .*exists'):
+            df4['p1'] = self.p1res
+
+    def test_pickle(self):
+        ''' Pickle. '''
+        df = self.dtfl.copy()
+        df['f1'] = self.c1res._replace(sched_seq=(1, 0, 0))
+
+        df2 = pickle.loads(pickle.dumps(df))
+        self.assertListEqual(list(df2), list(df))
+        self.assertAlmostEqual(df2.total_cost, df.total_cost)
+        self.assertAlmostEqual(df2.total_time, df.total_time)
+        self.assertListEqual(df2.segment_time_list(), df.segment_time_list())
+        self.assertEqual(df2.last_seg_idx, df.last_seg_idx)
+
+    def test_dp_state(self):
+        ''' dp_state. '''
+        df1 = NNDataflowScheme(self.network, self.input_layout)
+        df1['c1'] = self.c1res
+        df2 = NNDataflowScheme(self.network, self.input_layout)
+        df2['c1'] = self.c1res._replace(
+            scheme=OrderedDict(self.c1res.scheme, cost=2.5))
+        self.assertNotAlmostEqual(df1.total_cost, df2.total_cost)
+
+        self.assertEqual(df1.dp_state(('c1',)), df2.dp_state(('c1',)))
+        self.assertEqual(df1.dp_state(('c1',), in_segment=True),
+                         df2.dp_state(('c1',), in_segment=True))
+
+        # Different ofmap layout.
+        df3 = NNDataflowScheme(self.network, self.input_layout)
+        df3['c1'] = self.c1res._replace(ofmap_layout=self.input_layout)
+        self.assertNotEqual(df1.dp_state(('c1',)), df3.dp_state(('c1',)))
+        self.assertEqual(df1.dp_state(tuple()), df3.dp_state(tuple()))
+
+        # Different timing in the last segment.
+        df4 = NNDataflowScheme(self.network, self.input_layout)
+        df4['c1'] = self.c1res._replace(
+            scheme=OrderedDict(self.c1res.scheme, time=400.))
+        self.assertEqual(df1.dp_state(('c1',)), df4.dp_state(('c1',)))
+        self.assertNotEqual(df1.dp_state(('c1',), in_segment=True),
+                            df4.dp_state(('c1',), in_segment=True))
+
     def test_copy_ext(self):
         ''' copy external layers. '''
         self.network.add_ext('e0', self.network.input_layer())
@@ -76,6 +76,16 @@ class TestOption(unittest.TestCase):
         self.assertEqual(options.opt_goal, 'e')
         self.assertEqual(options.ntops, 1)
         self.assertEqual(options.nprocesses, 1)
+        self.assertEqual(options.loopblocking_chunk_size, 0)
+        self.assertEqual(options.loopblocking_bound_prune, True)
+        self.assertEqual(options.sched_cache_dir, None)
+        self.assertEqual(options.time_budget, float('inf'))
+        self.assertEqual(options.checkpoint_path, None)
+        self.assertEqual(options.checkpoint_resume, False)
+        self.assertEqual(options.parallel_segment_search, False)
+        self.assertEqual(options.layer_dp_state_merge, False)
+        self.assertEqual(options.segment_bound_prune, True)
+        self.assertEqual(options.partition_bound_prune, True)
         self.assertEqual(options.verbose, False)
 
     def test_invalid_args(self):
@@ -103,12 +113,11 @@ class TestOption(unittest.TestCase):
         with self.assertRaisesRegex(ValueError, 'Option: .*sw_gbuf_bypass.*'):
             _ = Option(sw_gbuf_bypass=(False, False))
 
-    def test_invalid_swsol_hwbufshr(self):
-        ''' Invalid sw_solve_loopblocking and hw_gbuf_sharing comb. '''
-        with self.assertRaisesRegex(ValueError,
-                                    'Option: .*sw_solve_loopblocking.*'
-                                    'hw_gbuf_sharing.*'):
-            _ = Option(sw_solve_loopblocking=True, hw_gbuf_sharing=True)
+    def test_valid_swsol_hwbufshr(self):
+        ''' Valid sw_solve_loopblocking and hw_gbuf_sharing comb. '''
+        options = Option(sw_solve_loopblocking=True, hw_gbuf_sharing=True)
+        self.assertTrue(options.sw_solve_loopblocking)
+        self.assertTrue(options.hw_gbuf_sharing)
 
     def test_invalid_hwaccfwd_hwbufshr(self):
         ''' Invalid hw_access_forwarding and hw_gbuf_sharing comb. '''
@@ -117,12 +126,12 @@ class TestOption(unittest.TestCase):
                                     'hw_gbuf_sharing.*'):
             _ = Option(hw_access_forwarding=True, hw_gbuf_sharing=True)
 
-    def test_invalid_swsol_hwswb(self):
-        ''' Invalid sw_solve_loopblocking and hw_gbuf_save_writeback comb. '''
-        with self.assertRaisesRegex(ValueError,
-                                    'Option: .*sw_solve_loopblocking.*'
-                                    'hw_gbuf_save_writeback.*'):
-            _ = Option(sw_solve_loopblocking=True, hw_gbuf_save_writeback=True)
+    def test_valid_swsol_hwswb(self):
+        ''' Valid sw_solve_loopblocking and hw_gbuf_save_writeback comb. '''
+        options = Option(sw_solve_loopblocking=True,
+                         hw_gbuf_save_writeback=True)
+        self.assertTrue(options.sw_solve_loopblocking)
+        self.assertTrue(options.hw_gbuf_save_writeback)
 
     def test_invalid_part_hybrid_ifmaps(self):
         ''' Invalid partition_hybrid and partition_ifmaps comb. '''
@@ -157,9 +166,72 @@ class TestOption(unittest.TestCase):
             _ = Option(opt_goal='o')
         with self.assertRaisesRegex(ValueError, 'Option: .*opt_goal.*'):
             _ = Option(opt_goal='E')
+        with self.assertRaisesRegex(ValueError, 'Option: .*opt_goal.*'):
+            _ = Option(opt_goal='PARETO')
+        self.assertEqual(Option(opt_goal='pareto').opt_goal, 'pareto')
+
+    def test_invalid_lb_chunk_size(self):
+        ''' Invalid loopblocking_chunk_size. '''
+        with self.assertRaisesRegex(TypeError,
+                                    'Option: .*loopblocking_chunk_size.*'):
+            _ = Option(loopblocking_chunk_size=1.5)
+
+        with self.assertRaisesRegex(ValueError,
+                                    'Option: .*loopblocking_chunk_size.*'):
+            _ = Option(loopblocking_chunk_size=-1)
+
+    def test_invalid_sched_cache_dir(self):
+        ''' Invalid sched_cache_dir. '''
+        with self.assertRaisesRegex(TypeError, 'Option: .*sched_cache_dir.*'):
+            _ = Option(sched_cache_dir=1)
+
+    def test_invalid_time_budget(self):
+        ''' Invalid time_budget. '''
+        with self.assertRaisesRegex(TypeError, 'Option: .*time_budget.*'):
+            _ = Option(time_budget='1')
+
+        with self.assertRaisesRegex(ValueError, 'Option: .*time_budget.*'):
+            _ = Option(time_budget=-1)
+
+    def test_invalid_checkpoint(self):
+        ''' Invalid checkpoint_path and checkpoint_resume. '''
+        with self.assertRaisesRegex(TypeError, 'Option: .*checkpoint_path.*'):
+            _ = Option(checkpoint_path=1)
+
+        with self.assertRaisesRegex(ValueError,
+                                    'Option: .*checkpoint_resume.*'):
+            _ = Option(checkpoint_resume=True)
 
     def test_option_list(self):
         ''' Accessor option_list. '''
         options = Option()
         self.assertCountEqual(options.option_list(), options._fields)
 
+
+    def test_result_key(self):
+        ''' Accessor result_key. '''
+        options = Option(partition_hybrid=True, ntops=4)
+        self.assertEqual(options.result_key(), options)
+        self.assertEqual(options.result_key(per_node=True), options)
+
+        options2 = options._replace(nprocesses=8,
+                                    loopblocking_chunk_size=16,
+                                    loopblocking_bound_prune=False,
+                                    sched_cache_dir='cache',
+                                    time_budget=10,
+                                    checkpoint_path='ckpt',
+                                    checkpoint_resume=True,
+                                    parallel_segment_search=True,
+                                    segment_bound_prune=False,
+                                    partition_bound_prune=False,
+                                    verbose=True)
+        self.assertEqual(options2.result_key(), options)
+        self.assertEqual(options2.result_key(per_node=True), options)
+
+        options3 = options._replace(layer_dp_state_merge=True)
+        self.assertNotEqual(options3.result_key(), options)
+        self.assertEqual(options3.result_key(per_node=True), options)
+
+        options4 = options._replace(ntops=1)
+        self.assertNotEqual(options4.result_key(), options)
+        self.assertNotEqual(options4.result_key(per_node=True), options)
@@ -293,3 +293,42 @@ class TestResource(unittest.TestCase):
                          no_time_mux=None,
                         )
 
+
+    def test_canonical(self):
+        ''' Get canonical. '''
+        resource = Resource(proc_region=self.proc_region,
+                            dram_region=self.dram_region,
+                            src_data_region=self.src_data_region,
+                            dst_data_region=self.dst_data_region,
+                            dim_array=PhyDim2(16, 16),
+                            size_gbuf=131072,
+                            size_regf=512,
+                            array_bus_width=8,
+                            dram_bandwidth=128,
+                            no_time_mux=False,
+                           )
+        self.assertIs(resource.canonical(), resource)
+
+        proc_region = self.proc_region._replace(origin=PhyDim2(3, 1))
+        resource2 = resource._replace(
+            proc_region=proc_region,
+            dst_data_region=proc_region)
+        canonical = resource2.canonical()
+
+        self.assertTupleEqual(canonical.proc_region.origin, (0, 0))
+        self.assertTupleEqual(canonical.proc_region.dim, (2, 2))
+        self.assertTupleEqual(canonical.dram_region.origin, (-3, -1))
+        self.assertTupleEqual(canonical.src_data_region.origin, (-3, -1))
+        self.assertEqual(canonical.dst_data_region, canonical.proc_region)
+        self.assertEqual(canonical.dim_array, resource2.dim_array)
+        self.assertEqual(canonical.size_gbuf, resource2.size_gbuf)
+
+        # Same canonical form when translated together.
+        def _translate(region):
+            return region._replace(origin=region.origin + PhyDim2(2, 5))
+        resource3 = resource2._replace(
+            proc_region=_translate(resource2.proc_region),
+            dram_region=_translate(resource2.dram_region),
+            src_data_region=_translate(resource2.src_data_region),
+            dst_data_region=_translate(resource2.dst_data_region))
+        self.assertEqual(resource3.canonical(), canonical)
@@ -0,0 +1,95 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import os
+import tempfile
+import unittest
+
+from nn_dataflow.core import ConvLayer
+from nn_dataflow.core import Option
+from nn_dataflow.core import ScheduleCache
+from nn_dataflow.core import SchedulingConstraint
+
+class TestScheduleCache(unittest.TestCase):
+    ''' Tests for ScheduleCache. '''
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_put(self):
+        ''' get and put. '''
+        cache = ScheduleCache(self.cache_dir, version='1')
+        self.assertTrue(os.path.isfile(cache.path))
+
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', [1, (2, 3)])
+        self.assertListEqual(cache.get('a'), [1, (2, 3)])
+        self.assertEqual(len(cache), 1)
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+        cache.close()
+
+    def test_persistent(self):
+        ''' Persistent across instances. '''
+        cache = ScheduleCache(self.cache_dir, version='1')
+        cache.put('a', 1)
+        cache.close()
+
+        cache = ScheduleCache(self.cache_dir, version='1')
+        self.assertEqual(cache.get('a'), 1)
+        cache.close()
+
+    def test_version(self):
+        ''' Invalidated by version. '''
+        cache = ScheduleCache(self.cache_dir, version='1')
+        cache.put('a', 1)
+        cache.close()
+
+        cache = ScheduleCache(self.cache_dir, version='2')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_default_version(self):
+        ''' Default version. '''
+        cache = ScheduleCache(self.cache_dir)
+        self.assertTrue(cache.version)
+        cache.close()
+
+    def test_make_key(self):
+        ''' make_key. '''
+        key = ScheduleCache.make_key(ConvLayer(3, 8, 16, 3), 4,
+                                     SchedulingConstraint(topbat=2),
+                                     Option(), ScheduleCache)
+        self.assertEqual(key, ScheduleCache.make_key(
+            ConvLayer(3, 8, 16, 3), 4, SchedulingConstraint(topbat=2),
+            Option(), ScheduleCache))
+
+        self.assertNotEqual(key, ScheduleCache.make_key(
+            ConvLayer(3, 8, 16, 1), 4, SchedulingConstraint(topbat=2),
+            Option(), ScheduleCache))
+        self.assertNotEqual(key, ScheduleCache.make_key(
+            ConvLayer(3, 8, 16, 3), 4, SchedulingConstraint(topbat=1),
+            Option(), ScheduleCache))
+        self.assertNotEqual(key, ScheduleCache.make_key(
+            ConvLayer(3, 8, 16, 3), 4, SchedulingConstraint(topbat=2),
+            Option(ntops=2), ScheduleCache))
@@ -14,6 +14,7 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
+import itertools
 import math
 import unittest
 
@@ -258,6 +259,34 @@ class TestUtilFactorize(unittest.TestCase):
                 cnt += 1
         self.assertEqual(len(fs_ord), cnt)
 
+    def test_order(self):
+        ''' Order and completeness against brute force. '''
+        for val, limits in [(1, None), (13, None), (360, None),
+                            (1024, (10, 20)), (720, (6, 1)), (96, (0, 5))]:
+            brute = [(f0, f1, val // f0 // f1) for f0, f1
+                     in itertools.product(range(1, val + 1), repeat=2)
+                     if val % (f0 * f1) == 0
+                     and (limits is None or (f0 <= limits[0]
+                                             and f1 <= limits[1]))]
+            self.assertListEqual(list(util.factorize(val, 3, limits)), brute)
+
+        self.assertListEqual(list(util.factorize(12, 1)), [(12,)])
+
+    def test_repeat(self):
+        ''' Repeated calls. '''
+        fs_list = list(util.factorize(2048, 3))
+        it = util.factorize(2048, 3)
+        self.assertEqual(next(it), fs_list[0])
+        self.assertListEqual(list(util.factorize(2048, 3)), fs_list)
+        self.assertListEqual(list(it), fs_list[1:])
+
+    def test_invalid(self):
+        ''' Invalid value. '''
+        with self.assertRaisesRegex(TypeError, 'value must be integers'):
+            _ = util.factorize(2.5, 2)
+        with self.assertRaisesRegex(ValueError, 'value must be positive'):
+            _ = util.factorize(0, 2)
+
 
 class TestUtilClosestFactor(unittest.TestCase):
     ''' Tests for util.closest_factor. '''
@@ -520,6 +549,50 @@ class TestUtilIsclose(unittest.TestCase):
         self.assertFalse(util.isclose(14., 14.001, rel_tol=1e-6, abs_tol=2e-6))
 
 
+class TestUtilParetoFrontier(unittest.TestCase):
+    ''' Tests for util.pareto_frontier. '''
+
+    def test_frontier(self):
+        ''' Non-dominated items. '''
+        items = [(3, 3), (1, 5), (2, 2), (4, 1), (5, 1), (2, 4), (1, 6)]
+        self.assertListEqual(util.pareto_frontier(items, key=lambda x: x),
+                             [(1, 5), (2, 2), (4, 1)])
+
+    def test_identical(self):
+        ''' Identical objectives. '''
+        items = [(2, 2, 'a'), (1, 3, 'b'), (2, 2, 'c'), (1, 3, 'd')]
+        self.assertListEqual(
+            util.pareto_frontier(items, key=lambda x: x[:2]),
+            [(1, 3, 'b'), (2, 2, 'a')])
+
+    def test_inf(self):
+        ''' Infinite objectives. '''
+        inf = float('inf')
+        self.assertListEqual(
+            util.pareto_frontier([(inf, inf), (inf, inf)], key=lambda x: x),
+            [(inf, inf)])
+        self.assertListEqual(
+            util.pareto_frontier([(inf, inf), (1, inf)], key=lambda x: x),
+            [(1, inf)])
+
+    def test_empty(self):
+        ''' Empty. '''
+        self.assertListEqual(util.pareto_frontier([], key=lambda x: x), [])
+
+    def test_cap(self):
+        ''' Size cap. '''
+        items = [(i, 10 - i) for i in range(10)]
+        self.assertListEqual(util.pareto_frontier(items, key=lambda x: x,
+                                                  cap=20), items)
+        self.assertListEqual(util.pareto_frontier(items, key=lambda x: x,
+                                                  cap=1), [(0, 10)])
+        self.assertListEqual(util.pareto_frontier(items, key=lambda x: x,
+                                                  cap=2), [(0, 10), (9, 1)])
+        self.assertListEqual(util.pareto_frontier(items, key=lambda x: x,
+                                                  cap=4),
+                             [(0, 10), (3, 7), (6, 4), (9, 1)])
+
+
 class TestUtilAssertFloatEqInt(unittest.TestCase):
     ''' Tests for util.assert_float_eq_int. '''
 
@@ -15,6 +15,8 @@ program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
 import argparse
+import contextlib
+import io
 import json
 import multiprocessing
 import sys
@@ -81,9 +83,12 @@ def stats_dict(dfsch, cost):
     return stats
 
 
-def do_scheduling(args):
+def do_scheduling(args, shared_pernode_cache=None):
     '''
     Get optimal scheduling for given problem. Return a result schedule.
+
+    `shared_pernode_cache` is an optional dict of the per-node search results
+    shared across multiple calls in the same process.
     '''
 
     ## Network.
@@ -168,13 +173,25 @@ def do_scheduling(args):
                      opt_goal=args.goal.lower(),
                      ntops=args.top,
                      nprocesses=args.processes,
+                     loopblocking_chunk_size=args.loopblocking_chunk_size,
+                     loopblocking_bound_prune=\
+                             not args.disable_loopblocking_prune,
+                     sched_cache_dir=args.cache_dir,
+                     time_budget=args.time_budget,
+                     checkpoint_path=args.checkpoint,
+                     checkpoint_resume=args.resume,
+                     parallel_segment_search=args.parallel_segments,
+                     layer_dp_state_merge=args.merge_dp_states,
+                     segment_bound_prune=not args.disable_segment_prune,
+                     partition_bound_prune=not args.disable_partition_prune,
                      verbose=args.verbose)
 
     ## Search schedules.
 
     nnd = NNDataflow(network, batch_size, resource, cost, MapStrategyEyeriss)
     tbeg = time.time()
-    tops, cache_stats = nnd.schedule_search(options)
+    tops, cache_stats = nnd.schedule_search(
+        options, shared_pernode_cache=shared_pernode_cache)
     tend = time.time()
     telapsed = tend - tbeg
 
@@ -198,15 +215,129 @@ def do_scheduling(args):
     res_map['options'] = options._asdict()
 
     res_map['cache_stats'] = cache_stats
+    res_map['segment_prune_stats'] = nnd.segment_prune_stats
     res_map['elapsed'] = telapsed
 
     stats = stats_dict(top, cost)
     for key, val in stats.items():
         res_map[key] = val
 
+    if options.opt_goal == 'pareto':
+        # The entire energy-delay trade-off, in increasing order of cost.
+        res_map['pareto_frontier'] = [stats_dict(t, cost) for t in tops]
+
     return res_map
 
 
+def job_argv(job):
+    '''
+    Get the command line arguments of a job, given as a dict from the argument
+    names to the values, e.g., `{"net": "alex_net", "batch": 1, "nodes": [1,
+    1], "hybrid_partition": true}`.
+    '''
+    job = dict(job)
+    argv = []
+    if 'net' in job:
+        argv.append(str(job.pop('net')))
+    for key, val in job.items():
+        flag = '--' + key.replace('_', '-')
+        if val is True:
+            argv.append(flag)
+        elif val is False or val is None:
+            continue
+        elif isinstance(val, list):
+            argv.append(flag)
+            argv += [str(v) for v in val]
+        else:
+            argv += [flag, str(val)]
+    return argv
+
+
+def job_args(job, base_argv=None, ap=None):
+    '''
+    Parse the arguments of a job (see `job_argv`), on top of the common command
+    line arguments `base_argv` which can be overridden by the job. `ap` is the
+    argument parser to use, default to `argparser()`.
+
+    Raise ValueError if the job arguments are invalid, with the error message
+    from the argument parser.
+    '''
+    if not isinstance(job, dict):
+        raise ValueError('job must be a JSON object of the arguments.')
+    if base_argv is None:
+        base_argv = []
+    if ap is None:
+        ap = argparser()
+
+    argv = job_argv(job)
+    if 'net' in job:
+        # Keep the positional net name in front, in case the base arguments
+        # end with an option taking variable number of values.
+        argv = argv[:1] + list(base_argv) + argv[1:]
+    else:
+        argv = list(base_argv) + argv
+
+    # The argument parser writes the usage and the error to stderr and exits.
+    # Capture them, and keep the last line of the error in the message.
+    err = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(err):
+            return ap.parse_args(argv)
+    except SystemExit as e:
+        err_lines = err.getvalue().strip().splitlines()
+        reason = err_lines[-1] if err_lines else ''
+        raise ValueError('invalid job arguments {}: {}'
+                         .format(argv, reason)) from e
+
+
+def do_jobs(jobs_file, output, base_argv=None):
+    '''
+    Run the jobs in the JSONL file, one JSON object of the arguments per line
+    (see `job_argv`), in this single process, sharing the per-node search
+    results across jobs. `base_argv` are the common command line arguments of
+    all jobs, which can be overridden by each job.
+
+    Write one JSON line to the `output` file per job, with the job index and
+    the result or the error, as soon as the job finishes. Return whether all
+    jobs have valid dataflows.
+    '''
+    ap = argparser()
+
+    shared_pernode_cache = {}
+    all_valid = True
+
+    for idx, line in enumerate(l for l in jobs_file if l.strip()):
+
+        res_line = OrderedDict()
+        res_line['job'] = idx
+
+        try:
+            args = job_args(json.loads(line), base_argv=base_argv, ap=ap)
+        except ValueError as e:
+            res_line['error'] = str(e)
+            args = None
+
+        if args is not None:
+            # Do not let a failed job abort the remaining ones.
+            try:
+                res = do_scheduling(args,
+                                    shared_pernode_cache=shared_pernode_cache)
+            except Exception as e:  # pylint: disable=broad-except
+                res_line['error'] = str(e)
+            else:
+                res_line['result'] = res
+                if not res:
+                    res_line['error'] = 'no valid dataflow found'
+
+        all_valid = all_valid and 'error' not in res_line
+
+        output.write(json.dumps(res_line, default=lambda _: None))
+        output.write('\n')
+        output.flush()
+
+    return all_valid
+
+
 def argparser():
     ''' Argument parser. '''
 
@@ -303,21 +434,83 @@ def argparser():
                          'number of vertices in a pipeline segment.')
 
     ap.add_argument('-g', '--goal', default='e',
-                    choices=['e', 'd', 'ed', 'E', 'D', 'ED'],
-                    help='Goal of optimization: E(nergy), D(elay), or ED.')
+                    choices=['e', 'd', 'ed', 'pareto', 'E', 'D', 'ED',
+                             'PARETO'],
+                    help='Goal of optimization: E(nergy), D(elay), ED, or '
+                         'PARETO for the energy-delay Pareto-optimal '
+                         'frontier.')
     ap.add_argument('-t', '--top', type=int, default=1,
-                    help='Number of top schedules to keep during search.')
+                    help='Number of top schedules to keep during search. '
+                         'With PARETO goal, the maximum number of schedules '
+                         'on the frontier.')
     ap.add_argument('-p', '--processes', type=int,
                     default=multiprocessing.cpu_count()//2,
                     help='Number of parallel processes to use for search.')
+    ap.add_argument('--loopblocking-chunk-size', type=int, default=0,
+                    help='Number of blocking factor sets in each parallel '
+                         'loop blocking search task. Set 0 to choose '
+                         'automatically.')
+    ap.add_argument('--disable-loopblocking-prune', action='store_true',
+                    help='Disable the lower-bound pruning in loop blocking '
+                         'search, which does not change the results.')
+    ap.add_argument('--cache-dir',
+                    help='Directory of the persistent schedule cache, which '
+                         'is reused across runs. Disabled if not given.')
+    ap.add_argument('--time-budget', type=float, default=float('inf'),
+                    help='Wall-clock time budget of the search in seconds. '
+                         'After that, the remaining layers are scheduled '
+                         'with a degraded fast search.')
+    ap.add_argument('--checkpoint',
+                    help='File to save the search progress after each layer.')
+    ap.add_argument('--resume', action='store_true',
+                    help='Resume the search from the checkpoint file given by '
+                         '--checkpoint, if exists.')
+    ap.add_argument('--parallel-segments', action='store_true',
+                    help='Search the independent pipeline segments ending at '
+                         'the same layer in parallel processes, instead of '
+                         'only parallelizing loop blocking search.')
+    ap.add_argument('--merge-dp-states', action='store_true',
+                    help='Only keep the best one among the partial schedules '
+                         'that have the same state for the following layers, '
+                         'to keep more distinct schedules with --top.')
+    ap.add_argument('--disable-segment-prune', action='store_true',
+                    help='Disable the lower-bound pruning of pipeline '
+                         'segments, which does not change the results.')
+    ap.add_argument('--disable-partition-prune', action='store_true',
+                    help='Disable the lower-bound pruning of partitioning '
+                         'schemes, which does not change the results.')
     ap.add_argument('-v', '--verbose', action='store_true',
                     help='Show progress and details.')
 
+    ap.add_argument('--jobs',
+                    help='JSONL file of jobs to run in a single process, one '
+                         'JSON object of the arguments per line, e.g., '
+                         '{"net": "alex_net", "batch": 1, "nodes": [1, 1]}. '
+                         'The other given arguments are common to all jobs. '
+                         'Write one JSON result line per job.')
+    ap.add_argument('--jobs-output',
+                    help='File to write the job results. Default to stdout.')
+
     return ap
 
 
 def main():
     ''' Main function. '''
+    # The job list does not need the otherwise required arguments.
+    jobs_ap = argparse.ArgumentParser(add_help=False)
+    jobs_ap.add_argument('--jobs')
+    jobs_ap.add_argument('--jobs-output')
+    jobs_args, base_argv = jobs_ap.parse_known_args()
+    if jobs_args.jobs:
+        with open(jobs_args.jobs, encoding='utf-8') as jobs_file:
+            if jobs_args.jobs_output:
+                with open(jobs_args.jobs_output, 'w',
+                          encoding='utf-8') as output:
+                    valid = do_jobs(jobs_file, output, base_argv)
+            else:
+                valid = do_jobs(jobs_file, sys.stdout, base_argv)
+        return 0 if valid else 2
+
     args = argparser().parse_args()
     res = do_scheduling(args)
     json.dump(res, sys.stdout, indent=2, default=lambda _: None)
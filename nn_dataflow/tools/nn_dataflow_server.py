@@ -0,0 +1,299 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from nn_dataflow.tools import nn_dataflow_search
+
+def _worker_main(conn):
+    '''
+    Main function of a worker process, which keeps serving the scheduling
+    requests received from `conn`, sharing the per-node search results across
+    requests. Send back the result and the error message.
+    '''
+    shared_pernode_cache = {}
+    while True:
+        try:
+            args = conn.recv()
+        except EOFError:
+            break
+        try:
+            res = nn_dataflow_search.do_scheduling(
+                args, shared_pernode_cache=shared_pernode_cache)
+            conn.send((res, None))
+        except Exception as e:  # pylint: disable=broad-except
+            conn.send((None, '{}: {}'.format(type(e).__name__, e)))
+
+
+class _Worker():
+    ''' A worker process. '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, mp_context):
+        self.conn, child_conn = mp_context.Pipe()
+        # Not daemonic, so the worker can use its own pool of processes.
+        self.process = mp_context.Process(target=_worker_main,
+                                          args=(child_conn,))
+        self.process.start()
+        child_conn.close()
+        # Future of the latest receiving from the connection in an executor.
+        self.recv_future = None
+
+    def recv(self, executor):
+        '''
+        Receive from the connection in the `executor`. Return the
+        concurrent.futures.Future.
+        '''
+        self.recv_future = executor.submit(self.conn.recv)
+        return self.recv_future
+
+    def terminate(self):
+        '''
+        Terminate the worker process. The connection is closed after any
+        pending receiving returns, which raises EOFError when the process is
+        terminated.
+        '''
+        self.process.terminate()
+        self.process.join()
+        if self.recv_future is None:
+            self.conn.close()
+        else:
+            # Called immediately if already done or cancelled.
+            self.recv_future.add_done_callback(lambda _: self.conn.close())
+
+
+class SchedulingServer():
+    '''
+    Scheduling server over a Unix domain socket, which keeps a number of warm
+    worker processes to serve the scheduling requests.
+
+    `base_argv` are the common `nn_dataflow_search` arguments of all requests,
+    which can be overridden by each request.
+
+    Clients send requests as JSON lines. A request is a JSON object with an
+    `id` chosen by the client, and the `args` in the format of the
+    `nn_dataflow_search` jobs (see `nn_dataflow_search.job_argv`). A request
+    with `cancel` set to true cancels the pending request with the same `id`.
+    Closing the connection cancels all its pending requests.
+
+    The server responds a JSON line for each request when it finishes, with
+    the `id`, and the `result` of `nn_dataflow_search.do_scheduling`, or the
+    `error`, or `cancelled` set to true. The requests from the same or
+    different clients are served concurrently by the worker processes.
+    '''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, path, num_workers=1, base_argv=None):
+        self.path = path
+        self.num_workers = num_workers
+        self.base_argv = base_argv if base_argv else []
+
+        # Use spawn, as the event loop may run other threads.
+        self.mp_context = multiprocessing.get_context('spawn')
+        # Threads to wait for the results from the worker processes.
+        self.executor = ThreadPoolExecutor(max_workers=num_workers)
+
+        self.workers = []
+        self.idle_workers = None
+
+    async def serve(self):
+        ''' Serve the requests until cancelled or terminated. '''
+        # Prefer the most recently used worker, whose caches are the warmest
+        # for repeated requests.
+        self.idle_workers = asyncio.LifoQueue()
+        for _ in range(self.num_workers):
+            self._add_worker()
+
+        server = await asyncio.start_unix_server(self._handle_client,
+                                                 path=self.path)
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in self.workers:
+                worker.terminate()
+            self.workers = []
+            self.executor.shutdown(wait=False)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _add_worker(self):
+        worker = _Worker(self.mp_context)
+        self.workers.append(worker)
+        self.idle_workers.put_nowait(worker)
+
+    async def _schedule(self, args):
+        '''
+        Schedule in an idle worker. If cancelled when running, terminate and
+        replace the worker.
+        '''
+        worker = await self.idle_workers.get()
+        try:
+            worker.conn.send(args)
+            res = await asyncio.wrap_future(worker.recv(self.executor))
+        except BaseException:
+            # The worker may be in the middle of a request.
+            worker.terminate()
+            self.workers.remove(worker)
+            self._add_worker()
+            raise
+        self.idle_workers.put_nowait(worker)
+        return res
+
+    async def _serve_request(self, req_id, job, respond):
+        resp = OrderedDict()
+        resp['id'] = req_id
+        try:
+            args = nn_dataflow_search.job_args(job, base_argv=self.base_argv)
+        except ValueError as e:
+            resp['error'] = str(e)
+            await respond(resp)
+            return
+
+        try:
+            res, error = await self._schedule(args)
+        except asyncio.CancelledError:
+            resp['cancelled'] = True
+            await respond(resp)
+            raise
+        except (EOFError, OSError):
+            resp['error'] = 'worker failed'
+            await respond(resp)
+            return
+
+        resp['result'] = res
+        if error:
+            resp['error'] = error
+        elif not res:
+            resp['error'] = 'no valid dataflow found'
+        await respond(resp)
+
+    async def _handle_client(self, reader, writer):
+        tasks = {}
+        lock = asyncio.Lock()
+
+        async def _respond(resp):
+            if writer.is_closing():
+                return
+            line = json.dumps(resp, default=lambda _: None) + '\n'
+            async with lock:
+                try:
+                    writer.write(line.encode())
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    req = json.loads(line.decode())
+                    if not isinstance(req, dict):
+                        raise ValueError
+                except ValueError:
+                    await _respond({'id': None, 'error': 'invalid request'})
+                    continue
+                req_id = req.get('id')
+                # The id can be any JSON value.
+                task_key = json.dumps(req_id, sort_keys=True)
+
+                if req.get('cancel', False):
+                    task = tasks.get(task_key)
+                    if task is not None:
+                        task.cancel()
+                    continue
+
+                if task_key in tasks:
+                    await _respond({'id': req_id,
+                                    'error': 'duplicate request id'})
+                    continue
+
+                task = asyncio.ensure_future(self._serve_request(
+                    req_id, req.get('args'), _respond))
+                tasks[task_key] = task
+                task.add_done_callback(
+                    lambda _, k=task_key: tasks.pop(k, None))
+
+        finally:
+            # Cancel all pending requests of this client.
+            for task in list(tasks.values()):
+                task.cancel()
+            writer.close()
+
+
+def request(path, job, req_id=0):
+    '''
+    Send a scheduling request to the server at the Unix domain socket `path`,
+    and wait for the response. Return the response dict.
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall((json.dumps({'id': req_id, 'args': job}) + '\n')
+                     .encode())
+        with sock.makefile('r') as rfile:
+            for line in rfile:
+                resp = json.loads(line)
+                if resp.get('id') == req_id:
+                    return resp
+    raise ConnectionError('connection closed before the response.')
+
+
+def argparser():
+    ''' Argument parser. '''
+
+    ap = argparse.ArgumentParser(
+        description='Serve scheduling requests over a Unix domain socket. '
+                    'All the other arguments are passed to '
+                    'nn_dataflow_search as the common arguments of all '
+                    'requests.')
+
+    ap.add_argument('--socket', required=True,
+                    help='path of the Unix domain socket')
+    ap.add_argument('--workers', type=int, default=1,
+                    help='number of worker processes, each serving one '
+                         'request at a time.')
+
+    return ap
+
+
+def main():
+    ''' Main function. '''
+    args, base_argv = argparser().parse_known_args()
+    server = SchedulingServer(args.socket, num_workers=args.workers,
+                              base_argv=base_argv)
+    try:
+        asyncio.run(server.serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+""" $lic$
+Copyright (C) 2016-2020 by Tsinghua University and The Board of Trustees of
+Stanford University
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the Modified BSD-3 License as published by the Open Source
+Initiative.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE. See the BSD-3 License for more details.
+
+You should have received a copy of the Modified BSD-3 License along with this
+program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+from collections import OrderedDict
+from multiprocessing.pool import Pool
+
+from nn_dataflow.tools import nn_dataflow_search
+
+from nn_dataflow.version import get_version
+
+# Objectives of the Pareto table, all to be minimized.
+PARETO_KEYS = ('total_cost', 'total_time', 'num_pes', 'total_sram')
+
+def gen_sweep_configs(sweep):
+    '''
+    Generate the hardware configurations, as the cross product of the swept
+    values, given as an OrderedDict from the argument names to the lists of
+    values. Each configuration is an OrderedDict from the argument names to
+    the values.
+    '''
+    names = list(sweep.keys())
+    for vals in itertools.product(*sweep.values()):
+        yield OrderedDict(zip(names, vals))
+
+
+def config_argv(base_argv, config):
+    '''
+    Get the command line arguments of `nn_dataflow_search` for the
+    configuration, which override the common base arguments.
+    '''
+    return list(base_argv) + nn_dataflow_search.job_argv(config)
+
+
+def area_stats(args):
+    '''
+    Get the area proxies of the hardware given by the `nn_dataflow_search`
+    arguments, as the total number of PEs, and the total on-chip storage size
+    in bytes.
+    '''
+    num_nodes = args.nodes[0] * args.nodes[1]
+    num_node_pes = args.array[0] * args.array[1]
+    num_pes = num_nodes * num_node_pes
+    total_sram = num_nodes * (args.gbuf + num_node_pes * args.regf)
+    return num_pes, total_sram
+
+
+def pareto_rows(rows, keys=PARETO_KEYS):
+    '''
+    Get the rows that are not dominated by any other row on the given keys,
+    all to be minimized, in the increasing order of the keys.
+    '''
+    def _key(row):
+        return tuple(row[k] for k in keys)
+
+    frontier = []
+    for row in sorted(rows, key=_key):
+        rkey = _key(row)
+        # Sorted, so only the previous rows can dominate this row.
+        if not any(all(f <= r for f, r in zip(_key(frow), rkey))
+                   for frow in frontier):
+            frontier.append(row)
+    return frontier
+
+
+def sweep_config(argv, shared_pernode_cache=None):
+    '''
+    Schedule a single configuration given by the `nn_dataflow_search`
+    arguments. Return a row of the results. If the scheduling fails with an
+    exception, the row has no results but the error message.
+
+    `shared_pernode_cache` is an optional dict of the per-node search results
+    shared across configurations. Its keys include the whole per-node resource
+    and cost, so the results are mostly reused across the layers of the same
+    configuration, and rarely across different configurations.
+    '''
+    args = nn_dataflow_search.argparser().parse_args(argv)
+    try:
+        res = nn_dataflow_search.do_scheduling(
+            args, shared_pernode_cache=shared_pernode_cache)
+    except Exception as e:  # pylint: disable=broad-except
+        res = None
+        error = str(e)
+    else:
+        error = None
+
+    row = OrderedDict()
+    row['total_cost'] = res['total_cost'] if res else None
+    row['total_time'] = res['total_time'] if res else None
+    row['num_pes'], row['total_sram'] = area_stats(args)
+    row['elapsed'] = res['elapsed'] if res else None
+    if error is not None:
+        row['error'] = error
+    return row
+
+
+_SHARED_PERNODE_CACHE = None
+
+def _init_sweep_worker():
+    '''
+    Initialize a worker process, with the per-node search results shared by
+    all configurations scheduled in this process.
+    '''
+    global _SHARED_PERNODE_CACHE  # pylint: disable=global-statement
+    _SHARED_PERNODE_CACHE = {}
+
+
+def _sweep_config_worker(argv):
+    ''' Worker to schedule a single configuration. '''
+    return sweep_config(argv, shared_pernode_cache=_SHARED_PERNODE_CACHE)
+
+
+def do_sweep(base_argv, sweep, processes=1):
+    '''
+    Sweep the hardware configurations given by `sweep` (see
+    `gen_sweep_configs`), on top of the common `nn_dataflow_search` arguments
+    `base_argv`. Use `processes` worker processes, each scheduling a whole
+    configuration.
+
+    Return the result rows of all configurations, and the Pareto-optimal rows
+    of the valid configurations on energy, delay, and area proxies. A failed
+    configuration does not abort the sweep, but gets a row with the error
+    message (see `sweep_config`).
+
+    The per-node search results are shared by the configurations scheduled in
+    the same process, but as the configurations differ in the hardware, the
+    sharing mostly happens across the layers within each configuration.
+    '''
+    configs = list(gen_sweep_configs(sweep))
+
+    argv_list = []
+    for config in configs:
+        argv = config_argv(base_argv, config)
+        if processes > 1:
+            # Workers cannot create their own worker pools.
+            argv += ['--processes', '1']
+        # Check the arguments early.
+        nn_dataflow_search.argparser().parse_args(argv)
+        argv_list.append(argv)
+
+    if processes > 1:
+        # Dispatch the configurations in chunks to reduce the overhead.
+        chunksize = max(1, len(argv_list) // (4 * processes))
+        pool = Pool(processes=processes, initializer=_init_sweep_worker)
+        try:
+            rows = list(pool.imap(_sweep_config_worker, argv_list,
+                                  chunksize=chunksize))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        shared_pernode_cache = {}
+        rows = [sweep_config(argv, shared_pernode_cache=shared_pernode_cache)
+                for argv in argv_list]
+
+    results = []
+    for config, row in zip(configs, rows):
+        res_row = OrderedDict()
+        res_row['config'] = config
+        res_row.update(row)
+        results.append(res_row)
+
+    frontier = pareto_rows(r for r in results if r['total_cost'] is not None)
+
+    return results, frontier
+
+
+def _dim_type(string):
+    ''' Argument type of dimensions given as HxW. '''
+    try:
+        h, w = string.lower().split('x')
+        return [int(h), int(w)]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            'invalid dimensions {}, should be HxW.'.format(string)) from e
+
+
+def argparser():
+    ''' Argument parser. '''
+
+    ap = argparse.ArgumentParser(
+        description='Sweep the hardware configurations. All the other '
+                    'arguments are passed to nn_dataflow_search as the '
+                    'common arguments of all configurations.')
+
+    ap.add_argument('--sweep-nodes', type=_dim_type, nargs='+',
+                    metavar='HxW',
+                    help='swept parallel node partitioning dimensions')
+    ap.add_argument('--sweep-array', type=_dim_type, nargs='+',
+                    metavar='HxW',
+                    help='swept PE array dimensions')
+    ap.add_argument('--sweep-regf', type=int, nargs='+',
+                    help='swept register file sizes in bytes per PE')
+    ap.add_argument('--sweep-gbuf', type=int, nargs='+',
+                    help='swept global buffer sizes in bytes')
+    ap.add_argument('--sweep-dram-bw', type=float, nargs='+',
+                    help='swept total DRAM bandwidths in bytes per cycle')
+
+    ap.add_argument('--sweep-processes', type=int,
+                    default=multiprocessing.cpu_count()//2,
+                    help='Number of parallel processes to schedule the '
+                         'configurations, each scheduling a whole '
+                         'configuration.')
+
+    return ap
+
+
+def main():
+    ''' Main function. '''
+    args, base_argv = argparser().parse_known_args()
+
+    sweep = OrderedDict()
+    for name in ['nodes', 'array', 'regf', 'gbuf', 'dram_bw']:
+        vals = getattr(args, 'sweep_' + name)
+        if vals:
+            sweep[name] = vals
+
+    results, frontier = do_sweep(base_argv, sweep,
+                                 processes=args.sweep_processes)
+
+    res_map = OrderedDict()
+    res_map['version'] = get_version(with_local=True)
+    res_map['args'] = base_argv
+    res_map['sweep'] = sweep
+    res_map['results'] = results
+    res_map['pareto'] = frontier
+
+    json.dump(res_map, sys.stdout, indent=2, default=lambda _: None)
+    sys.stdout.write('\n')
+    return 0 if frontier else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,7 +14,7 @@ You should have received a copy of the Modified BSD-3 License along with this
 program. If not, see <https://opensource.org/licenses/BSD-3-Clause>.
 """
 
-from functools import reduce
+from functools import lru_cache, reduce
 import math
 from operator import mul
 
@@ -140,34 +140,62 @@ def factorize(value, num, limits=None):
     Factorize given `value` into `num` numbers. Return a tuple of length
     `num`.
 
-    Iterate over factor combinations of which the product is `value`.
+    Iterate over factor combinations of which the product is `value`, in the
+    lexicographical order.
 
     `limits` is a (num-1)-length tuple, specifying the upper limits for the
     first num-1 factors.
     '''
+    if not isinstance(value, int):
+        raise TypeError('value must be integers.')
+    if value <= 0:
+        raise ValueError('value must be positive.')
+
     if limits is None:
         limits = [float('inf')] * (num - 1)
     assert len(limits) >= num - 1
-    limits = list(limits[:num-1]) + [float('inf')]
-
-    factors = [1] * num
-    while True:
-        # Calculate the last factor.
-        factors[-1] = idivc(value, prod(factors[:-1]))
-        if prod(factors) == value \
-                and all(f <= l for f, l in zip(factors, limits)):
-            yield tuple(factors)
-
-        # Update the first n - 1 factor combination, backwards.
-        lvl = num - 1
-        while lvl >= 0:
-            factors[lvl] += 1
-            if prod(factors[:lvl+1]) <= value:
-                break
-            factors[lvl] = 1
-            lvl -= 1
-        if lvl < 0:
-            return
+    limits = tuple(limits[:num-1])
+
+    return iter(_factorize(value, num, limits))
+
+
+@lru_cache(maxsize=1024)
+def _factorize(value, num, limits):
+    '''
+    Get all the factor combinations for `factorize()`, as a tuple, by choosing
+    the first factor from the divisors and recursively factorizing the rest.
+    '''
+    if num == 1:
+        return ((value,),)
+    factors_list = []
+    for f in _divisors(value):
+        if f > limits[0]:
+            break
+        factors_list.extend((f,) + factors for factors
+                            in _factorize(value // f, num - 1, limits[1:]))
+    return tuple(factors_list)
+
+
+@lru_cache(maxsize=1024)
+def _divisors(value):
+    '''
+    Get all the divisors of the positive integer `value` in the increasing
+    order, from its prime decomposition.
+    '''
+    divisors = [1]
+    val = value
+    p = 2
+    while p * p <= val:
+        if val % p == 0:
+            pows = [1]
+            while val % p == 0:
+                val //= p
+                pows.append(pows[-1] * p)
+            divisors = [d * pw for d in divisors for pw in pows]
+        p += 1
+    if val > 1:
+        divisors += [d * val for d in divisors]
+    return tuple(sorted(divisors))
 
 
 def closest_factor(value, factor):
@@ -273,6 +301,37 @@ def isclose(vala, valb, rel_tol=1e-9, abs_tol=0.0):
     return abs(vala - valb) <= max(rel_tol * max(abs(vala), abs(valb)), abs_tol)
 
 
+def pareto_frontier(items, key, cap=None):
+    '''
+    Get the Pareto-optimal frontier of the items, i.e., those not dominated
+    by any other item, where `key` maps an item to a tuple of two objectives
+    to minimize.
+
+    The frontier is sorted by the first objective. Among the items with the
+    identical objectives, only the first one is kept. If `cap` is given and
+    the frontier is larger, keep `cap` items evenly spread along the frontier
+    including the two ends.
+    '''
+    frontier = []
+    min_second = float('inf')
+    # Stable sort keeps the first one among the identical objectives.
+    for item in sorted(items, key=key):
+        second = key(item)[1]
+        if second < min_second or not frontier:
+            frontier.append(item)
+            min_second = second
+
+    if cap is not None and len(frontier) > cap:
+        if cap <= 1:
+            frontier = frontier[:cap]
+        else:
+            nfrt = len(frontier)
+            frontier = [frontier[(nfrt - 1) * i // (cap - 1)]
+                        for i in range(cap)]
+
+    return frontier
+
+
 def assert_float_eq_int(vfloat, vint, message=''):
     '''
     Check the given float value is equal to the given int value. Print the
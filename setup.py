@@ -61,6 +61,8 @@ setuptools.setup(
     entry_points={
         'console_scripts': [
             'nn_dataflow_search=nn_dataflow.tools.nn_dataflow_search:main',
+            'nn_dataflow_sweep=nn_dataflow.tools.nn_dataflow_sweep:main',
+            'nn_dataflow_server=nn_dataflow.tools.nn_dataflow_server:main',
         ]
     },
 